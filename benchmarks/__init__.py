@@ -0,0 +1 @@
+"""Benchmarks of Dallinger at different sizes, run with benchmarks.run."""
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Some benchmarks change directory, so modules are found by absolute paths.
+sys.path = [os.path.abspath(path) for path in sys.path]
+
+from .runner import benchmarks  # noqa: E402
+
+benchmarks(prog_name="python -m benchmarks")
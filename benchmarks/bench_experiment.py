@@ -0,0 +1,119 @@
+"""Benchmarks of the experiment, its server and exporting its data."""
+
+import os
+import shutil
+import tempfile
+
+from dallinger import data, db, models
+from dallinger.experiment import Experiment
+
+from .common import SIZES, add_infos, add_nodes, insert, reset_database
+
+#: An experiment directory like the ones made by dallinger debug.
+EXPERIMENT_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "tests", "experiment")
+
+STATUSES = ["working", "submitted", "approved", "rejected", "returned"]
+
+
+def _add_participants(session, size):
+    insert(session, models.Participant, [
+        {"worker_id": str(i), "assignment_id": str(i), "hit_id": "hit",
+         "unique_id": "{}:{}".format(i, i), "mode": "debug",
+         "status": STATUSES[i % len(STATUSES)]} for i in range(size)])
+
+
+def _add_networks(session, size, nodes_per_network=0):
+    """Add size networks, with some nodes in each."""
+    insert(session, models.Network, [
+        {"type": "network", "role": "experiment", "max_size": 10,
+         "full": False} for _ in range(size)])
+    networks = models.Network.query.all()
+    for network in networks:
+        add_nodes(session, network, nodes_per_network)
+    return networks
+
+
+class TimeGetNetworkForParticipant(object):
+    """Find a network for a participant among size networks."""
+
+    params = SIZES
+    param_names = ["size"]
+
+    def setup(self, size):
+        self.session = reset_database()
+        self.experiment = Experiment(self.session)
+        self.experiment.verbose = False
+        self.experiment.experiment_repeats = size
+        _add_networks(self.session, size)
+        self.participant = models.Participant(
+            worker_id="w", assignment_id="a", hit_id="h", mode="debug")
+        self.session.add(self.participant)
+        self.session.commit()
+
+    def teardown(self, size):
+        self.session.rollback()
+
+    def time_get_network_for_participant(self, size):
+        self.experiment.get_network_for_participant(self.participant)
+        self.session.commit()
+
+
+class TimeSummary(object):
+    """Summarize an experiment with size participants."""
+
+    params = SIZES
+    param_names = ["size"]
+
+    def setup(self, size):
+        self.cwd = os.getcwd()
+        # The server loads the experiment in the current directory.
+        os.chdir(EXPERIMENT_DIR)
+        from dallinger.experiment_server import experiment_server
+        self.server = experiment_server
+        self.client = experiment_server.app.test_client()
+
+        self.session = reset_database()
+        _add_participants(self.session, size)
+        _add_networks(self.session, max(1, size // 10), nodes_per_network=5)
+        self.session.commit()
+
+    def teardown(self, size):
+        self.session.rollback()
+        os.chdir(self.cwd)
+
+    def time_summary(self, size):
+        """The /summary route, which is cached in Redis if it's running."""
+        self.client.get("/summary")
+
+    def time_summarize(self, size):
+        """Working out the summary, without the cache."""
+        with self.server.app.test_request_context("/summary"):
+            self.server.summarize()
+        self.session.commit()
+
+
+class TimeCopyLocalToCsv(object):
+    """Export a database with size of each kind of row to CSV files."""
+
+    params = SIZES
+    param_names = ["size"]
+
+    def setup(self, size):
+        if db.engine.dialect.name != "postgresql":
+            # The data is copied with PostgreSQL's COPY.
+            raise NotImplementedError()
+        self.session = reset_database()
+        _add_participants(self.session, size)
+        network = _add_networks(self.session, 1)[0]
+        network.max_size = size
+        add_infos(self.session, network,
+                  add_nodes(self.session, network, size))
+        self.session.commit()
+        self.path = tempfile.mkdtemp()
+
+    def teardown(self, size):
+        shutil.rmtree(self.path)
+
+    def time_copy_local_to_csv(self, size):
+        data.copy_local_to_csv(db.engine.url.database, self.path)
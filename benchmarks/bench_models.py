@@ -0,0 +1,77 @@
+"""Benchmarks of what nodes do: transmitting, receiving and failing."""
+
+from dallinger import models
+from dallinger.nodes import Agent
+
+from .common import SIZES, add_infos, add_nodes, add_vectors, reset_database
+
+
+class _Broadcast(object):
+    """A node connected to size agents, which each have an info."""
+
+    params = SIZES
+    param_names = ["size"]
+
+    def setup(self, size):
+        self.session = reset_database()
+        self.network = models.Network(max_size=size + 1)
+        self.session.add(self.network)
+        self.session.flush()
+        self.broadcaster = Agent(network=self.network)
+        self.session.flush()
+        ids = add_nodes(self.session, self.network, size)
+        add_vectors(self.session, self.network,
+                    [(self.broadcaster.id, i) for i in ids])
+        add_infos(self.session, self.network, ids + [self.broadcaster.id])
+        self.session.commit()
+        self.info = self.broadcaster.infos()[0]
+        self.agents = Agent.query.filter(Agent.id.in_(ids)).all()
+
+    def teardown(self, size):
+        self.session.rollback()
+
+
+class TimeTransmit(_Broadcast):
+    """Transmit an info to size agents."""
+
+    def time_transmit(self, size):
+        self.broadcaster.transmit(what=self.info, to_whom=self.agents)
+        self.session.commit()
+
+    def time_bulk_transmit(self, size):
+        self.broadcaster.bulk_transmit(what=self.info, to_whom=self.agents)
+        self.session.commit()
+
+
+class TimeReceive(_Broadcast):
+    """Receive size pending transmissions."""
+
+    def setup(self, size):
+        super(TimeReceive, self).setup(size)
+        self.receiver = self.agents[0]
+        infos = [models.Info(origin=self.broadcaster, contents=str(i))
+                 for i in range(size)]
+        self.session.flush()
+        self.broadcaster.bulk_transmit(what=infos, to_whom=self.receiver)
+        self.session.commit()
+
+    def time_receive(self, size):
+        self.receiver.receive()
+        self.session.commit()
+
+
+class TimeFail(_Broadcast):
+    """Fail a node connected to size agents, and a network of size agents."""
+
+    def setup(self, size):
+        super(TimeFail, self).setup(size)
+        self.broadcaster.bulk_transmit(what=self.info, to_whom=self.agents)
+        self.session.commit()
+
+    def time_fail_node(self, size):
+        self.broadcaster.fail()
+        self.session.commit()
+
+    def time_fail_network(self, size):
+        self.network.fail()
+        self.session.commit()
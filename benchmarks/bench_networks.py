@@ -0,0 +1,140 @@
+"""Benchmarks of adding a node to each kind of network."""
+
+import random
+
+from sqlalchemy import Integer
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.sql.expression import cast
+
+from dallinger import networks
+from dallinger.nodes import Agent, RandomBinaryStringSource
+
+from .common import SIZES, add_infos, add_nodes, add_vectors, both_ways
+from .common import reset_database
+
+
+class GenerationalAgent(Agent):
+    """An agent with a generation, as DiscreteGenerational networks need."""
+
+    __mapper_args__ = {"polymorphic_identity": "generational_agent"}
+
+    @hybrid_property
+    def generation(self):
+        """The generation of the agent, in property2."""
+        return int(self.property2)
+
+    @generation.setter
+    def generation(self, generation):
+        self.property2 = repr(generation)
+
+    @generation.expression
+    def generation(self):
+        return cast(self.property2, Integer)
+
+
+def _chain(session, net, size):
+    ids = add_nodes(session, net, size)
+    add_vectors(session, net, zip(ids, ids[1:]))
+    return Agent
+
+
+def _fully_connected(session, net, size):
+    ids = add_nodes(session, net, size)
+    add_vectors(session, net, [(a, b) for a in ids for b in ids if a != b])
+    return Agent
+
+
+def _empty(session, net, size):
+    add_nodes(session, net, size)
+    return Agent
+
+
+def _star(session, net, size):
+    ids = add_nodes(session, net, size)
+    add_vectors(session, net, both_ways([(ids[0], i) for i in ids[1:]]))
+    return Agent
+
+
+def _burst(session, net, size):
+    ids = add_nodes(session, net, size)
+    add_vectors(session, net, [(ids[0], i) for i in ids[1:]])
+    return Agent
+
+
+def _discrete_generational(session, net, size):
+    source = RandomBinaryStringSource(network=net)
+    session.flush()
+    generations = []
+    for first in range(0, size, net.generation_size):
+        generations.append(add_nodes(
+            session, net, min(net.generation_size, size - first),
+            type="generational_agent", property1="1.0",
+            property2=repr(len(generations))))
+    add_vectors(session, net, [(source.id, i) for i in generations[0]] + [
+        (random.choice(generations[g - 1]), i)
+        for g in range(1, len(generations)) for i in generations[g]])
+    add_infos(session, net, sum(generations, []))
+    return GenerationalAgent
+
+
+def _scale_free(session, net, size):
+    ids = add_nodes(session, net, size)
+    core = ids[:net.m0]
+    pairs = [(a, b) for a in core for b in core if a < b]
+    for i in range(net.m0, size):
+        pairs += [(ids[i], j) for j in random.sample(ids[:i], net.m)]
+    add_vectors(session, net, both_ways(pairs))
+    return Agent
+
+
+def _microsociety(session, net, size):
+    ids = add_nodes(session, net, size)
+    add_vectors(session, net, [
+        (ids[j], ids[i]) for i in range(size)
+        for j in range(max(0, i - net.n + 1), i)])
+    return Agent
+
+
+#: How to make and fill each kind of network, by name.
+NETWORKS = {
+    "Burst": (networks.Burst, _burst),
+    "Chain": (networks.Chain, _chain),
+    "DiscreteGenerational": (
+        lambda: networks.DiscreteGenerational(
+            generations=1000, generation_size=10, initial_source=True),
+        _discrete_generational),
+    "Empty": (networks.Empty, _empty),
+    "FullyConnected": (networks.FullyConnected, _fully_connected),
+    "ScaleFree": (lambda: networks.ScaleFree(m0=4, m=2), _scale_free),
+    "SequentialMicrosociety": (
+        lambda: networks.SequentialMicrosociety(n=5), _microsociety),
+    "Star": (networks.Star, _star),
+}
+
+
+class TimeAddNode(object):
+    """Add a node to a network that already has size nodes."""
+
+    params = (sorted(NETWORKS), SIZES)
+    param_names = ["network", "size"]
+
+    def setup(self, network, size):
+        if network == "FullyConnected" and size > 100:
+            # A million vectors take longer to insert than is worth waiting.
+            raise NotImplementedError()
+        self.session = reset_database()
+        make, fill = NETWORKS[network]
+        self.network = make()
+        self.network.max_size = size + 2
+        self.session.add(self.network)
+        self.session.flush()
+        self.node_type = fill(self.session, self.network, size)
+        self.session.commit()
+
+    def teardown(self, network, size):
+        self.session.rollback()
+
+    def time_add_node(self, network, size):
+        node = self.node_type(network=self.network)
+        self.network.add_node(node)
+        self.session.commit()
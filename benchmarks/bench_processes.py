@@ -0,0 +1,50 @@
+"""Benchmarks of a step of each process in dallinger.processes."""
+
+from dallinger import models, processes
+from dallinger.nodes import RandomBinaryStringSource
+
+from .common import SIZES, add_infos, add_nodes, add_vectors, both_ways
+from .common import insert, reset_database, ring
+
+
+class TimeProcessStep(object):
+    """Take a step of a process on a ring of size agents fed by a source.
+
+    Each agent has an info and a transmission has already been received,
+    so the step is one in the middle of a run rather than the first.
+    """
+
+    params = (["moran_cultural", "moran_sexual", "random_walk"], SIZES)
+    param_names = ["process", "size"]
+
+    def setup(self, process, size):
+        self.session = reset_database()
+        self.network = models.Network(max_size=size + 2)
+        self.session.add(self.network)
+        self.session.flush()
+        source = RandomBinaryStringSource(network=self.network)
+        self.session.flush()
+
+        ids = add_nodes(self.session, self.network, size,
+                        type="replicator_agent")
+        vector_ids = add_vectors(self.session, self.network,
+                                 both_ways(ring(ids)))
+        add_vectors(self.session, self.network, [(source.id, i) for i in ids])
+        add_infos(self.session, self.network, ids)
+        info = models.Info.query.filter_by(origin_id=ids[0]).one()
+        insert(self.session, models.Transmission, [{
+            "vector_id": vector_ids[0], "info_id": info.id,
+            "origin_id": ids[0], "destination_id": ids[1],
+            "network_id": self.network.id, "status": "received",
+            "receive_time": models.timenow()}])
+        if process == "moran_sexual":
+            # The newest agent is the baby that replaces the one who dies.
+            add_nodes(self.session, self.network, 1, type="replicator_agent")
+        self.session.commit()
+
+    def teardown(self, process, size):
+        self.session.rollback()
+
+    def time_step(self, process, size):
+        getattr(processes, process)(self.network)
+        self.session.commit()
@@ -0,0 +1,31 @@
+"""Benchmarks of turning models into JSON."""
+
+from dallinger import models, serialization
+
+from .common import SIZES, add_infos, add_nodes, reset_database
+
+
+class TimeSerialize(object):
+    """Serialize size infos, with their __json__ and with serialize."""
+
+    params = SIZES
+    param_names = ["size"]
+
+    def setup(self, size):
+        self.session = reset_database()
+        network = models.Network(max_size=size)
+        self.session.add(network)
+        self.session.flush()
+        add_infos(self.session, network,
+                  add_nodes(self.session, network, size), contents="x" * 100)
+        self.session.commit()
+        self.infos = models.Info.query.all()
+
+    def teardown(self, size):
+        self.session.rollback()
+
+    def time_json_method(self, size):
+        [info.__json__() for info in self.infos]
+
+    def time_serialize(self, size):
+        [serialization.serialize(info) for info in self.infos]
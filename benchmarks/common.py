@@ -0,0 +1,76 @@
+"""Build big networks quickly, for the benchmarks to work on.
+
+Rows are inserted with single statements, without the ORM, so that setting
+up a network of a thousand nodes takes a fraction of a second and the time
+is spent in the code being measured.
+"""
+
+import random
+
+from sqlalchemy import func
+
+from dallinger import db, models
+
+#: The sizes each benchmark is run at, e.g. the number of nodes.
+SIZES = [10, 100, 1000]
+
+
+def reset_database(seed=0):
+    """Empty the database and seed the random numbers."""
+    random.seed(seed)
+    session = db.init_db(drop_all=True)
+    session.info.pop("changed_networks", None)
+    return session
+
+
+def insert(session, model, rows):
+    """Insert rows into the table of a model at once."""
+    if rows:
+        session.execute(model.__table__.insert(), rows)
+
+
+def add_nodes(session, network, size, type="agent", **columns):
+    """Add size nodes of the given polymorphic type to a network.
+
+    Returns the ids of the new nodes, in the order they were added.
+    """
+    table = models.Node.__table__
+    before = session.query(func.max(table.c.id)).scalar() or 0
+    insert(session, models.Node, [
+        dict(columns, type=type, network_id=network.id)
+        for _ in range(size)])
+    network.node_count += size
+    return [row[0] for row in session.query(table.c.id)
+            .filter(table.c.id > before, table.c.network_id == network.id)
+            .order_by(table.c.id)]
+
+
+def add_vectors(session, network, pairs):
+    """Connect the (origin_id, destination_id) pairs of nodes in a network.
+
+    Returns the ids of the new vectors, in the same order.
+    """
+    table = models.Vector.__table__
+    before = session.query(func.max(table.c.id)).scalar() or 0
+    insert(session, models.Vector, [
+        {"origin_id": origin, "destination_id": destination,
+         "network_id": network.id} for origin, destination in pairs])
+    return [row[0] for row in session.query(table.c.id)
+            .filter(table.c.id > before).order_by(table.c.id)]
+
+
+def add_infos(session, network, node_ids, contents="0"):
+    """Give each of the nodes an info."""
+    insert(session, models.Info, [
+        {"type": "info", "origin_id": node_id, "network_id": network.id,
+         "contents": contents} for node_id in node_ids])
+
+
+def both_ways(pairs):
+    """The pairs, and the same pairs the other way around."""
+    return list(pairs) + [(b, a) for a, b in pairs]
+
+
+def ring(ids):
+    """Pairs connecting each node to the next, and the last to the first."""
+    return [(ids[i], ids[(i + 1) % len(ids)]) for i in range(len(ids))]
@@ -0,0 +1,197 @@
+"""Run the benchmarks, save their results and compare them across commits.
+
+Benchmarks are written as for asv (airspeed velocity): the time_* methods
+of the classes in the bench_* modules are timed, once for each combination
+of the class's params, after calling setup and before calling teardown with
+the same params. A setup that raises NotImplementedError skips that
+combination.
+"""
+
+from datetime import datetime
+import importlib
+import inspect
+import itertools
+import json
+import os
+import pkgutil
+import platform
+import subprocess
+import sys
+import timeit
+
+import click
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#: Where results are saved unless told otherwise.
+RESULTS_DIR = os.path.join(PACKAGE_DIR, "results")
+
+
+def discover(match=None):
+    """Get the (module, class, method) of every benchmark.
+
+    If match is given, only benchmarks whose name contains it are included.
+    """
+    benchmarks = []
+    for _, name, _ in pkgutil.iter_modules([PACKAGE_DIR]):
+        if not name.startswith("bench_"):
+            continue
+        module = importlib.import_module("{}.{}".format(__package__, name))
+        for cls in vars(module).values():
+            if not (inspect.isclass(cls) and
+                    cls.__module__ == module.__name__):
+                continue
+            for method in dir(cls):
+                full_name = "{}.{}.{}".format(name, cls.__name__, method)
+                if (method.startswith("time_") and
+                        callable(getattr(cls, method)) and
+                        (match is None or match in full_name)):
+                    benchmarks.append((name, cls, method))
+    return sorted(benchmarks, key=lambda b: (b[0], b[1].__name__, b[2]))
+
+
+def combinations(cls):
+    """Each combination of the params of a benchmark class, as a dict."""
+    params = getattr(cls, "params", None)
+    names = getattr(cls, "param_names", [])
+    if params is None:
+        return [{}]
+    if len(names) == 1:
+        params = [params]
+    return [dict(zip(names, values))
+            for values in itertools.product(*params)]
+
+
+def measure(cls, method, params, repeat):
+    """Time a benchmark repeat times, or return None if it is skipped."""
+    args = [params[name] for name in getattr(cls, "param_names", [])]
+    times = []
+    for _ in range(repeat):
+        benchmark = cls()
+        try:
+            getattr(benchmark, "setup", lambda *args: None)(*args)
+        except NotImplementedError:
+            return None
+        try:
+            start = timeit.default_timer()
+            getattr(benchmark, method)(*args)
+            times.append(timeit.default_timer() - start)
+        finally:
+            getattr(benchmark, "teardown", lambda *args: None)(*args)
+    return times
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def _name(module, cls, method, params):
+    name = "{}.{}.{}".format(module, cls.__name__, method)
+    if params:
+        name += "({})".format(", ".join(
+            "{}={}".format(k, params[k]) for k in cls.param_names))
+    return name
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=PACKAGE_DIR,
+            stderr=open(os.devnull, "w")).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _seconds(seconds):
+    return "{:10.2f} ms".format(seconds * 1000)
+
+
+@click.group()
+def benchmarks():
+    """Benchmark Dallinger."""
+
+
+@benchmarks.command()
+@click.option("--database", default=None,
+              help="The database to use, e.g. sqlite:////tmp/bench.db. "
+                   "Defaults to DATABASE_URL or the local PostgreSQL.")
+@click.option("--match", "-k", default=None,
+              help="Only run the benchmarks whose names contain this.")
+@click.option("--repeat", default=5, help="How many times to time each.")
+@click.option("--output", "-o", default=None,
+              help="Where to save the results, as JSON. Defaults to "
+                   "benchmarks/results/<commit>-<database>.json.")
+def run(database, match, repeat, output):
+    """Run the benchmarks and save their results."""
+    if database is not None:
+        # The engine is created with the URL when dallinger.db is imported.
+        os.environ["DATABASE_URL"] = database
+    from dallinger import db
+
+    results = []
+    for module, cls, method in discover(match):
+        for params in combinations(cls):
+            name = _name(module, cls, method, params)
+            times = measure(cls, method, params,
+                            getattr(cls, "repeat", repeat))
+            if times is None:
+                click.echo("{:<90} {:>13}".format(name, "skipped"))
+                continue
+            results.append({
+                "name": name,
+                "params": params,
+                "times": times,
+                "min": min(times),
+                "median": _median(times),
+            })
+            click.echo("{:<90} {}".format(name, _seconds(_median(times))))
+
+    commit = _commit()
+    saved = {
+        "commit": commit,
+        "date": datetime.utcnow().isoformat(),
+        "database": db.engine.dialect.name,
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+    if output is None:
+        output = os.path.join(RESULTS_DIR, "{}-{}.json".format(
+            (commit or "unknown")[:10], saved["database"]))
+    with open(output, "w") as f:
+        json.dump(saved, f, indent=4, sort_keys=True)
+    click.echo("Saved the results to {}".format(output))
+
+
+@benchmarks.command()
+@click.argument("before", type=click.File("r"))
+@click.argument("after", type=click.File("r"))
+@click.option("--factor", default=1.2,
+              help="How much slower or faster counts as a change.")
+def compare(before, after, factor):
+    """Compare the results of two runs, e.g. before and after a commit.
+
+    Exits with an error if any benchmark got slower by more than factor.
+    """
+    before = dict((r["name"], r) for r in json.load(before)["results"])
+    after = dict((r["name"], r) for r in json.load(after)["results"])
+
+    slower = False
+    for name in sorted(set(before) & set(after)):
+        ratio = after[name]["median"] / before[name]["median"]
+        if ratio > factor:
+            change = "slower"
+            slower = True
+        elif ratio < 1 / factor:
+            change = "faster"
+        else:
+            change = ""
+        click.echo("{:<90} {} {} {:6.2f}x {}".format(
+            name, _seconds(before[name]["median"]),
+            _seconds(after[name]["median"]), ratio, change))
+    if slower:
+        sys.exit(1)
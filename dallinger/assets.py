@@ -0,0 +1,135 @@
+"""Fingerprint and precompress the static files of an experiment.
+
+When an experiment is set up, each static file gets a copy whose name
+includes a hash of its contents, e.g. scripts/dallinger.3f2a1b9c04d5.js,
+and the templates are rewritten to use the copies. As the copies never
+change, browsers can cache them forever, and pages after the first one
+load without asking for them again. Text files are also compressed with gzip,
+and with brotli if it is installed, so the server can send them compressed
+without compressing them for every request.
+
+The copies are listed in a manifest, static/manifest.json, that maps the
+path of each file to the path of its copy.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST = "manifest.json"
+
+#: Files that are worth compressing, by extension.
+COMPRESSIBLE = (".css", ".js", ".json", ".svg", ".html", ".txt", ".map")
+
+#: Encodings with the extension of the files compressed with them, best
+#: first.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def fingerprinted_name(path, contents):
+    """The path of the copy of a file with the given contents."""
+    root, ext = os.path.splitext(path)
+    return "{}.{}{}".format(root, hashlib.md5(contents).hexdigest()[:12], ext)
+
+
+def compress(path, contents):
+    """Write gzipped and, if possible, brotli-compressed versions of a file.
+
+    A version is only kept if it is smaller than the file.
+    """
+    gzipped = path + ".gz"
+    # A fixed mtime keeps the output the same for the same contents.
+    with open(gzipped, "wb") as f:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=f, mtime=0,
+                           compresslevel=9) as g:
+            g.write(contents)
+    if os.path.getsize(gzipped) >= len(contents):
+        os.remove(gzipped)
+
+    if brotli is not None:
+        compressed = brotli.compress(contents)
+        if len(compressed) < len(contents):
+            with open(path + ".br", "wb") as f:
+                f.write(compressed)
+
+
+def read_manifest(static_dir):
+    """The manifest of the static files in static_dir, empty if none."""
+    try:
+        with open(os.path.join(static_dir, MANIFEST), "r") as f:
+            return json.load(f)
+    except IOError:
+        return {}
+
+
+def fingerprint_static(static_dir):
+    """Fingerprint and compress every file in static_dir.
+
+    Returns the manifest, which is also written to static_dir.
+    """
+    manifest = read_manifest(static_dir)
+    built = set(manifest.values())
+    paths = []
+    for directory, _, filenames in os.walk(static_dir):
+        for filename in filenames:
+            path = os.path.relpath(os.path.join(directory, filename),
+                                   static_dir).replace(os.sep, "/")
+            root, ext = os.path.splitext(path)
+            compressed = root in built and ext in [e for _, e in ENCODINGS]
+            if path != MANIFEST and path not in built and not compressed:
+                paths.append(path)
+
+    for path in sorted(paths):
+        full_path = os.path.join(static_dir, *path.split("/"))
+        with open(full_path, "rb") as f:
+            contents = f.read()
+        name = fingerprinted_name(path, contents)
+        copy = os.path.join(static_dir, *name.split("/"))
+        shutil.copyfile(full_path, copy)
+        if path.endswith(COMPRESSIBLE):
+            compress(copy, contents)
+        manifest[path] = name
+
+    with open(os.path.join(static_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    return manifest
+
+
+def rewrite_templates(templates_dir, manifest):
+    """Make the templates in templates_dir use the fingerprinted files.
+
+    References to static files like "/static/scripts/dallinger.js" are
+    replaced with references to their copies.
+    """
+    if not manifest:
+        return
+    paths = sorted(manifest, key=len, reverse=True)
+    reference = re.compile(r"(?<=static/)({})(?=[\"'\s?#)])".format(
+        "|".join(re.escape(p) for p in paths)))
+
+    for directory, _, filenames in os.walk(templates_dir):
+        for filename in filenames:
+            if not filename.endswith(".html"):
+                continue
+            path = os.path.join(directory, filename)
+            with open(path, "r") as f:
+                page = f.read()
+            rewritten = reference.sub(lambda m: manifest[m.group(1)], page)
+            if rewritten != page:
+                with open(path, "w") as f:
+                    f.write(rewritten)
+
+
+def build(experiment_dir):
+    """Fingerprint the static files of an experiment and use them."""
+    manifest = fingerprint_static(os.path.join(experiment_dir, "static"))
+    rewrite_templates(os.path.join(experiment_dir, "templates"), manifest)
+    return manifest
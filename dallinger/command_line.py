@@ -22,12 +22,14 @@ import uuid
 import webbrowser
 
 import click
+from dallinger.compat import unicode
 from dallinger.config import get_config
 import psycopg2
 import redis
 import requests
 from collections import Counter
 
+from dallinger import assets
 from dallinger import data
 from dallinger import db
 from dallinger import heroku
@@ -36,6 +38,7 @@ from dallinger.heroku import (
 )
 from dallinger.mturk import MTurkService
 from dallinger import registration
+from dallinger import simulation
 from dallinger.version import __version__
 
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
@@ -115,12 +118,13 @@ def setup_experiment(debug=True, verbose=False, app=None, exp_config=None):
             "This is not a valid Dallinger app. " +
             "Fix the errors and then try running 'dallinger verify'.")
 
-    # Verify that the Postgres server is running.
-    try:
-        psycopg2.connect(database="x", user="postgres", password="nada")
-    except psycopg2.OperationalError as e:
-        if "could not connect to server" in str(e):
-            raise RuntimeError("The Postgres server isn't running.")
+    # Verify that the Postgres server is running, unless using SQLite.
+    if db.engine.dialect.name == "postgresql":
+        try:
+            psycopg2.connect(database="x", user="postgres", password="nada")
+        except psycopg2.OperationalError as e:
+            if "could not connect to server" in str(e):
+                raise RuntimeError("The Postgres server isn't running.")
 
     # Load configuration.
     config = get_config()
@@ -169,6 +173,7 @@ def setup_experiment(debug=True, verbose=False, app=None, exp_config=None):
     # Write the custom config
     if exp_config:
         config.extend(exp_config)
+    config.extend({"id": unicode(generated_uid)})
 
     config.write(filter_sensitive=True)
 
@@ -229,6 +234,9 @@ def setup_experiment(debug=True, verbose=False, app=None, exp_config=None):
         src = os.path.join(src_base, "frontend", filename)
         shutil.copy(src, os.path.join(dst, filename))
 
+    # Fingerprint and compress the static files, so they can be cached.
+    assets.build(dst)
+
     time.sleep(0.25)
 
     os.chdir(cwd)
@@ -329,6 +337,83 @@ def debug(verbose):
     os.chdir(cwd)
 
 
+@dallinger.command()
+@click.option('--participants', '-n', default=100,
+              help='How many participants to simulate')
+@click.option('--commit-every', default=100,
+              help='How many participants to commit at once')
+@click.option('--seed', type=int, default=None,
+              help='Seed for the random number generator')
+@click.option('--verbose', is_flag=True, flag_value=True, help='Verbose mode')
+def simulate(participants, commit_every, seed, verbose):
+    """Run the experiment in process with simulated participants.
+
+    The database is the one in DATABASE_URL, e.g. sqlite:////tmp/sim.db.
+    """
+    (id, tmp) = setup_experiment(debug=True, verbose=verbose)
+
+    # Drop all the tables from the database.
+    db.init_db(drop_all=True)
+
+    # Switch to the temporary directory.
+    cwd = os.getcwd()
+    os.chdir(tmp)
+
+    log("Simulating {} participants...".format(participants))
+    try:
+        results = simulation.simulate(
+            participants, commit_every=commit_every, seed=seed)
+    finally:
+        os.chdir(cwd)
+
+    click.echo("\nstatus    | count")
+    click.echo("-----------------")
+    for status, count in results["statuses"]:
+        click.echo("{:<10}| {}".format(status, count))
+    click.echo("\nSimulated {} participants in {:.1f} s ({:.1f} per second)"
+               .format(participants, results["seconds"],
+                       participants / results["seconds"]))
+    log("Completed simulation of experiment with id " + id)
+
+
+@dallinger.command()
+@click.option('--replicates', '-r', default=10,
+              help='How many replicates to simulate')
+@click.option('--participants', '-n', default=100,
+              help='How many participants to simulate in each replicate')
+@click.option('--processes', '-p', type=int, default=None,
+              help='How many processes to run, by default one per CPU')
+@click.option('--commit-every', default=100,
+              help='How many participants to commit at once')
+@click.option('--seed', type=int, default=None,
+              help='Seed for the random number generators')
+@click.option('--verbose', is_flag=True, flag_value=True, help='Verbose mode')
+def replicate(replicates, participants, processes, commit_every, seed,
+              verbose):
+    """Simulate replicates of the experiment in parallel and export them.
+
+    Each replicate has its own SQLite file or PostgreSQL schema, depending
+    on DATABASE_URL.
+    """
+    (id, tmp) = setup_experiment(debug=True, verbose=verbose)
+
+    # Switch to the temporary directory.
+    cwd = os.getcwd()
+    os.chdir(tmp)
+
+    log("Simulating {} replicates of {} participants...".format(
+        replicates, participants))
+    try:
+        path = simulation.replicate(
+            replicates, participants, processes=processes,
+            commit_every=commit_every, seed=seed, id=id,
+            path=os.path.join(cwd, "data"))
+    finally:
+        os.chdir(cwd)
+
+    log("Done. Data available in {}".format(path))
+
+
 def deploy_sandbox_shared_setup(verbose=True, app=None, web_procs=1, exp_config=None):
     """Set up Git, push to Heroku, and launch the app."""
     if verbose:
@@ -23,6 +23,8 @@ except ImportError:
     pass
 
 from dallinger import heroku
+from dallinger.compat import unicode
+from dallinger import models
 
 
 table_names = [
@@ -133,6 +135,49 @@ def copy_local_to_csv(local_db, path, scrub_pii=False):
         _scrub_participant_table(path)
 
 
+def copy_db_to_csv(engine, path):
+    """Copy the database of an engine to a set of CSV files.
+
+    The files are laid out as by copy_local_to_csv, which is used for
+    PostgreSQL, but the database can also be SQLite.
+    """
+    if engine.dialect.name == "postgresql":
+        conn = engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            for table in table_names:
+                csv_path = os.path.join(path, "{}.csv".format(table))
+                with open(csv_path, "w") as f:
+                    sql = "COPY {} TO STDOUT WITH CSV HEADER".format(table)
+                    cur.copy_expert(sql, f)
+        finally:
+            conn.close()
+        return
+
+    for name in table_names:
+        table = models.Base.metadata.tables[name]
+        rows = engine.execute(table.select().order_by(table.c.id))
+        csv_path = os.path.join(path, "{}.csv".format(name))
+        with open(csv_path, "wb") as f:
+            writer = csv.writer(f)
+            writer.writerow([column.name for column in table.columns])
+            for row in rows:
+                writer.writerow([_csv_value(value) for value in row])
+
+
+def _csv_value(value):
+    """Write a value as PostgreSQL's COPY does."""
+    if value is None:
+        return ""
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    return value
+
+
 def _scrub_participant_table(path_to_data):
     """Scrub PII from the given participant table."""
     path = os.path.join(path_to_data, "participant.csv")
@@ -1,20 +1,45 @@
 """Create a connection to the database."""
 
+from collections import Counter
 from contextlib import contextmanager
 from functools import wraps
 import logging
 import os
+import re
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
 
 
 logger = logging.getLogger('dallinger.db')
 
+
+def create_db_engine(db_url, schema=None):
+    """Create an engine for the database at db_url.
+
+    If a PostgreSQL schema is given, the tables are looked for in it
+    rather than in public.
+    """
+    if db_url.startswith("sqlite"):
+        # SQLite has no server to connect to, so no pool of connections.
+        engine = create_engine(db_url)
+    else:
+        engine = create_engine(db_url, pool_size=1000)
+
+    if schema is not None:
+        @event.listens_for(engine, "connect")
+        def set_search_path(connection, record):
+            cursor = connection.cursor()
+            cursor.execute("SET search_path TO {}".format(schema))
+            cursor.close()
+
+    return engine
+
+
 db_url_default = "postgresql://postgres@localhost/dallinger"
 db_url = os.environ.get("DATABASE_URL", db_url_default)
-engine = create_engine(db_url, pool_size=1000)
+engine = create_db_engine(db_url)
 session = scoped_session(sessionmaker(autocommit=False,
                                       autoflush=True,
                                       bind=engine))
@@ -62,6 +87,14 @@ def scoped_session_decorator(func):
     return wrapper
 
 
+def use_engine(new_engine):
+    """Use another engine for the session, e.g. in a worker process."""
+    global engine
+    session.remove()
+    engine = new_engine
+    session.configure(bind=engine)
+
+
 def init_db(drop_all=False):
     """Initialize the database, optionally dropping existing tables."""
     if drop_all:
@@ -69,3 +102,89 @@ def init_db(drop_all=False):
     Base.metadata.create_all(bind=engine)
 
     return session
+
+
+"""Counting queries."""
+
+_literal = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_numbered_parameter = re.compile(r"%\((\w+?)_\d+\)s")
+_parameter_list = re.compile(r"\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)*\s*\)")
+_whitespace = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    """A statement without its values, to tell when it is run repeatedly.
+
+    Literals and the numbers of parameters are dropped, and lists of
+    parameters, as in "IN (...)" or "VALUES (...)", become one parameter.
+    """
+    shape = _literal.sub("?", statement)
+    shape = _numbered_parameter.sub(r"%(\1)s", shape)
+    shape = _parameter_list.sub("(...)", shape)
+    return _whitespace.sub(" ", shape).strip()
+
+
+class QueryRecorder(object):
+    """Record the SQL statements run on an engine while in use.
+
+    Each call to the database counts once, so a statement run for many
+    rows at once with executemany counts once too.
+    """
+
+    def __init__(self, bind=None):
+        self.bind = bind or engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.bind, "before_cursor_execute", self._record)
+
+    def __len__(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def shapes(self):
+        """How many times each shape of statement was run."""
+        return Counter(statement_shape(s) for s in self.statements)
+
+    def repeated(self, times=2):
+        """The shapes run at least the given number of times, most first.
+
+        Many runs of one shape are the mark of a query in a loop, e.g. one
+        query per node, where one query for all of them would do.
+        """
+        return [(shape, count) for shape, count in self.shapes().most_common()
+                if count >= times]
+
+    def report(self):
+        """A summary of the statements, by shape, for failed assertions."""
+        return "\n".join("{:>5} x {}".format(count, shape)
+                         for shape, count in self.shapes().most_common())
+
+
+@contextmanager
+def assert_max_queries(n, max_repeats=None, bind=None):
+    """Fail if the code in the block runs more than n SQL statements.
+
+    If max_repeats is given, also fail if any shape of statement is run
+    more than max_repeats times, which is how N+1 loops show up. The
+    statements are listed by shape when the assertion fails.
+    """
+    with QueryRecorder(bind) as recorder:
+        yield recorder
+
+    if len(recorder) > n:
+        raise AssertionError(
+            "{} queries were run, more than the {} allowed:\n{}".format(
+                len(recorder), n, recorder.report()))
+    if max_repeats is not None:
+        repeated = recorder.repeated(max_repeats + 1)
+        if repeated:
+            raise AssertionError(
+                "A query was run {} times, more than the {} allowed:\n{}"
+                .format(repeated[0][1], max_repeats, recorder.report()))
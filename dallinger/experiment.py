@@ -1,19 +1,17 @@
 """The base experiment class."""
 
-from collections import Counter
 from functools import wraps
 import imp
 import inspect
 import logging
-from operator import itemgetter
 import os
-import random
 import requests
 import sys
 import time
 import uuid
 
-from sqlalchemy import and_
+from sqlalchemy import and_, func
+from sqlalchemy.sql.expression import false
 
 from dallinger.config import get_config, LOCAL_CONFIG
 from dallinger.data import Data
@@ -99,19 +97,23 @@ class Experiment(object):
     @property
     def recruiter(self):
         """Recruiter, the Dallinger class that recruits participants.
-        Default is HotAirRecruiter in debug mode and MTurkRecruiter in other modes.
+        Default is HotAirRecruiter in debug mode, SimulatedRecruiter in
+        simulate mode and MTurkRecruiter in other modes.
         """
         from dallinger.recruiters import HotAirRecruiter
         from dallinger.recruiters import MTurkRecruiter
+        from dallinger.recruiters import SimulatedRecruiter
 
         try:
-            debug_mode = config.get('mode') == 'debug'
+            mode = config.get('mode')
         except RuntimeError:
             # Config not yet loaded
-            debug_mode = False
+            mode = None
 
-        if debug_mode:
+        if mode == 'debug':
             return HotAirRecruiter
+        if mode == 'simulate':
+            return SimulatedRecruiter
         return MTurkRecruiter.from_current_config
 
     def setup(self):
@@ -165,41 +167,70 @@ class Experiment(object):
 
         """
         key = participant.id
-        networks_with_space = Network.query.filter_by(full=False).all()
-        networks_participated_in = [
-            node.network_id for node in
-            Node.query.with_entities(Node.network_id)
-                .filter_by(participant_id=participant.id).all()
-        ]
-
-        legal_networks = [
-            net for net in networks_with_space
-            if net.id not in networks_participated_in
-        ]
-
-        if not legal_networks:
+        networks_participated_in = Node.query\
+            .with_entities(Node.network_id)\
+            .filter(Node.participant_id == participant.id,
+                    Node.network_id.isnot(None))
+        legal_networks = Network.query\
+            .filter(Network.full == false(),
+                    ~Network.id.in_(networks_participated_in))
+
+        num_legal = legal_networks.count()
+        if not num_legal:
             self.log("No networks available, returning None", key)
             return None
 
         self.log("{} networks out of {} available"
-                 .format(len(legal_networks),
+                 .format(num_legal,
                          (self.practice_repeats + self.experiment_repeats)),
                  key)
 
-        legal_practice_networks = [net for net in legal_networks
-                                   if net.role == "practice"]
-        if legal_practice_networks:
-            chosen_network = legal_practice_networks[0]
+        chosen_network = self._reserve_network(
+            legal_networks.filter(Network.role == "practice"))
+        if chosen_network is not None:
             self.log("Practice networks available."
                      "Assigning participant to practice network {}."
                      .format(chosen_network.id), key)
-        else:
-            chosen_network = random.choice(legal_networks)
+            return chosen_network
+
+        chosen_network = self._reserve_network(legal_networks, randomly=True)
+        if chosen_network is not None:
             self.log("No practice networks available."
                      "Assigning participant to experiment network {}"
                      .format(chosen_network.id), key)
+        else:
+            self.log("No networks available, returning None", key)
         return chosen_network
 
+    def _reserve_network(self, networks, randomly=False):
+        """Lock and return the first (or a random one) of networks, or None.
+
+        The network's row stays locked until the end of the transaction, so
+        that concurrent requests assign their participants to other networks
+        rather than overfilling it. Networks that are already locked are
+        skipped; if they all are, wait for one to be released and check it
+        again. The lock doesn't stop other requests from adding nodes, infos
+        and so on to the network, as it is a FOR NO KEY UPDATE lock, which
+        their foreign keys don't conflict with. Databases without row locks,
+        like SQLite, serialize writes instead, so there the network is picked
+        without locking.
+        """
+        in_order = networks.order_by(Network.id)
+        preferred = networks.order_by(func.random()) if randomly else in_order
+
+        if networks.session.bind.dialect.name != "postgresql":
+            return preferred.first()
+
+        # Always wait in id order, so that waiting requests cannot deadlock.
+        preferred = preferred.populate_existing()
+        in_order = in_order.populate_existing()
+        while True:
+            network = (preferred.with_for_update(skip_locked=True,
+                                                 key_share=True).first() or
+                       in_order.with_for_update(key_share=True).first())
+            if network is not None or networks.first() is None:
+                return network
+
     def create_node(self, participant, network):
         """Create a node for a participant."""
         return Node(network=network, participant=participant)
@@ -280,10 +311,11 @@ class Experiment(object):
 
     def log_summary(self):
         """Log a summary of all the participants' status codes."""
-        participants = Participant.query\
-            .with_entities(Participant.status).all()
-        counts = Counter([p.status for p in participants])
-        sorted_counts = sorted(counts.items(), key=itemgetter(0))
+        counts = Participant.query\
+            .with_entities(Participant.status, func.count(Participant.id))\
+            .group_by(Participant.status)\
+            .all()
+        sorted_counts = sorted(tuple(row) for row in counts)
         self.log("Status summary: {}".format(str(sorted_counts)))
         return sorted_counts
 
@@ -317,6 +349,17 @@ class Experiment(object):
         """Run when a request to create an info is complete."""
         pass
 
+    def simulated_response(self, node):
+        """Respond to a node as a simulated participant, and return the infos.
+
+        This stands in for what a participant does in the browser when
+        running ``dallinger simulate``. By default an info with random
+        contents is created and transmitted to the node's neighbors.
+        """
+        info = Info(origin=node, contents=uuid.uuid4().hex)
+        node.transmit(what=info)
+        return [info]
+
     def info_get_request(self, node, infos):
         """Run when a request to get infos is complete."""
         pass
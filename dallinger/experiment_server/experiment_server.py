@@ -1,38 +1,55 @@
 """ This module provides the backend Flask server that serves an experiment. """
 
 from datetime import datetime
-from json import dumps
+from functools import wraps
+from itertools import chain
+from json import dumps, loads
+import mimetypes
 from operator import attrgetter
+import os
 import re
+import time
 import traceback
 import user_agents
+import uuid
 
 from flask import (
     abort,
     Flask,
+    g,
+    has_app_context,
     make_response,
     render_template,
-    render_template_string,
     request,
     Response,
     send_from_directory,
 )
 from jinja2 import TemplateNotFound
+from redis.exceptions import RedisError
 from rq import get_current_job
 from rq import Queue
+from sqlalchemy.orm import load_only
 from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy import event
 from sqlalchemy import exc
 from sqlalchemy import func
+from sqlalchemy import inspect
 from sqlalchemy.sql.expression import true
+from werkzeug.exceptions import HTTPException
+from werkzeug.urls import url_decode
 
+from dallinger import assets
 from dallinger import db
 from dallinger import experiment
 from dallinger import models
+from dallinger import serialization
+from dallinger.serialization import serialize
 from dallinger.heroku.worker import conn
 from dallinger.compat import unicode
 from dallinger.config import get_config
 
-from .utils import nocache
+from .metrics import COUNT_BUCKETS, Metrics
+from .utils import lru_cache, nocache
 
 
 config = get_config()
@@ -50,6 +67,34 @@ app = Flask('Experiment_Server')
 Experiment = experiment.load()
 
 
+def redis_key(*parts):
+    """Name a Redis key or channel, e.g. redis_key("summary", "version").
+
+    Names are prefixed with the experiment's id, so that experiments that
+    share a Redis server don't share their keys.
+    """
+    return ":".join(["dallinger", config.get("id", u"local")] +
+                    [unicode(part) for part in parts])
+
+
+def current_experiment():
+    """Get the experiment for the current request.
+
+    The experiment is created the first time it is needed in a request and
+    then shared by everything else that handles the request, as creating one
+    can be slow (e.g. it may load its config and set up its networks).
+    Experiments can keep state on themselves for the length of a request.
+    """
+    exp = getattr(g, "experiment", None)
+    if exp is None:
+        exp = g.experiment = Experiment(session)
+        for name in EXPERIMENT_HOOKS:
+            hook = getattr(exp, name, None)
+            if hook is not None:
+                setattr(exp, name, timed_hook(name, hook))
+    return exp
+
+
 """Load the experiment's extra routes, if any."""
 
 try:
@@ -80,6 +125,55 @@ def static_favicon():
     return send_from_directory('static', 'favicon.ico', mimetype='image/x-icon')
 
 
+#: How long browsers can cache fingerprinted static files for, a year.
+FINGERPRINTED_MAX_AGE = 365 * 24 * 60 * 60
+
+_fingerprinted = {}
+
+
+def fingerprinted_files():
+    """The paths of the fingerprinted static files, from the manifest."""
+    path = os.path.join(app.static_folder, assets.MANIFEST)
+    try:
+        modified = os.path.getmtime(path)
+    except OSError:
+        return frozenset()
+    if _fingerprinted.get(path, (None,))[0] != modified:
+        files = frozenset(assets.read_manifest(app.static_folder).values())
+        _fingerprinted[path] = (modified, files)
+    return _fingerprinted[path][1]
+
+
+def static_file(filename):
+    """Serve a static file.
+
+    Fingerprinted files can be cached forever, and are sent compressed if
+    the browser accepts an encoding they have been compressed with.
+    """
+    if filename not in fingerprinted_files():
+        return app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, ext in assets.ENCODINGS:
+        if (request.accept_encodings[encoding] and
+                os.path.isfile(os.path.join(app.static_folder,
+                                            filename + ext))):
+            response = send_from_directory(app.static_folder, filename + ext,
+                                           mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(app.static_folder, filename,
+                                       mimetype=mimetype)
+    response.headers["Cache-Control"] = "public, max-age={}, immutable".format(
+        FINGERPRINTED_MAX_AGE)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+app.view_functions["static"] = static_file
+
+
 """Define some canned response types."""
 
 
@@ -90,7 +184,7 @@ def success_response(field=None, data=None, request_type=""):
     if field:
         data_out[field] = data
     print("{} request successful.".format(request_type))
-    js = dumps(data_out, default=date_handler)
+    js = serialization.dumps(data_out)
     return Response(js, status=200, mimetype='application/json')
 
 
@@ -196,12 +290,163 @@ def handle_exp_error(exception):
     return error_page(error_type=exception.value)
 
 
+"""Measure the requests, the SQL they run and the experiment's hooks.
+
+The metrics are totalled across all of the server's processes in Redis, and
+can be read from /metrics in the Prometheus text format.
+"""
+
+metrics = Metrics(conn, redis_key("metrics"))
+metrics.counter("dallinger_requests_total",
+                "Requests handled, by route and status.")
+metrics.histogram("dallinger_request_duration_seconds",
+                  "How long requests took, by route.")
+metrics.histogram("dallinger_request_sql_statements",
+                  "How many SQL statements requests ran, by route.",
+                  buckets=COUNT_BUCKETS)
+metrics.counter("dallinger_sql_seconds_total",
+                "Time spent running SQL statements, by route.")
+metrics.histogram("dallinger_hook_duration_seconds",
+                  "How long the experiment's hooks took, by hook.")
+
+#: The methods of the experiment that are timed.
+EXPERIMENT_HOOKS = [
+    "add_node_to_network",
+    "attention_check",
+    "bonus",
+    "create_node",
+    "data_check",
+    "get_network_for_participant",
+    "info_get_request",
+    "info_post_request",
+    "node_get_request",
+    "node_post_request",
+    "recruit",
+    "submission_successful",
+    "transformation_get_request",
+    "transformation_post_request",
+    "transmission_get_request",
+    "transmission_post_request",
+    "vector_get_request",
+    "vector_post_request",
+]
+
+
+def timed_hook(name, hook):
+    """Wrap a method of the experiment to measure how long it takes."""
+    @wraps(hook)
+    def timed(*args, **kwargs):
+        started = time.time()
+        try:
+            return hook(*args, **kwargs)
+        finally:
+            metrics.observe("dallinger_hook_duration_seconds",
+                            time.time() - started, {"hook": name})
+    return timed
+
+
+@app.before_request
+def start_measuring():
+    """Start measuring the request."""
+    g.request_started = time.time()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+
+
+@app.after_request
+def note_status(response):
+    """Note the status of the response, once it is final."""
+    g.response_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def record_measurements(error=None):
+    """Record the metrics of the request."""
+    started = getattr(g, "request_started", None)
+    if started is None or getattr(g, "batch_operation", False):
+        return
+    labels = {"route": request.endpoint or "none"}
+    status = 500 if error is not None else getattr(g, "response_status", 500)
+    metrics.increment("dallinger_requests_total",
+                      dict(labels, status=status))
+    metrics.observe("dallinger_request_duration_seconds",
+                    time.time() - started, labels)
+    metrics.observe("dallinger_request_sql_statements", g.sql_statements,
+                    labels)
+    metrics.increment("dallinger_sql_seconds_total", labels, g.sql_seconds)
+    metrics.flush()
+
+
+@event.listens_for(db.engine, "before_cursor_execute")
+def _start_statement(conn, cursor, statement, parameters, context,
+                     executemany):
+    conn.info.setdefault("statements_started", []).append(time.time())
+
+
+@event.listens_for(db.engine, "after_cursor_execute")
+def _time_statement(conn, cursor, statement, parameters, context,
+                    executemany):
+    started = conn.info["statements_started"].pop()
+    if has_app_context() and getattr(g, "request_started", None):
+        g.sql_statements += 1
+        g.sql_seconds += time.time() - started
+
+
+@event.listens_for(db.engine, "handle_error")
+def _forget_statement(context):
+    started = context.connection.info.get("statements_started")
+    if started:
+        started.pop()
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """The metrics of the server, in the Prometheus text format."""
+    try:
+        text = metrics.render()
+    except RedisError:
+        return error_response(error_type="/metrics GET, Redis unavailable",
+                              status=503)
+    return Response(text, status=200,
+                    mimetype="text/plain; version=0.0.4")
+
+
 """Define functions for handling requests."""
 
 
+@app.after_request
+def commit_session(response):
+    """Commit everything a request did, once, after it has been handled.
+
+    Routes only flush the session, so that a request is a single transaction
+    however many things it creates. Nothing is committed if the request
+    failed.
+    """
+    if response.status_code >= 400:
+        session.rollback()
+        return response
+    try:
+        session.commit()
+    except Exception:
+        session.rollback()
+        return error_response(error_type="Could not commit the request",
+                              status=500)
+    return response
+
+
+@app.before_request
+def watch_transmissions():
+    """Record the transmissions the request creates, to publish them."""
+    session.info["new_transmissions"] = []
+
+
 @app.teardown_request
 def shutdown_session(_=None):
     """Rollback and close session at end of a request."""
+    if getattr(g, "batch_operation", False):
+        # The operations in a batch share the batch's session.
+        return
     session.remove()
     db.logger.debug('Closing Dallinger DB session at flask request end')
 
@@ -234,21 +479,8 @@ def advertisement():
         These arguments will have appropriate values and we should enter the
         person in the database and provide a link to the experiment popup.
     """
-    user_agent_string = request.user_agent.string
-    user_agent_obj = user_agents.parse(user_agent_string)
-    browser_ok = True
-    for rule in config.get('browser_exclude_rule', '').split(','):
-        myrule = rule.strip()
-        if myrule in ["mobile", "tablet", "touchcapable", "pc", "bot"]:
-            if (myrule == "mobile" and user_agent_obj.is_mobile) or\
-               (myrule == "tablet" and user_agent_obj.is_tablet) or\
-               (myrule == "touchcapable" and user_agent_obj.is_touch_capable) or\
-               (myrule == "pc" and user_agent_obj.is_pc) or\
-               (myrule == "bot" and user_agent_obj.is_bot):
-                browser_ok = False
-        elif myrule in user_agent_string:
-            browser_ok = False
-
+    browser_ok = browser_allowed(request.user_agent.string,
+                                 config.get('browser_exclude_rule', ''))
     if not browser_ok:
         # Handler for IE users if IE is not supported.
         raise ExperimentError('browser_type_not_allowed')
@@ -309,11 +541,8 @@ def advertisement():
     elif not status or debug_mode:
         # Participant has not yet agreed to the consent. They might not
         # even have accepted the HIT.
-        with open('templates/ad.html', 'r') as temp_file:
-            ad_string = temp_file.read()
-        ad_string = insert_mode(ad_string, config.get('mode'))
-        return render_template_string(
-            ad_string,
+        return render_template(
+            ad_template(config.get('mode')),
             hitid=hit_id,
             assignmentid=assignment_id,
             workerid=worker_id
@@ -322,20 +551,133 @@ def advertisement():
         raise ExperimentError('status_incorrectly_set')
 
 
-@app.route('/summary', methods=['GET'])
-def summary():
-    """Summarize the participants' status codes."""
+"""Cache what the ad needs, as it gets the most traffic.
+
+A compiled ad template is kept for each mode, and whether a user agent is
+allowed is remembered for the most recent user agents.
+"""
+
+AD_TEMPLATE = 'templates/ad.html'
+_ad_templates = {}
+
+#: The kinds of device that can be excluded by browser_exclude_rule.
+DEVICE_RULES = {
+    "mobile": "is_mobile",
+    "tablet": "is_tablet",
+    "touchcapable": "is_touch_capable",
+    "pc": "is_pc",
+    "bot": "is_bot",
+}
+
+
+def ad_template(mode):
+    """The ad template, with the mode inserted into it, compiled.
+
+    The template is only read and compiled again if the file changes.
+    """
+    modified = os.path.getmtime(AD_TEMPLATE)
+    cached = _ad_templates.get(mode)
+    if cached is not None and cached[0] == modified:
+        return cached[1]
+
+    with open(AD_TEMPLATE, 'r') as temp_file:
+        ad_string = temp_file.read()
+    template = app.jinja_env.from_string(insert_mode(ad_string, mode))
+    _ad_templates[mode] = (modified, template)
+    return template
+
+
+@lru_cache(maxsize=16)
+def exclusion_rules(rule_string):
+    """Split browser_exclude_rule into device attributes and other strings.
+
+    Returns the user agent attributes of the devices that are excluded, and
+    the strings that exclude a user agent that contains any of them.
+    """
+    devices = []
+    strings = []
+    for rule in rule_string.split(','):
+        rule = rule.strip()
+        if rule in DEVICE_RULES:
+            devices.append(DEVICE_RULES[rule])
+        else:
+            strings.append(rule)
+    return tuple(devices), tuple(strings)
+
+
+@lru_cache(maxsize=1024)
+def browser_allowed(user_agent_string, rule_string):
+    """Whether browser_exclude_rule allows a user agent to do the ad."""
+    devices, strings = exclusion_rules(rule_string)
+    if any(s in user_agent_string for s in strings):
+        return False
+    if devices:
+        user_agent_obj = user_agents.parse(user_agent_string)
+        if any(getattr(user_agent_obj, d) for d in devices):
+            return False
+    return True
+
+
+"""Cache the summary in Redis, so that every worker can share it.
+
+The cached summary is keyed on a version number that is incremented whenever
+a transaction that changed participants, networks or nodes is committed, and
+also expires after a few seconds in case they are changed some other way.
+"""
+
+SUMMARY_CACHE_TTL = 5
+_summarized = (models.Participant, models.Network, models.Node)
+
+
+@event.listens_for(session, "after_flush")
+def _note_summarized_changes(flushed_session, flush_context):
+    changed = chain(flushed_session.new,
+                    flushed_session.dirty,
+                    flushed_session.deleted)
+    if any(isinstance(obj, _summarized) for obj in changed):
+        flushed_session.info["summary_changed"] = True
+
+
+@event.listens_for(session, "after_bulk_update")
+def _note_summarized_bulk_update(update_context):
+    if issubclass(update_context.mapper.class_, _summarized):
+        update_context.session.info["summary_changed"] = True
+
+
+@event.listens_for(session, "after_commit")
+def _commit_summarized_changes(committed_session):
+    if committed_session.info.pop("summary_changed", False):
+        invalidate_summary()
+
+
+@event.listens_for(session, "after_rollback")
+def _forget_summarized_changes(rolled_back_session):
+    rolled_back_session.info.pop("summary_changed", None)
+
+
+@event.listens_for(db.Base.metadata, "after_drop")
+def invalidate_summary(*args, **kwargs):
+    """Make the next request for the summary recompute it."""
+    try:
+        conn.incr(redis_key("summary", "version"))
+    except RedisError:
+        app.logger.exception("Could not invalidate the cached summary")
+
+
+def summarize():
+    """Summarize the participants' status codes and the unfilled networks."""
     state = {
         "status": "success",
-        "summary": Experiment(session).log_summary(),
+        "summary": current_experiment().log_summary(),
         "completed": False,
     }
-    unfilled_nets = models.Network.query.filter(
-        models.Network.full != true()
-    ).with_entities(models.Network.id, models.Network.max_size).all()
-    working = models.Participant.query.filter_by(
-        status='working'
-    ).with_entities(func.count(models.Participant.id)).scalar()
+    working = dict(state["summary"]).get("working", 0)
+    unfilled_nets = models.Network.query\
+        .outerjoin(models.Node, models.Node.network_id == models.Network.id)\
+        .filter(models.Network.full != true())\
+        .with_entities(models.Network.max_size, func.count(models.Node.id))\
+        .group_by(models.Network.id, models.Network.max_size)\
+        .all()
     state['unfilled_networks'] = len(unfilled_nets)
     nodes_remaining = 0
     required_nodes = 0
@@ -343,18 +685,38 @@ def summary():
         if working == 0:
             state['completed'] = True
     else:
-        for net in unfilled_nets:
-            node_count = models.Node.query.filter_by(
-                network_id=net.id
-            ).with_entities(func.count(models.Node.id)).scalar()
-            net_size = net.max_size
+        for net_size, node_count in unfilled_nets:
             required_nodes += net_size
             nodes_remaining += net_size - node_count
     state['nodes_remaining'] = nodes_remaining
     state['required_nodes'] = required_nodes
+    return state
+
+
+@app.route('/summary', methods=['GET'])
+def summary():
+    """Summarize the participants' status codes."""
+    # Changes made in this transaction aren't in the cache yet.
+    session.flush()
+    if session.info.get("summary_changed"):
+        return Response(
+            dumps(summarize()),
+            status=200,
+            mimetype='application/json'
+        )
+
+    try:
+        key = redis_key("summary", conn.get(redis_key("summary", "version")))
+        js = conn.get(key)
+        if js is None:
+            js = dumps(summarize())
+            conn.setex(key, js, SUMMARY_CACHE_TTL)
+    except RedisError:
+        app.logger.exception("Could not use the cached summary")
+        js = dumps(summarize())
 
     return Response(
-        dumps(state),
+        js,
         status=200,
         mimetype='application/json'
     )
@@ -364,7 +726,7 @@ def summary():
 @app.route('/experiment/<prop>', methods=['GET'])
 def experiment_property(prop):
     """Get a property of the experiment by name."""
-    exp = Experiment(session)
+    exp = current_experiment()
     p = getattr(exp, prop)
     return success_response(field=prop, data=p, request_type=prop)
 
@@ -411,7 +773,7 @@ def request_parameter(parameter, parameter_type=None, default=None,
     or if the parameter is found but is of the wrong type
     then a Response object is returned
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # get the parameter
     try:
@@ -476,7 +838,156 @@ def assign_properties(thing):
         if property:
             setattr(thing, property_name, property)
 
-    session.commit()
+
+def page_parameters(thing_type):
+    """Get the parameters that page through and project a list of things.
+
+    since_id and limit get the things with ids above since_id, at most
+    limit of them. fields is a comma separated list of the columns of
+    thing_type to return, the id is always returned. Returns a tuple of
+    since_id, limit and the list of fields, or an error Response.
+    """
+    since_id = request_parameter(parameter="since_id",
+                                 parameter_type="int",
+                                 optional=True)
+    limit = request_parameter(parameter="limit",
+                              parameter_type="int",
+                              optional=True)
+    fields = request_parameter(parameter="fields", optional=True)
+    for x in [since_id, limit, fields]:
+        if type(x) == Response:
+            return x
+
+    if limit is not None and limit < 0:
+        return error_response(
+            error_type="{} {} request, negative limit: {}".format(
+                request.url, request.method, limit))
+
+    if fields is not None:
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+        columns = inspect(thing_type).column_attrs.keys()
+        unknown = [f for f in fields if f not in columns]
+        if unknown:
+            return error_response(
+                error_type="{} {} request, unknown fields: {}".format(
+                    request.url, request.method, ", ".join(unknown)))
+        fields = ["id"] + [f for f in fields if f != "id"]
+
+    return since_id, limit, fields
+
+
+def project(thing, fields=None):
+    """The json of a thing, with only the given fields if there are any."""
+    if fields is None:
+        return serialize(thing)
+    return dict((field, getattr(thing, field)) for field in fields)
+
+
+"""Keep the version of each network in Redis.
+
+A network's version is incremented whenever a transaction that changed the
+network, or the nodes, vectors, infos, transmissions or transformations in
+it, is committed. It is kept in Redis, rather than in the network's row, so
+that writers don't have to lock the network to bump it.
+
+The versions of all the networks are kept in one hash, along with a random
+epoch that is part of every version. The hash is deleted when the tables
+are dropped, and may be lost if Redis is flushed, and either way the epoch
+changes, so that the versions of an earlier database never come back.
+"""
+
+NETWORK_VERSIONS = ("network", "versions")
+
+
+@event.listens_for(session, "after_commit")
+def _commit_changed_networks(committed_session):
+    network_ids = committed_session.info.pop("changed_networks", None)
+    if not network_ids:
+        return
+    key = redis_key(*NETWORK_VERSIONS)
+    try:
+        pipe = conn.pipeline(transaction=False)
+        pipe.hsetnx(key, "epoch", uuid.uuid4().hex)
+        for network_id in network_ids:
+            pipe.hincrby(key, network_id, 1)
+        pipe.execute()
+    except RedisError:
+        app.logger.exception("Could not update the versions of networks")
+
+
+@event.listens_for(session, "after_rollback")
+def _forget_changed_networks(rolled_back_session):
+    rolled_back_session.info.pop("changed_networks", None)
+
+
+@event.listens_for(db.Base.metadata, "after_drop")
+def _reset_network_versions(*args, **kwargs):
+    try:
+        conn.delete(redis_key(*NETWORK_VERSIONS))
+    except RedisError:
+        app.logger.exception("Could not reset the versions of networks")
+
+
+def network_version(network_id=None, node_id=None):
+    """Get the version of a network, or of the network of a node.
+
+    Returns the network's id, the epoch of the versions and the number of
+    times the network has changed, or None if there is no such network or
+    node, or if Redis can't be reached.
+    """
+    if node_id is not None:
+        found = session.query(models.Node.network_id)\
+            .filter(models.Node.id == node_id).first()
+    else:
+        found = session.query(models.Network.id.label("network_id"))\
+            .filter(models.Network.id == network_id).first()
+    if found is None or found.network_id is None:
+        return None
+    network_id = found.network_id
+
+    key = redis_key(*NETWORK_VERSIONS)
+    try:
+        epoch, count = conn.hmget(key, "epoch", network_id)
+        if epoch is None:
+            conn.hsetnx(key, "epoch", uuid.uuid4().hex)
+            epoch = conn.hget(key, "epoch")
+    except RedisError:
+        return None
+    return network_id, epoch, int(count or 0)
+
+
+def versioned_by_network(route):
+    """Tag the responses of a GET route with the version of its network.
+
+    The route must take a network_id or a node_id. Its responses get a weak
+    ETag made of the network's id and version. If the request's If-None-Match
+    has the current tag nothing in the network has changed, so a 304 is sent
+    without running the route, or the experiment's hook. Responses of
+    requests that changed the network aren't tagged, as its new version is
+    only known once they are committed.
+    """
+    @wraps(route)
+    def versioned_route(**kwargs):
+        found = network_version(network_id=kwargs.get("network_id"),
+                                node_id=kwargs.get("node_id"))
+        if found is None:
+            return route(**kwargs)
+
+        network_id = found[0]
+        tag = ".".join(unicode(part) for part in found)
+        if request.if_none_match.contains_weak(tag):
+            response = Response(status=304)
+            response.set_etag(tag, weak=True)
+            return response
+
+        response = make_response(route(**kwargs))
+        if response.status_code == 200:
+            # The route may have changed the network itself.
+            session.flush()
+            if network_id not in session.info.get("changed_networks", ()):
+                response.set_etag(tag, weak=True)
+        return response
+    return versioned_route
 
 
 @app.route("/participant/<worker_id>/<hit_id>/<assignment_id>/<mode>",
@@ -519,12 +1030,12 @@ def create_participant(worker_id, hit_id, assignment_id, mode):
         mode=mode
     )
     session.add(participant)
-    session.commit()
+    session.flush()
 
     # return the data
     return success_response(
         field="participant",
-        data=participant.__json__(),
+        data=serialize(participant),
         request_type="participant post"
     )
 
@@ -541,15 +1052,27 @@ def get_participant(participant_id):
 
     # return the data
     return success_response(field="participant",
-                            data=ppt.__json__(),
+                            data=serialize(ppt),
                             request_type="participant get")
 
 
 @app.route("/network/<network_id>", methods=["GET"])
+@versioned_by_network
 def get_network(network_id):
-    """Get the network with the given id."""
+    """Get the network with the given id.
+
+    You can pass fields to only get some of its columns.
+    """
+    page = page_parameters(models.Network)
+    if type(page) == Response:
+        return page
+    _, _, fields = page
+
+    net = models.Network.query.filter_by(id=network_id)
+    if fields is not None:
+        net = net.options(load_only(*fields))
     try:
-        net = models.Network.query.filter_by(id=network_id).one()
+        net = net.one()
     except NoResultFound:
         return error_response(
             error_type="/network GET: no network found",
@@ -557,7 +1080,7 @@ def get_network(network_id):
 
     # return the data
     return success_response(field="network",
-                            data=net.__json__(),
+                            data=project(net, fields),
                             request_type="network get")
 
 
@@ -594,7 +1117,7 @@ def create_question(participant_id):
         # execute the request
         models.Question(participant=ppt, question=question,
                         response=response, number=number)
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="/question POST server error",
                               status=403)
@@ -603,7 +1126,71 @@ def create_question(participant_id):
     return success_response(request_type="question post")
 
 
+@app.route("/questions/<participant_id>", methods=["POST"])
+def create_questions(participant_id):
+    """Create all of a participant's questions at once.
+
+    Pass a JSON body with a list of questions, each with a question
+    (string), number (int) and response (string), e.g. all the answers to a
+    questionnaire. The questions are checked and then inserted together, so
+    either all of them are saved or none are.
+    """
+    # Get the participant.
+    try:
+        ppt = models.Participant.query.filter_by(id=participant_id).one()
+    except NoResultFound:
+        return error_response(
+            error_type="/questions POST no participant found",
+            status=403)
+
+    # Make sure the participant status is "working" or we're in debug mode
+    if ppt.status != "working" and config.get('mode', None) != 'debug':
+        error_type = "/questions POST, status = {}".format(ppt.status)
+        return error_response(error_type=error_type,
+                              participant=ppt)
+
+    if ppt.failed:
+        return error_response(error_type="/questions POST, failed participant",
+                              participant=ppt)
+
+    body = request.get_json(silent=True) or {}
+    questions = body.get("questions")
+    if not isinstance(questions, list):
+        return error_response(error_type="/questions POST, no questions",
+                              participant=ppt)
+
+    rows = []
+    for q in questions:
+        try:
+            number = int(q["number"])
+            question = q["question"]
+            response = q["response"]
+        except (KeyError, TypeError, ValueError):
+            question = response = None
+        if question is None or response is None:
+            return error_response(
+                error_type="/questions POST, bad question: {}".format(q),
+                participant=ppt)
+        rows.append({
+            "type": "question",
+            "participant_id": ppt.id,
+            "question": unicode(question),
+            "response": unicode(response),
+            "number": number,
+        })
+
+    try:
+        if rows:
+            session.execute(models.Question.__table__.insert().values(rows))
+    except Exception:
+        return error_response(error_type="/questions POST server error",
+                              status=403)
+
+    return success_response(request_type="questions post")
+
+
 @app.route("/node/<int:node_id>/neighbors", methods=["GET"])
+@versioned_by_network
 def node_neighbors(node_id):
     """Send a GET request to the node table.
 
@@ -611,12 +1198,14 @@ def node_neighbors(node_id):
     making the request and returns a list of descriptions of
     the nodes (even if there is only one).
     Required arguments: participant_id, node_id
-    Optional arguments: type, failed, connection
+    Optional arguments: type, failed, connection, since_id, limit, fields
+
+    Neighbors are never failed, so failed can only be false.
 
     After getting the neighbours it also calls
     exp.node_get_request()
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # get the parameters
     node_type = request_parameter(parameter="node_type",
@@ -629,6 +1218,13 @@ def node_neighbors(node_id):
     for x in [node_type, failed, connection]:
         if type(x) == Response:
             return x
+    if failed:
+        return error_response(
+            error_type="/node/neighbors, failed neighbors cannot be got")
+    page = page_parameters(node_type)
+    if type(page) == Response:
+        return page
+    since_id, limit, fields = page
 
     # make sure the node exists
     node = models.Node.query.get(node_id)
@@ -636,25 +1232,29 @@ def node_neighbors(node_id):
         return error_response(
             error_type="/node/neighbors, node does not exist",
             error_text="/node/{}/neighbors, node {} does not exist"
-            .format(node_id))
+            .format(node_id, node_id))
 
     # get its neighbors
-    nodes = node.neighbours(
+    nodes = node.neighbors(
         type=node_type,
-        failed=failed,
-        connection=connection)
+        direction=connection)
+    if since_id is not None or limit is not None:
+        nodes = sorted((n for n in nodes
+                        if since_id is None or n.id > since_id),
+                       key=attrgetter("id"))
+        nodes = nodes[:limit]
 
     try:
         # ping the experiment
         exp.node_get_request(
             node=node,
             nodes=nodes)
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="exp.node_get_request")
 
     return success_response(field="nodes",
-                            data=[n.__json__() for n in nodes],
+                            data=[project(n, fields) for n in nodes],
                             request_type="neighbors")
 
 
@@ -668,7 +1268,7 @@ def create_node(participant_id):
         3. exp.add_node_to_network
         4. exp.node_post_request
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # Get the participant.
     try:
@@ -701,11 +1301,11 @@ def create_node(participant_id):
             node=node,
             network=network)
 
-        session.commit()
+        session.flush()
 
         # ping the experiment
         exp.node_post_request(participant=participant, node=node)
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="/node POST server error",
                               status=403,
@@ -713,19 +1313,20 @@ def create_node(participant_id):
 
     # return the data
     return success_response(field="node",
-                            data=node.__json__(),
+                            data=serialize(node),
                             request_type="/node POST")
 
 
 @app.route("/node/<int:node_id>/vectors", methods=["GET"])
+@versioned_by_network
 def node_vectors(node_id):
     """Get the vectors of a node.
 
     You must specify the node id in the url.
     You can pass direction (incoming/outgoing/all) and failed
-    (True/False/all).
+    (True/False/all), and since_id, limit and fields.
     """
-    exp = Experiment(session)
+    exp = current_experiment()
     # get the parameters
     direction = request_parameter(parameter="direction", default="all")
     failed = request_parameter(parameter="failed",
@@ -733,6 +1334,10 @@ def node_vectors(node_id):
     for x in [direction, failed]:
         if type(x) == Response:
             return x
+    page = page_parameters(models.Vector)
+    if type(page) == Response:
+        return page
+    since_id, limit, fields = page
 
     # execute the request
     node = models.Node.query.get(node_id)
@@ -740,9 +1345,10 @@ def node_vectors(node_id):
         return error_response(error_type="/node/vectors, node does not exist")
 
     try:
-        vectors = node.vectors(direction=direction, failed=failed)
+        vectors = node.vectors(direction=direction, failed=failed,
+                               since_id=since_id, limit=limit, fields=fields)
         exp.vector_get_request(node=node, vectors=vectors)
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="/node/vectors GET server error",
                               status=403,
@@ -750,7 +1356,7 @@ def node_vectors(node_id):
 
     # return the data
     return success_response(field="vectors",
-                            data=[v.__json__() for v in vectors],
+                            data=[project(v, fields) for v in vectors],
                             request_type="vector get")
 
 
@@ -762,7 +1368,7 @@ def connect(node_id, other_node_id):
     The ids of both nodes must be speficied in the url.
     You can also pass direction (to/from/both) as an argument.
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # get the parameters
     direction = request_parameter(parameter="direction", default="to")
@@ -791,24 +1397,25 @@ def connect(node_id, other_node_id):
             node=node,
             vectors=vectors)
 
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="/vector POST server error",
                               status=403,
                               participant=node.participant)
 
     return success_response(field="vectors",
-                            data=[v.__json__() for v in vectors],
+                            data=[serialize(v) for v in vectors],
                             request_type="vector post")
 
 
 @app.route("/info/<int:node_id>/<int:info_id>", methods=["GET"])
+@versioned_by_network
 def get_info(node_id, info_id):
     """Get a specific info.
 
     Both the node and info id must be specified in the url.
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # check the node exists
     node = models.Node.query.get(node_id)
@@ -831,7 +1438,7 @@ def get_info(node_id, info_id):
     try:
         # ping the experiment
         exp.info_get_request(node=node, infos=info)
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="/info GET server error",
                               status=403,
@@ -839,18 +1446,19 @@ def get_info(node_id, info_id):
 
     # return the data
     return success_response(field="info",
-                            data=info.__json__(),
+                            data=serialize(info),
                             request_type="info get")
 
 
 @app.route("/node/<int:node_id>/infos", methods=["GET"])
+@versioned_by_network
 def node_infos(node_id):
     """Get all the infos of a node.
 
     The node id must be specified in the url.
-    You can also pass info_type.
+    You can also pass info_type, and since_id, limit and fields.
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # get the parameters
     info_type = request_parameter(parameter="info_type",
@@ -858,6 +1466,10 @@ def node_infos(node_id):
                                   default=models.Info)
     if type(info_type) == Response:
         return info_type
+    page = page_parameters(info_type)
+    if type(page) == Response:
+        return page
+    since_id, limit, fields = page
 
     # check the node exists
     node = models.Node.query.get(node_id)
@@ -866,32 +1478,34 @@ def node_infos(node_id):
 
     try:
         # execute the request:
-        infos = node.infos(type=info_type)
+        infos = node.infos(type=info_type, since_id=since_id, limit=limit,
+                           fields=fields)
 
         # ping the experiment
         exp.info_get_request(
             node=node,
             infos=infos)
 
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="/node/infos GET server error",
                               status=403,
                               participant=node.participant)
 
     return success_response(field="infos",
-                            data=[i.__json__() for i in infos],
+                            data=[project(i, fields) for i in infos],
                             request_type="infos")
 
 
 @app.route("/node/<int:node_id>/received_infos", methods=["GET"])
+@versioned_by_network
 def node_received_infos(node_id):
     """Get all the infos a node has been sent and has received.
 
     You must specify the node id in the url.
-    You can also pass the info type.
+    You can also pass the info type, and since_id, limit and fields.
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # get the parameters
     info_type = request_parameter(parameter="info_type",
@@ -899,6 +1513,10 @@ def node_received_infos(node_id):
                                   default=models.Info)
     if type(info_type) == Response:
         return info_type
+    page = page_parameters(info_type)
+    if type(page) == Response:
+        return page
+    since_id, limit, fields = page
 
     # check the node exists
     node = models.Node.query.get(node_id)
@@ -906,7 +1524,8 @@ def node_received_infos(node_id):
         return error_response(error_type="/node/infos, node does not exist")
 
     # execute the request:
-    infos = node.received_infos(type=info_type)
+    infos = node.received_infos(type=info_type, since_id=since_id,
+                                limit=limit, fields=fields)
 
     try:
         # ping the experiment
@@ -914,14 +1533,14 @@ def node_received_infos(node_id):
             node=node,
             infos=infos)
 
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="info_get_request error",
                               status=403,
                               participant=node.participant)
 
     return success_response(field="infos",
-                            data=[i.__json__() for i in infos],
+                            data=[project(i, fields) for i in infos],
                             request_type="received infos")
 
 
@@ -936,7 +1555,7 @@ def info_post(node_id):
     If info_type is a custom subclass of Info it must be
     added to the known_classes of the experiment class.
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # get the parameters
     info_type = request_parameter(parameter="info_type",
@@ -962,7 +1581,7 @@ def info_post(node_id):
             node=node,
             info=info)
 
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="/info POST server error",
                               status=403,
@@ -970,19 +1589,22 @@ def info_post(node_id):
 
     # return the data
     return success_response(field="info",
-                            data=info.__json__(),
+                            data=serialize(info),
                             request_type="info post")
 
 
 @app.route("/node/<int:node_id>/transmissions", methods=["GET"])
+@versioned_by_network
 def node_transmissions(node_id):
     """Get all the transmissions of a node.
 
     The node id must be specified in the url.
     You can also pass direction (to/from/all) or status (all/pending/received)
-    as arguments.
+    as arguments, and since_id, limit and fields. Pending incoming
+    transmissions are received; if only a page of the transmissions is
+    asked for, only those in the page are.
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # get the parameters
     direction = request_parameter(parameter="direction", default="incoming")
@@ -990,6 +1612,10 @@ def node_transmissions(node_id):
     for x in [direction, status]:
         if type(x) == Response:
             return x
+    page = page_parameters(models.Transmission)
+    if type(page) == Response:
+        return page
+    since_id, limit, fields = page
 
     # check the node exists
     node = models.Node.query.get(node_id)
@@ -998,15 +1624,19 @@ def node_transmissions(node_id):
             error_type="/node/transmissions, node does not exist")
 
     # execute the request
-    transmissions = node.transmissions(direction=direction, status=status)
+    transmissions = node.transmissions(direction=direction, status=status,
+                                       since_id=since_id, limit=limit,
+                                       fields=fields)
 
     try:
         if direction in ["incoming", "all"] and status in ["pending", "all"]:
-            node.receive()
-            session.commit()
+            if since_id is None and limit is None:
+                node.receive()
+            else:
+                node.receive(what=transmissions)
         # ping the experiment
         exp.transmission_get_request(node=node, transmissions=transmissions)
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(
             error_type="/node/transmissions GET server error",
@@ -1015,7 +1645,7 @@ def node_transmissions(node_id):
 
     # return the data
     return success_response(field="transmissions",
-                            data=[t.__json__() for t in transmissions],
+                            data=[project(t, fields) for t in transmissions],
                             request_type="transmissions")
 
 
@@ -1051,7 +1681,7 @@ def node_transmit(node_id):
         },
     });
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     what = request_parameter(parameter="what", optional=True)
     to_whom = request_parameter(parameter="to_whom", optional=True)
@@ -1065,7 +1695,7 @@ def node_transmit(node_id):
     if what is not None:
         try:
             what = int(what)
-            what = models.Info.get(what)
+            what = models.Info.query.get(what)
             if what is None:
                 return error_response(
                     error_type="/node/transmit POST, info does not exist",
@@ -1082,10 +1712,11 @@ def node_transmit(node_id):
     if to_whom is not None:
         try:
             to_whom = int(to_whom)
-            to_whom = models.Node.get(to_whom)
-            if what is None:
+            to_whom = models.Node.query.get(to_whom)
+            if to_whom is None:
                 return error_response(
-                    error_type="/node/transmit POST, info does not exist",
+                    error_type="/node/transmit POST, recipient Node does "
+                               "not exist",
                     participant=node.participant)
         except Exception:
             try:
@@ -1098,25 +1729,135 @@ def node_transmit(node_id):
     # execute the request
     try:
         transmissions = node.transmit(what=what, to_whom=to_whom)
+        if not isinstance(transmissions, list):
+            transmissions = [transmissions]
         for t in transmissions:
             assign_properties(t)
-        session.commit()
+        session.flush()
         # ping the experiment
         exp.transmission_post_request(
             node=node,
             transmissions=transmissions)
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="/node/transmit POST, server error",
                               participant=node.participant)
 
     # return the data
     return success_response(field="transmissions",
-                            data=[t.__json__() for t in transmissions],
+                            data=[serialize(t) for t in transmissions],
                             request_type="transmit")
 
 
+"""Push new transmissions to the nodes they are sent to.
+
+Once the transmissions a request created have been committed, each is
+published on a Redis channel for the node it was sent to, from which
+/node/<id>/stream relays it to the browser.
+"""
+
+STREAM_TIMEOUT = 25
+STREAM_KEEPALIVE = 10
+
+
+def stream_channel(node_id):
+    """The name of the Redis channel for transmissions sent to a node."""
+    return redis_key("node", node_id, "transmissions")
+
+
+@event.listens_for(session, "after_commit")
+def _publish_transmissions(committed_session):
+    transmissions = committed_session.info.get("new_transmissions")
+    if not transmissions:
+        return
+    committed_session.info["new_transmissions"] = []
+    try:
+        pipe = conn.pipeline(transaction=False)
+        for t in transmissions:
+            pipe.publish(stream_channel(t["destination_id"]),
+                         serialization.dumps(t))
+        pipe.execute()
+    except RedisError:
+        app.logger.exception("Could not publish new transmissions")
+
+
+@event.listens_for(session, "after_rollback")
+def _forget_transmissions(rolled_back_session):
+    if rolled_back_session.info.get("new_transmissions"):
+        rolled_back_session.info["new_transmissions"] = []
+
+
+def server_sent_event(event_type, data):
+    """Format an event for a text/event-stream response."""
+    lines = ["event: {}".format(event_type)]
+    lines.extend("data: {}".format(line) for line in data.splitlines())
+    return "\n".join(lines) + "\n\n"
+
+
+@app.route("/node/<int:node_id>/stream", methods=["GET"])
+def node_stream(node_id):
+    """Stream the transmissions sent to a node as server-sent events.
+
+    The node id must be specified in the url.
+
+    Each transmission is sent as a "transmission" event whose data is the
+    json of the transmission, starting with any that are still pending.
+    Transmissions are not marked as received, get them from
+    /node/<id>/transmissions to do that. The stream ends after
+    STREAM_TIMEOUT seconds and the browser then reconnects. Experiments that
+    stream should set worker_class to gevent, as each open stream would
+    otherwise hold a worker.
+    """
+    node = models.Node.query.get(node_id)
+    if node is None:
+        return error_response(error_type="/node/stream, node does not exist")
+
+    # Subscribe before reading the pending transmissions so none are missed.
+    try:
+        pubsub = conn.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(stream_channel(node_id))
+    except RedisError:
+        return error_response(error_type="/node/stream, cannot subscribe",
+                              status=503,
+                              participant=node.participant)
+
+    pending = [
+        serialization.dumps(serialize(t))
+        for t in node.transmissions(direction="incoming", status="pending")
+    ]
+
+    deadline = time.time() + STREAM_TIMEOUT
+
+    def stream():
+        try:
+            # Start the response straight away, so the browser knows the
+            # stream is open before anything is sent to the node.
+            yield ": connected\n\n"
+            for js in pending:
+                yield server_sent_event("transmission", js)
+            last_sent = time.time()
+            while time.time() < deadline:
+                message = pubsub.get_message(
+                    timeout=min(1.0, max(deadline - time.time(), 0)))
+                if message is not None:
+                    yield server_sent_event("transmission", message["data"])
+                    last_sent = time.time()
+                elif time.time() - last_sent > STREAM_KEEPALIVE:
+                    yield ": keepalive\n\n"
+                    last_sent = time.time()
+        finally:
+            pubsub.close()
+
+    return Response(
+        stream(),
+        status=200,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route("/node/<int:node_id>/transformations", methods=["GET"])
+@versioned_by_network
 def transformation_get(node_id):
     """Get all the transformations of a node.
 
@@ -1124,7 +1865,7 @@ def transformation_get(node_id):
 
     You can also pass transformation_type.
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # get the parameters
     transformation_type = request_parameter(parameter="transformation_type",
@@ -1146,14 +1887,14 @@ def transformation_get(node_id):
         # ping the experiment
         exp.transformation_get_request(node=node,
                                        transformations=transformations)
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="/node/tranaformations GET failed",
                               participant=node.participant)
 
     # return the data
     return success_response(field="transformations",
-                            data=[t.__json__() for t in transformations],
+                            data=[serialize(t) for t in transformations],
                             request_type="transformations")
 
 
@@ -1166,7 +1907,7 @@ def transformation_post(node_id, info_in_id, info_out_id):
     The ids of the node, info in and info out must all be in the url.
     You can also pass transformation_type.
     """
-    exp = Experiment(session)
+    exp = current_experiment()
 
     # Get the parameters.
     transformation_type = request_parameter(parameter="transformation_type",
@@ -1198,22 +1939,141 @@ def transformation_post(node_id, info_in_id, info_out_id):
         transformation = transformation_type(info_in=info_in,
                                              info_out=info_out)
         assign_properties(transformation)
-        session.commit()
+        session.flush()
 
         # ping the experiment
         exp.transformation_post_request(node=node,
                                         transformation=transformation)
-        session.commit()
+        session.flush()
     except Exception:
         return error_response(error_type="/tranaformation POST failed",
                               participant=node.participant)
 
     # return the data
     return success_response(field="transformation",
-                            data=transformation.__json__(),
+                            data=serialize(transformation),
                             request_type="transformation post")
 
 
+"""Run several API requests at once."""
+
+#: The routes that can be used in a batch.
+BATCH_ROUTES = [
+    "create_node",
+    "create_question",
+    "get_info",
+    "get_network",
+    "get_participant",
+    "info_post",
+    "node_infos",
+    "node_neighbors",
+    "node_received_infos",
+    "node_transmissions",
+    "node_transmit",
+    "node_vectors",
+    "transformation_get",
+    "transformation_post",
+]
+
+_batch_reference = re.compile(r"\$(\d+)((?:\.\w+)+)")
+
+
+def resolve_batch_references(value, results):
+    """Fill in references to the results of earlier operations in a batch.
+
+    A reference is a $, the index of the operation and the keys of the value
+    wanted from its result, e.g. "$0.info.id". References can be anywhere in
+    a string, so "/node/$0.node.id/infos" works too.
+    """
+    if isinstance(value, dict):
+        return dict((k, resolve_batch_references(v, results))
+                    for k, v in value.items())
+    if isinstance(value, list):
+        return [resolve_batch_references(v, results) for v in value]
+    if not isinstance(value, (str, unicode)):
+        return value
+
+    def lookup(match):
+        found = results[int(match.group(1))]
+        for key in match.group(2).split(".")[1:]:
+            found = found[int(key) if isinstance(found, list) else key]
+        return unicode(found)
+
+    return _batch_reference.sub(lookup, value)
+
+
+def run_batch_operation(operation, results):
+    """Run one operation of a batch with the route that usually handles it."""
+    method = operation.get("method", "GET").upper()
+    try:
+        url = resolve_batch_references(operation["url"], results)
+        data = resolve_batch_references(operation.get("data", {}), results)
+    except (KeyError, IndexError, TypeError, ValueError):
+        return error_response(error_type="/batch POST, bad operation")
+
+    path, _, query_string = url.partition("?")
+    adapter = app.url_map.bind_to_environ(request.environ)
+    try:
+        endpoint, view_args = adapter.match(path, method=method)
+    except HTTPException:
+        endpoint = None
+    if endpoint not in BATCH_ROUTES:
+        return error_response(
+            error_type="/batch POST, {} {} cannot be batched".format(
+                method, url))
+
+    # The data of a GET are its query string, along with any in the url.
+    try:
+        if method == "GET":
+            args = url_decode(query_string)
+            args.update(data)
+            context = app.test_request_context(path, method=method,
+                                               query_string=args)
+        else:
+            context = app.test_request_context(url, method=method, data=data)
+    except (TypeError, ValueError):
+        return error_response(error_type="/batch POST, bad operation")
+    with context:
+        return app.view_functions[endpoint](**view_args)
+
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    """Run several API requests in one HTTP request.
+
+    Pass a JSON body with a list of operations, each with the method, url
+    and data of an API request, e.g. {"method": "POST", "url": "/info/1",
+    "data": {"contents": "foo"}}. The operations are run in order, by the
+    routes that usually handle them, in a single transaction. An operation
+    can use the result of an earlier one with a reference like "$0.info.id".
+    Returns the results of the operations as a list. If an operation fails
+    nothing is saved and its error is returned, along with its index.
+    """
+    body = request.get_json(silent=True) or {}
+    operations = body.get("operations")
+    if not isinstance(operations, list):
+        return error_response(error_type="/batch POST, no operations")
+
+    results = []
+    g.batch_operation = True
+    try:
+        for i, operation in enumerate(operations):
+            response = run_batch_operation(operation, results)
+            data = loads(response.get_data())
+            if response.status_code >= 400:
+                data["operation"] = i
+                return Response(dumps(data),
+                                status=response.status_code,
+                                mimetype='application/json')
+            results.append(data)
+    finally:
+        g.batch_operation = False
+
+    return success_response(field="results",
+                            data=results,
+                            request_type="batch")
+
+
 @app.route("/notifications", methods=["POST", "GET"])
 def api_notifications():
     """Receive MTurk REST notifications."""
@@ -1407,11 +2267,6 @@ def worker_function(event_type, assignment_id, participant_id):
     session.commit()
 
 
-def date_handler(obj):
-    """Serialize dates."""
-    return obj.isoformat() if hasattr(obj, 'isoformat') else obj
-
-
 # Insert "mode" into pages so it's carried from page to page done server-side
 # to avoid breaking backwards compatibility with old templates.
 def insert_mode(page_html, mode):
@@ -8,8 +8,6 @@ import logging
 
 logger = logging.getLogger(__file__)
 
-app = util.import_app("dallinger.experiment_server.experiment_server:app")
-
 
 def when_ready(arbiter):
     # Signal to parent process that server has started
@@ -44,8 +42,12 @@ class StandaloneServer(Application):
         return cfg
 
     def load(self):
-        """Return our application to be run."""
-        return app
+        """Return our application to be run.
+
+        It is imported in each worker rather than in the arbiter.
+        """
+        return util.import_app(
+            "dallinger.experiment_server.experiment_server:app")
 
     def load_user_config(self):
         config = get_config()
@@ -59,6 +61,7 @@ class StandaloneServer(Application):
         self.options = {
             'bind': bind_address,
             'workers': workers,
+            'worker_class': config.get("worker_class"),
             'loglevels': self.loglevels,
             'loglevel': self.loglevels[config.get("loglevel")],
             'accesslog': config.get("logfile"),
@@ -71,6 +74,8 @@ class StandaloneServer(Application):
 
 def launch():
     config = get_config()
+    if not config.ready:
+        config.load()
     LOG_LEVELS = [
         logging.DEBUG,
         logging.INFO,
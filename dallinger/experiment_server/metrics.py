@@ -0,0 +1,152 @@
+"""Measure what the experiment server does, to find out what is slow.
+
+Metrics are counters and histograms, each sample of which is named like a
+line of the Prometheus text format, e.g. dallinger_requests_total{route=
+"node_transmit",status="200"}. Each process adds up its own samples and
+adds them to a hash in Redis every FLUSH_INTERVAL seconds, so the totals
+are across all of the server's workers.
+"""
+
+from collections import defaultdict
+import logging
+import threading
+import time
+
+from redis.exceptions import RedisError
+
+from dallinger.compat import unicode
+
+logger = logging.getLogger(__file__)
+
+#: How often, in seconds, each process adds its samples to the totals.
+FLUSH_INTERVAL = 1.0
+
+#: The upper bounds of the buckets of histograms of durations, in seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+
+#: The upper bounds of the buckets of histograms of counts.
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _labels(labels):
+    return ",".join('{}="{}"'.format(k, _escape(v))
+                    for k, v in sorted(labels.items()))
+
+
+def _escape(value):
+    return unicode(value).replace("\\", "\\\\").replace('"', '\\"')\
+        .replace("\n", "\\n")
+
+
+def _sample(name, labels):
+    return "{}{{{}}}".format(name, _labels(labels)) if labels else name
+
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+class Metrics(object):
+    """Counters and histograms whose totals are kept in Redis.
+
+    The totals are kept in the Redis hash named key.
+    """
+
+    def __init__(self, connection, key):
+        self.connection = connection
+        self.key = key
+        self.families = {}
+        self._pending = defaultdict(float)
+        self._lock = threading.Lock()
+        self._flushed = time.time()
+
+    def counter(self, name, description):
+        """Describe a counter."""
+        self.families[name] = ("counter", description, None)
+
+    def histogram(self, name, description, buckets=DURATION_BUCKETS):
+        """Describe a histogram, with buckets for values up to each bound."""
+        self.families[name] = ("histogram", description, tuple(buckets))
+
+    def increment(self, name, labels=None, amount=1):
+        """Add to a counter."""
+        with self._lock:
+            self._pending[_sample(name, labels or {})] += amount
+
+    def observe(self, name, value, labels=None):
+        """Add a value to a histogram."""
+        labels = labels or {}
+        buckets = self.families[name][2]
+        with self._lock:
+            for bound in buckets:
+                # Empty buckets are added to as well, so they are listed.
+                le = dict(labels, le=_format_bound(bound))
+                self._pending[_sample(name + "_bucket", le)] += \
+                    1 if value <= bound else 0
+            le = dict(labels, le="+Inf")
+            self._pending[_sample(name + "_bucket", le)] += 1
+            self._pending[_sample(name + "_sum", labels)] += value
+            self._pending[_sample(name + "_count", labels)] += 1
+
+    def flush(self, force=False):
+        """Add this process's samples to the totals in Redis.
+
+        Unless force is True this only happens every FLUSH_INTERVAL seconds.
+        """
+        if not force and time.time() - self._flushed < FLUSH_INTERVAL:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+            self._flushed = time.time()
+        if not pending:
+            return
+        try:
+            pipe = self.connection.pipeline(transaction=False)
+            for sample, amount in pending.items():
+                pipe.hincrbyfloat(self.key, sample, amount)
+            pipe.execute()
+        except RedisError:
+            logger.exception("Could not save the metrics")
+
+    def totals(self):
+        """The totals of every sample, across all processes."""
+        self.flush(force=True)
+        return dict((sample, float(total)) for sample, total in
+                    self.connection.hgetall(self.key).items())
+
+    def render(self):
+        """The totals in the Prometheus text format."""
+        samples = defaultdict(list)
+        for sample, total in self.totals().items():
+            samples[self._family(sample)].append((sample, total))
+
+        lines = []
+        for name in sorted(samples):
+            if name in self.families:
+                kind, description, _ = self.families[name]
+                lines.append("# HELP {} {}".format(name, description))
+                lines.append("# TYPE {} {}".format(name, kind))
+            for sample, total in sorted(samples[name], key=_sample_order):
+                lines.append("{} {}".format(sample, repr(total)))
+        return "\n".join(lines) + "\n"
+
+    def _family(self, sample):
+        name = sample.split("{")[0]
+        for suffix in ("_bucket", "_sum", "_count"):
+            base = name[:-len(suffix)]
+            if (name.endswith(suffix) and
+                    self.families.get(base, ("",))[0] == "histogram"):
+                return base
+        return name
+
+
+def _sample_order(sample_and_total):
+    """Order samples by name and labels, and buckets by their bound."""
+    sample = sample_and_total[0]
+    for label in ('{le="', ',le="'):
+        if label in sample:
+            start = sample.index(label) + len(label)
+            end = sample.index('"', start)
+            return (sample[:start] + sample[end:], float(sample[start:end]))
+    return (sample, 0)
@@ -1,4 +1,7 @@
+from collections import OrderedDict
 from functools import update_wrapper
+import threading
+
 from flask import make_response
 
 
@@ -10,3 +13,31 @@ def nocache(func):
         resp.cache_control.no_cache = True
         return resp
     return update_wrapper(new_func, func)
+
+
+def lru_cache(maxsize=128):
+    """Remember the results of the most recent calls of a function.
+
+    Like functools.lru_cache in Python 3, the arguments must be hashable and
+    the wrapped function has a cache_clear method.
+    """
+    def decorator(func):
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        def new_func(*args):
+            """LRU cache wrapper."""
+            with lock:
+                if args in cache:
+                    result = cache[args] = cache.pop(args)
+                    return result
+            result = func(*args)
+            with lock:
+                cache[args] = result
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return result
+
+        new_func.cache_clear = cache.clear
+        return update_wrapper(new_func, func)
+    return decorator
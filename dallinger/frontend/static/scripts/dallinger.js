@@ -108,16 +108,88 @@ create_participant = function() {
     }
 };
 
+// call callback with each transmission sent to a node, as it is sent
+streamTransmissions = function (node_id, callback) {
+    var seen = {};
+    var source = new EventSource("/node/" + node_id + "/stream");
+    source.addEventListener("transmission", function (e) {
+        var transmission = JSON.parse(e.data);
+        // pending transmissions are sent again whenever the stream reconnects
+        if (!seen[transmission.id]) {
+            seen[transmission.id] = true;
+            callback(transmission);
+        }
+    });
+    return source;
+};
+
+// run several requests in one, e.g.
+// batchRequest([
+//     {method: "post", url: "/info/" + my_node_id, data: {contents: "foo"}},
+//     {method: "post", url: "/node/" + my_node_id + "/transmit",
+//      data: {what: "$0.info.id"}}
+// ], function (results) { ... });
+// "$0.info.id" is replaced by the id of the info made by the first request.
+batchRequest = function (operations, success) {
+    reqwest({
+        url: "/batch",
+        method: "post",
+        type: "json",
+        contentType: "application/json",
+        data: JSON.stringify({operations: operations}),
+        success: function (resp) {
+            success(resp.results);
+        },
+        error: function (err) {
+            console.log(err);
+            errorResponse = JSON.parse(err.response);
+            if (errorResponse.hasOwnProperty("html")) {
+                $("body").html(errorResponse.html);
+            }
+        }
+    });
+};
+
 lock = false;
 
 submitResponses = function () {
-    submitNextResponse(0);
-    submitAssignment();
+    submitQuestionnaire(submitAssignment);
 };
 
 submit_responses = function () {
     submitResponses();
-    submitAssignment();
+};
+
+// submit all the responses to the questionnaire in one request
+submitQuestionnaire = function (success) {
+    questions = $("form .question select, input, textarea").map(
+        function (n) {
+            return {
+                question: $(this).attr("name"),
+                number: n + 1,
+                response: $(this).val()
+            };
+        }
+    ).get();
+
+    reqwest({
+        url: "/questions/" + participant_id,
+        method: "post",
+        type: "json",
+        contentType: "application/json",
+        data: JSON.stringify({questions: questions}),
+        success: function (resp) {
+            if (success !== undefined) {
+                success(resp);
+            }
+        },
+        error: function (err) {
+            errorResponse = JSON.parse(err.response);
+            if (errorResponse.hasOwnProperty("html")) {
+                $("body").html(errorResponse.html);
+            }
+        }
+    });
 };
 
 submitNextResponse = function (n) {
@@ -0,0 +1,430 @@
+"""An optional in-process cache of the topology of networks.
+
+Networks look at their own topology every time a node is added: which node
+came first or last, who is connected to whom and how many connections each
+node has. By default that information is read from the database on demand.
+When the cache is enabled, each process instead keeps a copy of every
+network's topology it has looked at, and keeps it up to date as nodes and
+vectors are inserted or failed in that process.
+
+The cache only sees writes made by the current process, so it should only be
+enabled when a single process writes to the networks in question, e.g. when
+running simulations. It is dropped whenever a transaction is rolled back,
+nodes or vectors are updated in bulk or the tables are dropped.
+"""
+
+from collections import OrderedDict
+import random
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from .db import Base
+from .models import Node, Vector
+
+enabled = False
+
+_graphs = {}
+
+
+def enable():
+    """Start caching network topology in this process."""
+    global enabled
+    enabled = True
+
+
+def disable():
+    """Stop caching network topology in this process and drop the cache."""
+    global enabled
+    enabled = False
+    clear()
+
+
+def clear(*args, **kwargs):
+    """Drop the topology of every cached network."""
+    _graphs.clear()
+
+
+def graph(network):
+    """Get the topology of a network.
+
+    If the cache is enabled, return the cached graph of the network, creating
+    it if needed. Otherwise return a new graph that lazily reads what it is
+    asked for from the database.
+    """
+    session = object_session(network)
+    if session is not None:
+        # Make sure pending nodes and vectors are inserted, and so cached.
+        session.flush()
+
+    if not enabled:
+        return NetworkGraph(network.id)
+
+    if network.id not in _graphs:
+        _graphs[network.id] = NetworkGraph(network.id)
+    return _graphs[network.id]
+
+
+class NetworkGraph(object):
+    """The not-failed nodes and vectors of a network.
+
+    Nodes are kept in order of creation along with their class. The nodes and
+    the vectors are each loaded from the database the first time they are
+    needed, and only then updated in place.
+    """
+
+    def __init__(self, network_id):
+        self.network_id = network_id
+        self._nodes = None
+        self._vectors = None
+        self._outgoing = None
+        self._incoming = None
+        self._sampler = None
+
+    """ ###################################
+    Loading from the database
+    ################################### """
+
+    def _load_nodes(self):
+        polymorphic_map = Node.__mapper__.polymorphic_map
+        rows = Node.query\
+            .with_entities(Node.id, Node.type)\
+            .filter_by(network_id=self.network_id, failed=False)\
+            .order_by(Node.id)\
+            .all()
+
+        self._nodes = OrderedDict()
+        for row in rows:
+            self._nodes[row.id] = polymorphic_map[row.type].class_
+
+    def _load_vectors(self):
+        rows = Vector.query\
+            .with_entities(Vector.id, Vector.origin_id, Vector.destination_id)\
+            .filter_by(network_id=self.network_id, failed=False)\
+            .all()
+
+        self._vectors = {}
+        self._outgoing = {}
+        self._incoming = {}
+        for row in rows:
+            self._add_vector(row.id, row.origin_id, row.destination_id)
+
+    def _ensure_nodes(self):
+        if self._nodes is None:
+            self._load_nodes()
+
+    def _ensure_vectors(self):
+        if self._vectors is None:
+            self._load_vectors()
+
+    def _ensure_sampler(self):
+        if self._sampler is None:
+            self._ensure_nodes()
+            self._ensure_vectors()
+            self._sampler = FenwickTree()
+            for node_id in self._nodes:
+                self._sampler.set(node_id, self._weight(node_id))
+
+    """ ###################################
+    Keeping up to date
+    ################################### """
+
+    def add_node(self, node):
+        """Record a newly inserted node."""
+        if self._nodes is not None and not node.failed:
+            self._nodes[node.id] = type(node)
+            self._reweigh(node.id)
+
+    def remove_node(self, node):
+        """Forget a node that has failed."""
+        if self._nodes is not None:
+            self._nodes.pop(node.id, None)
+            self._reweigh(node.id)
+
+    def add_vector(self, vector):
+        """Record a newly inserted vector."""
+        if self._vectors is not None and not vector.failed:
+            self._add_vector(vector.id, vector.origin_id,
+                             vector.destination_id)
+            self._reweigh(vector.origin_id)
+
+    def remove_vector(self, vector):
+        """Forget a vector that has failed."""
+        if self._vectors is None or vector.id not in self._vectors:
+            return
+        origin_id, destination_id = self._vectors.pop(vector.id)
+        self._outgoing[origin_id].pop(vector.id)
+        self._incoming[destination_id].pop(vector.id)
+        self._reweigh(origin_id)
+
+    def _add_vector(self, vector_id, origin_id, destination_id):
+        self._vectors[vector_id] = (origin_id, destination_id)
+        self._outgoing.setdefault(origin_id, {})[vector_id] = destination_id
+        self._incoming.setdefault(destination_id, {})[vector_id] = origin_id
+
+    def _weight(self, node_id):
+        if node_id not in self._nodes:
+            return 0
+        return len(self._outgoing.get(node_id, {}))
+
+    def _reweigh(self, node_id):
+        if self._sampler is not None:
+            self._sampler.set(node_id, self._weight(node_id))
+
+    """ ###################################
+    Methods that get things about the graph
+    ################################### """
+
+    def nodes(self, type=None, exclude=None):
+        """The ids of the nodes, oldest first.
+
+        type filters by class and exclude is the id of a node to leave out.
+        """
+        return list(self._iter_nodes(type=type, exclude=exclude))
+
+    def size(self, type=None):
+        """How many nodes there are, optionally of a given class."""
+        self._ensure_nodes()
+        if type is None:
+            return len(self._nodes)
+        return sum(1 for _ in self._iter_nodes(type=type))
+
+    def oldest(self, n=1, type=None, exclude=None):
+        """The ids of the n oldest nodes, oldest first."""
+        return self._take(self._iter_nodes(type=type, exclude=exclude), n)
+
+    def newest(self, n=1, type=None, exclude=None):
+        """The ids of the n newest nodes, newest first."""
+        return self._take(
+            self._iter_nodes(type=type, exclude=exclude, reverse=True), n)
+
+    def first(self, type=None, exclude=None):
+        """The id of the oldest node, or None if there are none."""
+        oldest = self.oldest(type=type, exclude=exclude)
+        return oldest[0] if oldest else None
+
+    def last(self, type=None, exclude=None):
+        """The id of the newest node, or None if there are none."""
+        newest = self.newest(type=type, exclude=exclude)
+        return newest[0] if newest else None
+
+    def neighbors(self, node_id, direction="to"):
+        """The ids of the nodes a node is connected to/from.
+
+        direction can be "to" (default), "from", "either" or "both".
+        """
+        if direction not in ["to", "from", "either", "both"]:
+            raise ValueError("{} is not a valid direction for neighbors"
+                             .format(direction))
+
+        self._ensure_vectors()
+        to = set(self._outgoing.get(node_id, {}).values())
+        fr = set(self._incoming.get(node_id, {}).values())
+
+        if direction == "to":
+            return to
+        if direction == "from":
+            return fr
+        if direction == "either":
+            return to | fr
+        return to & fr
+
+    def degree(self, node_id, direction="outgoing"):
+        """The number of vectors connected to a node.
+
+        direction can be "incoming", "outgoing" (default) or "all".
+        """
+        if direction not in ["all", "incoming", "outgoing"]:
+            raise ValueError(
+                "{} is not a valid vector direction. "
+                "Must be all, incoming or outgoing.".format(direction))
+
+        self._ensure_vectors()
+        outgoing = len(self._outgoing.get(node_id, {}))
+        incoming = len(self._incoming.get(node_id, {}))
+
+        if direction == "outgoing":
+            return outgoing
+        if direction == "incoming":
+            return incoming
+        return outgoing + incoming
+
+    def sample_by_degree(self, n, exclude=()):
+        """Pick n nodes at random, in proportion to their outdegree.
+
+        Nodes are picked without replacement and exclude is a collection of
+        ids of nodes that must not be picked. Fewer than n ids are returned if
+        there are not enough nodes with outgoing vectors. Each pick takes
+        O(log(size)) time once the sampler has been built.
+        """
+        self._ensure_sampler()
+        return self._sampler.sample(n, exclude=exclude)
+
+    def _iter_nodes(self, type=None, exclude=None, reverse=False):
+        self._ensure_nodes()
+        ids = reversed(self._nodes) if reverse else iter(self._nodes)
+        for node_id in ids:
+            if node_id == exclude:
+                continue
+            if type is not None and not issubclass(self._nodes[node_id], type):
+                continue
+            yield node_id
+
+    def _take(self, ids, n):
+        taken = []
+        for node_id in ids:
+            if len(taken) >= n:
+                break
+            taken.append(node_id)
+        return taken
+
+
+class FenwickTree(object):
+    """Non-negative weights on keys, sampled in proportion to weight.
+
+    A Fenwick (binary indexed) tree of the weights makes updating a weight and
+    drawing a key both O(log n). Keys get a slot the first time they are
+    given a weight, and the tree doubles in size when it runs out of slots.
+    """
+
+    def __init__(self):
+        self._slots = {}
+        self._keys = []
+        self._weights = []
+        self._tree = [0]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get(self, key):
+        """The weight of key, 0 if it has none."""
+        slot = self._slots.get(key)
+        return 0 if slot is None else self._weights[slot]
+
+    def set(self, key, weight):
+        """Give key a new weight."""
+        if weight < 0:
+            raise ValueError("Weights cannot be negative, got {}"
+                             .format(weight))
+        slot = self._slots.get(key)
+        if slot is None:
+            if weight == 0:
+                return
+            slot = self._append(key)
+        delta = weight - self._weights[slot]
+        self._weights[slot] = weight
+        i = slot + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def total(self):
+        """The sum of all the weights."""
+        total = 0
+        i = len(self._tree) - 1
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, value):
+        """The key whose cumulative weight range contains value."""
+        pos = 0
+        step = 1
+        while step * 2 < len(self._tree):
+            step *= 2
+        while step > 0:
+            if pos + step < len(self._tree) and self._tree[pos + step] <= value:
+                pos += step
+                value -= self._tree[pos]
+            step //= 2
+        return self._keys[min(pos, len(self._keys) - 1)]
+
+    def sample(self, n, exclude=()):
+        """Draw up to n distinct keys, in proportion to their weights."""
+        removed = []
+        for key in exclude:
+            if self.get(key):
+                removed.append((key, self.get(key)))
+                self.set(key, 0)
+
+        try:
+            picked = []
+            while len(picked) < n:
+                total = self.total()
+                if total <= 0:
+                    break
+                key = self.find(random.random() * total)
+                picked.append(key)
+                removed.append((key, self.get(key)))
+                self.set(key, 0)
+        finally:
+            for key, weight in removed:
+                self.set(key, weight)
+
+        return picked
+
+    def _append(self, key):
+        slot = len(self._keys)
+        self._slots[key] = slot
+        self._keys.append(key)
+        self._weights.append(0)
+        if len(self._keys) >= len(self._tree):
+            self._rebuild(2 * len(self._tree))
+        return slot
+
+    def _rebuild(self, size):
+        self._tree = [0] * size
+        for slot, weight in enumerate(self._weights):
+            self._tree[slot + 1] = weight
+        for i in range(1, size):
+            parent = i + (i & -i)
+            if parent < size:
+                self._tree[parent] += self._tree[i]
+
+
+"""Keep cached graphs up to date as things are written."""
+
+
+@event.listens_for(Node, "after_insert", propagate=True)
+def _node_inserted(mapper, connection, target):
+    graph = _graphs.get(target.network_id)
+    if graph is not None:
+        graph.add_node(target)
+
+
+@event.listens_for(Node, "after_update", propagate=True)
+def _node_updated(mapper, connection, target):
+    graph = _graphs.get(target.network_id)
+    if graph is not None and target.failed:
+        graph.remove_node(target)
+
+
+@event.listens_for(Vector, "after_insert", propagate=True)
+def _vector_inserted(mapper, connection, target):
+    graph = _graphs.get(target.network_id)
+    if graph is not None:
+        graph.add_vector(target)
+
+
+@event.listens_for(Vector, "after_update", propagate=True)
+def _vector_updated(mapper, connection, target):
+    graph = _graphs.get(target.network_id)
+    if graph is not None and target.failed:
+        graph.remove_vector(target)
+
+
+@event.listens_for(Node, "after_delete", propagate=True)
+@event.listens_for(Vector, "after_delete", propagate=True)
+def _deleted(mapper, connection, target):
+    _graphs.pop(target.network_id, None)
+
+
+@event.listens_for(Session, "after_bulk_update")
+def _bulk_updated(update_context):
+    if issubclass(update_context.mapper.class_, (Node, Vector)):
+        clear()
+
+
+event.listen(Session, "after_rollback", clear)
+event.listen(Base.metadata, "after_drop", clear)
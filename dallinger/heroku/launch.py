@@ -1,7 +1,36 @@
 """Launch the experiment server."""
 
-from dallinger.experiment_server.gunicorn import launch
+from ConfigParser import SafeConfigParser
+import os
+
+
+def worker_class():
+    """Get the server's worker class, before Dallinger is imported.
+
+    It is read from ~/.dallingerconfig, the experiment's config.txt and the
+    environment, in that order, as by the config, and defaults to sync.
+    """
+    found = "sync"
+    for path in [os.path.expanduser("~/.dallingerconfig"), "config.txt"]:
+        parser = SafeConfigParser()
+        parser.read(path)
+        for section in parser.sections():
+            if parser.has_option(section, "worker_class"):
+                found = parser.get(section, "worker_class")
+    return os.environ.get("worker_class", found)
 
 
 if __name__ == '__main__':
+    # Experiments that stream to the browser run on gevent workers, so that
+    # open streams don't hold a worker each. The standard library and
+    # psycopg2 must be patched before Dallinger is imported, so that its
+    # Redis connections and database sessions are made cooperative and local
+    # to each greenlet.
+    if worker_class() == "gevent":
+        from gevent import monkey
+        monkey.patch_all()
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    from dallinger.experiment_server.gunicorn import launch
     launch()
@@ -2,8 +2,9 @@
 
 from datetime import datetime
 import inspect
+from itertools import chain
 
-from sqlalchemy import ForeignKey, or_, and_
+from sqlalchemy import ForeignKey, or_, and_, func, event, select
 from sqlalchemy import (
     Column,
     String,
@@ -15,7 +16,9 @@ from sqlalchemy import (
     Float
 )
 from sqlalchemy.sql.expression import false
-from sqlalchemy.orm import relationship, validates
+from sqlalchemy.orm import relationship, validates, object_session, load_only
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import instance_state, set_committed_value
 
 from .db import Base
 
@@ -27,6 +30,135 @@ def timenow():
     return datetime.now()
 
 
+def _fail_overridden():
+    """Whether a subclass of anything _fail_nodes fails overrides fail().
+
+    _fail_nodes does not call fail() on what it fails, so while such a
+    subclass is loaded things are failed one by one instead.
+    """
+    for base in (Node, Vector, Info, Transmission, Transformation):
+        for mapper in base.__mapper__.self_and_descendants:
+            if mapper.class_.fail.__func__ is not base.fail.__func__:
+                return True
+    return False
+
+
+def _fail_nodes(*criteria):
+    """Fail the not-failed nodes matching criteria and everything of theirs.
+
+    This does the same as calling fail() on each node, but with one UPDATE
+    per table: the nodes, their vectors and infos, any transmissions along
+    those vectors, of those infos or to or from the nodes, and any
+    transformations of those infos or done by the nodes are all failed, with
+    the same time of death. The networks the nodes were in then recalculate
+    whether they are full. As fail() is not called on any of them, callers
+    should check _fail_overridden() first.
+    """
+    session = Node.query.session
+    session.flush()
+
+    nodes = Node.query.filter(Node.failed == false(), *criteria)
+    counts = dict(nodes
+                  .with_entities(Node.network_id, func.count(Node.id))
+                  .group_by(Node.network_id)
+                  .all())
+    if not counts:
+        return
+
+    node_ids = nodes.with_entities(Node.id)
+    vector_ids = Vector.query\
+        .with_entities(Vector.id)\
+        .filter(Vector.failed == false(),
+                or_(Vector.origin_id.in_(node_ids),
+                    Vector.destination_id.in_(node_ids)))
+    info_ids = Info.query\
+        .with_entities(Info.id)\
+        .filter(Info.failed == false(), Info.origin_id.in_(node_ids))
+
+    # Work from the leaves in, as each step selects on not-failed parents.
+    death = {"failed": True, "time_of_death": timenow()}
+    Transmission.query\
+        .filter(Transmission.failed == false(),
+                or_(Transmission.origin_id.in_(node_ids),
+                    Transmission.destination_id.in_(node_ids),
+                    Transmission.vector_id.in_(vector_ids),
+                    Transmission.info_id.in_(info_ids)))\
+        .update(death, synchronize_session=False)
+    Transformation.query\
+        .filter(Transformation.failed == false(),
+                or_(Transformation.node_id.in_(node_ids),
+                    Transformation.info_in_id.in_(info_ids),
+                    Transformation.info_out_id.in_(info_ids)))\
+        .update(death, synchronize_session=False)
+    Vector.query\
+        .filter(Vector.id.in_(vector_ids))\
+        .update(death, synchronize_session=False)
+    Info.query\
+        .filter(Info.id.in_(info_ids))\
+        .update(death, synchronize_session=False)
+    nodes.update(death, synchronize_session=False)
+
+    # Anything already loaded may now be out of date.
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, (Node, Vector, Info, Transmission, Transformation)):
+            session.expire(obj, ["failed", "time_of_death"])
+
+    for network in Network.query.filter(Network.id.in_(counts)):
+        network.calculate_full(change=-counts[network.id])
+
+
+def _select(query, cls, since_id=None, limit=None, fields=None):
+    """Get a page of what query finds, optionally loading only some columns.
+
+    Only things with an id above since_id are included, at most limit of
+    them, in order of id. If fields is a list of column names only those
+    columns are loaded, and the others are loaded when they are first used.
+    """
+    if since_id is not None:
+        query = query.filter(cls.id > since_id)
+    if since_id is not None or limit is not None:
+        query = query.order_by(cls.id)
+    if limit is not None:
+        query = query.limit(limit)
+    if fields is not None:
+        query = query.options(load_only(*fields))
+    return query.all()
+
+
+def _id(obj):
+    """The id of obj, without loading it again if it has expired."""
+    try:
+        identity = instance_state(obj).identity
+    except AttributeError:
+        identity = None
+    if identity is None:
+        return getattr(obj, "id", None)
+    return identity[0]
+
+
+def _note_changed_networks(session, network_ids):
+    """Note the networks changed in the session's transaction.
+
+    Their ids are collected in session.info["changed_networks"], for
+    whoever keeps track of the networks' versions, e.g. the experiment
+    server, to take when the transaction is committed or rolled back.
+    """
+    changed = session.info.setdefault("changed_networks", set())
+    changed.update(set(network_ids) - set([None]))
+
+
+def _record_transmissions(session, transmissions):
+    """Note new transmissions for whoever is watching the session.
+
+    Watching is opt-in: if session.info["new_transmissions"] is a list, the
+    json of each transmission inserted in the session is appended to it,
+    whether it was created on its own or by bulk_transmit.
+    """
+    recorded = session.info.get("new_transmissions")
+    if recorded is not None:
+        recorded.extend(transmissions)
+
+
 class SharedMixin(object):
     """Create shared columns."""
 
@@ -228,11 +360,31 @@ class Participant(Base, SharedMixin):
         returned.
 
         """
-        nodes = self.nodes(failed="all")
-        infos = []
-        for n in nodes:
-            infos.extend(n.infos(type=type, failed=failed))
-        return infos
+        if type is None:
+            type = Info
+
+        if not issubclass(type, Info):
+            raise(TypeError("Cannot get infos of type {} as "
+                            "it is not a valid type."
+                            .format(type)))
+
+        if failed not in ["all", False, True]:
+            raise ValueError("{} is not a valid vector failed".format(failed))
+
+        node_ids = Node.query.with_entities(Node.id)\
+            .filter_by(participant_id=self.id)
+
+        if failed == "all":
+            return type\
+                .query\
+                .filter(type.origin_id.in_(node_ids))\
+                .all()
+        else:
+            return type\
+                .query\
+                .filter(and_(type.origin_id.in_(node_ids),
+                             type.failed == failed))\
+                .all()
 
     def fail(self):
         """Fail a participant.
@@ -241,6 +393,11 @@ class Participant(Base, SharedMixin):
         :attr:`~dallinger.models.SharedMixin.time_of_death` to now. Instruct all
         not-failed nodes associated with the participant to fail.
 
+        The nodes and everything of theirs are failed with a few bulk
+        UPDATEs, unless a subclass of node, vector, info, transmission or
+        transformation overrides ``fail``, in which case ``fail`` is called
+        on each node so that the overrides run.
+
         """
         if self.failed is True:
             raise AttributeError(
@@ -249,8 +406,11 @@ class Participant(Base, SharedMixin):
             self.failed = True
             self.time_of_death = timenow()
 
-            for n in self.nodes():
-                n.fail()
+            if _fail_overridden():
+                for n in self.nodes():
+                    n.fail()
+            else:
+                _fail_nodes(Node.participant_id == self.id)
 
 
 class Question(Base, SharedMixin):
@@ -350,6 +510,11 @@ class Network(Base, SharedMixin):
     #: Whether the network is currently full
     full = Column(Boolean, nullable=False, default=False, index=True)
 
+    #: The number of not-failed nodes in the network. This is kept up to date
+    #: by nodes as they are created and failed, and is used to decide whether
+    #: the network is full.
+    node_count = Column(Integer, nullable=False, default=0)
+
     #: The role of the network. By default dallinger initializes all
     #: networks as either "practice" or "experiment"
     role = Column(String(26), nullable=False, default="default", index=True)
@@ -436,7 +601,21 @@ class Network(Base, SharedMixin):
         type specifies the class of node, failed
         can be True/False/all.
         """
-        return len(self.nodes(type=type, failed=failed))
+        if type is None:
+            type = Node
+
+        if not issubclass(type, Node):
+            raise(TypeError("{} is not a valid node type.".format(type)))
+
+        if failed not in ["all", False, True]:
+            raise ValueError("{} is not a valid node failed".format(failed))
+
+        if failed == "all":
+            return type.query.filter_by(network_id=self.id).count()
+        else:
+            return type.query\
+                .filter_by(failed=failed, network_id=self.id)\
+                .count()
 
     def infos(self, type=None, failed=False):
         """
@@ -553,6 +732,105 @@ class Network(Base, SharedMixin):
                 .filter_by(network_id=self.id, failed=failed)\
                 .all()
 
+    def adjacency(self, direction="to"):
+        """Get the neighbors of every node in the network.
+
+        Return a dictionary mapping the id of every not-failed node in the
+        network to the set of ids of its neighbors. As with
+        :func:`~dallinger.models.Node.neighbors`, only not-failed vectors are
+        followed and direction can be "to" (default), "from", "either" or
+        "both". This takes two queries however large the network is.
+        """
+        if direction not in ["to", "from", "either", "both"]:
+            raise ValueError("{} is not a valid direction for adjacency"
+                             .format(direction))
+
+        node_ids = Node.query.with_entities(Node.id)\
+            .filter_by(network_id=self.id, failed=False).all()
+        vectors = Vector.query\
+            .with_entities(Vector.origin_id, Vector.destination_id)\
+            .filter_by(network_id=self.id, failed=False).all()
+
+        outgoing = dict((n.id, set()) for n in node_ids)
+        incoming = dict((n.id, set()) for n in node_ids)
+        for v in vectors:
+            outgoing.setdefault(v.origin_id, set()).add(v.destination_id)
+            incoming.setdefault(v.destination_id, set()).add(v.origin_id)
+
+        if direction == "to":
+            return outgoing
+        if direction == "from":
+            return incoming
+
+        adjacency = {}
+        for node_id in set(outgoing) | set(incoming):
+            to = outgoing.get(node_id, set())
+            fr = incoming.get(node_id, set())
+            if direction == "either":
+                adjacency[node_id] = to | fr
+            else:
+                adjacency[node_id] = to & fr
+        return adjacency
+
+    def degree_map(self, direction="outgoing"):
+        """Get the degree of every node in the network.
+
+        Return a dictionary mapping the id of every not-failed node in the
+        network to the number of not-failed vectors connected to it.
+        Direction can be "incoming", "outgoing" (default) or "all", as for
+        :func:`~dallinger.models.Node.vectors`. This takes a single query.
+        """
+        if direction not in ["all", "incoming", "outgoing"]:
+            raise ValueError(
+                "{} is not a valid vector direction. "
+                "Must be all, incoming or outgoing.".format(direction))
+
+        if direction == "incoming":
+            joined = Vector.destination_id == Node.id
+        elif direction == "outgoing":
+            joined = Vector.origin_id == Node.id
+        else:
+            joined = or_(Vector.destination_id == Node.id,
+                         Vector.origin_id == Node.id)
+
+        degrees = Node.query\
+            .with_entities(Node.id, func.count(Vector.id))\
+            .outerjoin(Vector, and_(joined, Vector.failed == false()))\
+            .filter(and_(Node.network_id == self.id, Node.failed == false()))\
+            .group_by(Node.id)\
+            .all()
+
+        return dict((node_id, int(degree)) for node_id, degree in degrees)
+
+    def transmission_map(self, direction="incoming", status="pending"):
+        """Get the transmissions of every node in the network.
+
+        Return a dictionary mapping the id of every node that has not-failed
+        transmissions to a list of them. Direction can be "incoming"
+        (default) or "outgoing", status can be "all", "pending" (default) or
+        "received". This takes a single query.
+        """
+        if direction not in ["incoming", "outgoing"]:
+            raise(ValueError("You cannot get transmissions of direction {}."
+                             .format(direction) +
+                  "Type can only be incoming or outgoing."))
+
+        if status not in ["all", "pending", "received"]:
+            raise(ValueError("You cannot get transmission of status {}."
+                             .format(status) +
+                  "Status can only be pending, received or all"))
+
+        transmissions = self.transmissions(status=status)
+
+        transmission_map = {}
+        for t in transmissions:
+            if direction == "incoming":
+                key = t.destination_id
+            else:
+                key = t.origin_id
+            transmission_map.setdefault(key, []).append(t)
+        return transmission_map
+
     """ ###################################
     Methods that make Networks do things
     ################################### """
@@ -562,7 +840,11 @@ class Network(Base, SharedMixin):
         raise NotImplementedError
 
     def fail(self):
-        """Fail an entire network."""
+        """Fail an entire network.
+
+        Its nodes are failed as by
+        :func:`~dallinger.models.Participant.fail`.
+        """
         if self.failed is True:
             raise AttributeError(
                 "Cannot fail {} - it has already failed.".format(self))
@@ -570,12 +852,30 @@ class Network(Base, SharedMixin):
             self.failed = True
             self.time_of_death = timenow()
 
-            for n in self.nodes():
-                n.fail()
+            if _fail_overridden():
+                for n in self.nodes():
+                    n.fail()
+            else:
+                _fail_nodes(Node.network_id == self.id)
+
+    def calculate_full(self, change=0):
+        """Set whether the network is full.
+
+        change is the number of nodes that have just been added to the
+        network, or failed if it is negative. It is added to node_count in
+        the same UPDATE that sets full, so that nodes created at the same time
+        by different requests are all counted.
+        """
+        if self.id is None:
+            # Not inserted yet, so nobody else can be adding nodes to it.
+            self.node_count = (self.node_count or 0) + change
+            self.full = (self.max_size is not None and
+                         self.node_count >= self.max_size)
+            return
 
-    def calculate_full(self):
-        """Set whether the network is full."""
-        self.full = len(self.nodes()) >= self.max_size
+        self.node_count = Network.node_count + change
+        self.full = Network.node_count + change >= self.max_size
+        object_session(self).flush()
 
     def print_verbose(self):
         """Print a verbose representation of a network."""
@@ -642,12 +942,13 @@ class Node(Base, SharedMixin):
 
         self.network = network
         self.network_id = network.id
-        network.calculate_full()
 
         if participant is not None:
             self.participant = participant
             self.participant_id = participant.id
 
+        network.calculate_full(change=1)
+
     def __repr__(self):
         """The string representation of a node."""
         return "Node-{}-{}".format(self.id, self.type)
@@ -673,11 +974,14 @@ class Node(Base, SharedMixin):
     Methods that get things about a node
     ################################### """
 
-    def vectors(self, direction="all", failed=False):
+    def vectors(self, direction="all", failed=False, since_id=None,
+                limit=None, fields=None):
         """Get vectors that connect at this node.
 
         Direction can be "incoming", "outgoing" or "all" (default).
-        Failed can be True, False or all
+        Failed can be True, False or all. since_id and limit get a page of
+        the vectors and fields the columns to load, as for
+        :func:`~dallinger.models.Node.infos`.
         """
         # check direction
         if direction not in ["all", "incoming", "outgoing"]:
@@ -691,37 +995,34 @@ class Node(Base, SharedMixin):
         # get the vectors
         if failed == "all":
             if direction == "all":
-                return Vector.query\
+                vectors = Vector.query\
                     .filter(or_(Vector.destination_id == self.id,
-                                Vector.origin_id == self.id))\
-                    .all()
+                                Vector.origin_id == self.id))
 
             if direction == "incoming":
-                return Vector.query\
-                    .filter_by(destination_id=self.id)\
-                    .all()
+                vectors = Vector.query\
+                    .filter_by(destination_id=self.id)
 
             if direction == "outgoing":
-                return Vector.query\
-                    .filter_by(origin_id=self.id)\
-                    .all()
+                vectors = Vector.query\
+                    .filter_by(origin_id=self.id)
         else:
             if direction == "all":
-                return Vector.query\
+                vectors = Vector.query\
                     .filter(and_(Vector.failed == failed,
                             or_(Vector.destination_id == self.id,
-                                Vector.origin_id == self.id)))\
-                    .all()
+                                Vector.origin_id == self.id)))
 
             if direction == "incoming":
-                return Vector.query\
-                    .filter_by(destination_id=self.id, failed=failed)\
-                    .all()
+                vectors = Vector.query\
+                    .filter_by(destination_id=self.id, failed=failed)
 
             if direction == "outgoing":
-                return Vector.query\
-                    .filter_by(origin_id=self.id, failed=failed)\
-                    .all()
+                vectors = Vector.query\
+                    .filter_by(origin_id=self.id, failed=failed)
+
+        return _select(vectors, Vector, since_id=since_id, limit=limit,
+                       fields=fields)
 
     def neighbors(self, type=None, direction="to", failed=None):
         """Get a node's neighbors - nodes that are directly connected to it.
@@ -756,35 +1057,73 @@ class Node(Base, SharedMixin):
                 "example, getting not-failed nodes connected to you via failed"
                 " vectors, you should do so via sql queries.")
 
-        neighbors = []
-        # get the neighbours
-        if direction == "to":
-            outgoing_vectors = Vector.query\
-                .with_entities(Vector.destination_id)\
-                .filter_by(origin_id=self.id, failed=False).all()
+        return Node.neighbors_many([self], type=type,
+                                   direction=direction)[self.id]
 
-            neighbor_ids = [v.destination_id for v in outgoing_vectors]
-            if neighbor_ids:
-                neighbors = Node.query.filter(Node.id.in_(neighbor_ids)).all()
-                neighbors = [n for n in neighbors if isinstance(n, type)]
+    @classmethod
+    def neighbors_many(cls, nodes, type=None, direction="to"):
+        """Get the neighbors of several nodes at once.
 
-        if direction == "from":
-            incoming_vectors = Vector.query.with_entities(Vector.origin_id)\
-                .filter_by(destination_id=self.id, failed=False).all()
+        Return a dictionary mapping the id of each node in ``nodes`` to a list
+        of its neighbors, in order of id. ``type`` and ``direction`` are as for
+        :func:`~dallinger.models.Node.neighbors`. However many nodes are
+        passed, this takes at most two queries.
+        """
+        # get type
+        if type is None:
+            type = Node
+        if not issubclass(type, Node):
+            raise ValueError("{} is not a valid neighbor type,"
+                             "needs to be a subclass of Node.".format(type))
 
-            neighbor_ids = [v.origin_id for v in incoming_vectors]
-            if neighbor_ids:
-                neighbors = Node.query.filter(Node.id.in_(neighbor_ids)).all()
-                neighbors = [n for n in neighbors if isinstance(n, type)]
+        # get direction
+        if direction not in ["both", "either", "from", "to"]:
+            raise ValueError("{} not a valid neighbor connection."
+                             "Should be both, either, to or from."
+                             .format(direction))
 
-        if direction == "either":
-            neighbors = list(set(self.neighbors(type=type, direction="to") +
-                                 self.neighbors(type=type, direction="from")))
+        node_ids = [n.id for n in nodes]
+        neighbors = dict((node_id, []) for node_id in node_ids)
+        if not node_ids:
+            return neighbors
 
-        if direction == "both":
-            neighbors = list(set(self.neighbors(type=type, direction="to")) &
-                             set(self.neighbors(type=type, direction="from")))
+        vectors = Vector.query\
+            .with_entities(Vector.origin_id, Vector.destination_id)\
+            .filter(and_(Vector.failed == false(),
+                         or_(Vector.origin_id.in_(node_ids),
+                             Vector.destination_id.in_(node_ids))))\
+            .all()
+
+        to = dict((node_id, set()) for node_id in node_ids)
+        fr = dict((node_id, set()) for node_id in node_ids)
+        for v in vectors:
+            if v.origin_id in to:
+                to[v.origin_id].add(v.destination_id)
+            if v.destination_id in fr:
+                fr[v.destination_id].add(v.origin_id)
+
+        neighbor_ids = {}
+        for node_id in node_ids:
+            if direction == "to":
+                neighbor_ids[node_id] = to[node_id]
+            elif direction == "from":
+                neighbor_ids[node_id] = fr[node_id]
+            elif direction == "either":
+                neighbor_ids[node_id] = to[node_id] | fr[node_id]
+            else:
+                neighbor_ids[node_id] = to[node_id] & fr[node_id]
 
+        all_neighbor_ids = set().union(*neighbor_ids.values())
+        if not all_neighbor_ids:
+            return neighbors
+
+        found = Node.query.filter(Node.id.in_(list(all_neighbor_ids))).all()
+        found = dict((n.id, n) for n in found if isinstance(n, type))
+
+        for node_id in node_ids:
+            neighbors[node_id] = [found[i]
+                                  for i in sorted(neighbor_ids[node_id])
+                                  if i in found]
         return neighbors
 
     def is_connected(self, whom, direction="to", failed=None):
@@ -868,12 +1207,18 @@ class Node(Base, SharedMixin):
         else:
             return connected[0]
 
-    def infos(self, type=None, failed=False):
+    def infos(self, type=None, failed=False, since_id=None, limit=None,
+              fields=None):
         """Get infos that originate from this node.
 
         Type must be a subclass of :class:`~dallinger.models.Info`, the default is
         ``Info``. Failed can be True, False or "all".
 
+        To get the infos a page at a time, pass since_id to get only those
+        with a greater id and limit to get at most that many, in order of
+        id. fields is a list of the columns to load, e.g. to leave out large
+        contents, and other columns are loaded when they are first used.
+
         """
         if type is None:
             type = Info
@@ -887,20 +1232,24 @@ class Node(Base, SharedMixin):
             raise ValueError("{} is not a valid vector failed".format(failed))
 
         if failed == "all":
-            return type\
+            infos = type\
                 .query\
-                .filter_by(origin_id=self.id)\
-                .all()
+                .filter_by(origin_id=self.id)
         else:
-            return type\
+            infos = type\
                 .query\
-                .filter_by(origin_id=self.id, failed=failed)\
-                .all()
+                .filter_by(origin_id=self.id, failed=failed)
 
-    def received_infos(self, type=None, failed=None):
+        return _select(infos, type, since_id=since_id, limit=limit,
+                       fields=fields)
+
+    def received_infos(self, type=None, failed=None, since_id=None,
+                       limit=None, fields=None):
         """Get infos that have been sent to this node.
 
-        Type must be a subclass of info, the default is Info.
+        Type must be a subclass of info, the default is Info. since_id and
+        limit get a page of the infos and fields the columns to load, as for
+        :func:`~dallinger.models.Node.infos`.
         """
         if failed is not None:
             raise ValueError(
@@ -921,24 +1270,25 @@ class Node(Base, SharedMixin):
                             "as it is not a valid type."
                             .format(type)))
 
-        transmissions = Transmission\
+        info_ids = Transmission\
             .query.with_entities(Transmission.info_id)\
             .filter_by(destination_id=self.id,
                        status="received",
-                       failed=False).all()
+                       failed=False)
 
-        info_ids = [t.info_id for t in transmissions]
-        if info_ids:
-            return type.query.filter(type.id.in_(info_ids)).all()
-        else:
-            return []
+        infos = type.query.filter(type.id.in_(info_ids))
+        return _select(infos, type, since_id=since_id, limit=limit,
+                       fields=fields)
 
-    def transmissions(self, direction="outgoing", status="all", failed=False):
+    def transmissions(self, direction="outgoing", status="all", failed=False,
+                      since_id=None, limit=None, fields=None):
         """Get transmissions sent to or from this node.
 
         Direction can be "all", "incoming" or "outgoing" (default).
         Status can be "all" (default), "pending", or "received".
-        failed can be True, False or "all"
+        failed can be True, False or "all". since_id and limit get a page of
+        the transmissions and fields the columns to load, as for
+        :func:`~dallinger.models.Node.infos`.
         """
         # check parameters
         if direction not in ["incoming", "outgoing", "all"]:
@@ -958,40 +1308,37 @@ class Node(Base, SharedMixin):
         # get transmissions
         if direction == "all":
             if status == "all":
-                return Transmission.query\
+                transmissions = Transmission.query\
                     .filter(and_(Transmission.failed == false(),
                                  or_(Transmission.destination_id == self.id,
-                                     Transmission.origin_id == self.id)))\
-                    .all()
+                                     Transmission.origin_id == self.id)))
             else:
-                return Transmission.query\
+                transmissions = Transmission.query\
                     .filter(and_(Transmission.failed == false(),
                                  Transmission.status == status,
                                  or_(Transmission.destination_id == self.id,
-                                     Transmission.origin_id == self.id)))\
-                    .all()
+                                     Transmission.origin_id == self.id)))
         if direction == "incoming":
             if status == "all":
-                return Transmission.query\
-                    .filter_by(failed=False, destination_id=self.id)\
-                    .all()
+                transmissions = Transmission.query\
+                    .filter_by(failed=False, destination_id=self.id)
             else:
-                return Transmission.query\
+                transmissions = Transmission.query\
                     .filter(and_(Transmission.failed == false(),
                                  Transmission.destination_id == self.id,
-                                 Transmission.status == status))\
-                    .all()
+                                 Transmission.status == status))
         if direction == "outgoing":
             if status == "all":
-                return Transmission.query\
-                    .filter_by(failed=False, origin_id=self.id)\
-                    .all()
+                transmissions = Transmission.query\
+                    .filter_by(failed=False, origin_id=self.id)
             else:
-                return Transmission.query\
+                transmissions = Transmission.query\
                     .filter(and_(Transmission.failed == false(),
                                  Transmission.origin_id == self.id,
-                                 Transmission.status == status))\
-                    .all()
+                                 Transmission.status == status))
+
+        return _select(transmissions, Transmission, since_id=since_id,
+                       limit=limit, fields=fields)
 
     def transformations(self, type=None, failed=False):
         """
@@ -1035,14 +1382,18 @@ class Node(Base, SharedMixin):
         made by this node, transmissions to or from this node and
         transformations made by this node to fail.
 
+        These are failed with a few bulk UPDATEs rather than by calling
+        their ``fail`` methods, unless a subclass of node, vector, info,
+        transmission or transformation overrides ``fail``.
+
         """
         if self.failed is True:
             raise AttributeError(
                 "Cannot fail {} - it has already failed.".format(self))
-        else:
+        elif _fail_overridden():
             self.failed = True
             self.time_of_death = timenow()
-            self.network.calculate_full()
+            self.network.calculate_full(change=-1)
 
             for v in self.vectors():
                 v.fail()
@@ -1052,6 +1403,8 @@ class Node(Base, SharedMixin):
                 t.fail()
             for t in self.transformations():
                 t.fail()
+        else:
+            _fail_nodes(Node.id == self.id)
 
     def connect(self, whom, direction="to"):
         """Create a vector from self to/from whom.
@@ -1112,11 +1465,13 @@ class Node(Base, SharedMixin):
 
     def flatten(self, l):
         """Turn a list of lists into a list."""
-        if l == []:
-            return l
-        if isinstance(l[0], list):
-            return self.flatten(l[0]) + self.flatten(l[1:])
-        return l[:1] + self.flatten(l[1:])
+        flat = []
+        for item in l:
+            if isinstance(item, list):
+                flat.extend(self.flatten(item))
+            else:
+                flat.append(item)
+        return flat
 
     def transmit(self, what=None, to_whom=None):
         """Transmit one or more infos from one node to another.
@@ -1140,6 +1495,68 @@ class Node(Base, SharedMixin):
             (3) to_whom is/contains a node that the transmitting node does not
                 have a not-failed connection with.
         """
+        pairs = self._transmission_pairs(what=what, to_whom=to_whom)
+        # Load the recipients at once, not one by one as each is used.
+        destination_ids = set(vector.destination_id for _, vector in pairs)
+        if len(destination_ids) > 1:
+            Node.query.filter(Node.id.in_(destination_ids)).all()
+        transmissions = [Transmission(info=info, vector=vector)
+                         for info, vector in pairs]
+        if len(transmissions) == 1:
+            return transmissions[0]
+        else:
+            return transmissions
+
+    def bulk_transmit(self, what=None, to_whom=None):
+        """Transmit one or more infos, inserting them all at once.
+
+        what and to_whom work as for :func:`~dallinger.models.Node.transmit`
+        and are checked in the same way, but all the transmissions are
+        inserted with a single INSERT instead of being created one by one.
+        Returns a list of the ids of the new transmissions. Useful when
+        broadcasting to many nodes.
+        """
+        pairs = self._transmission_pairs(what=what, to_whom=to_whom)
+        if not pairs:
+            return []
+
+        for info in set(info for info, _ in pairs):
+            if info.failed:
+                raise ValueError("Cannot transmit {} as it has failed."
+                                 .format(info))
+            if info.origin_id != self.id:
+                raise ValueError("Cannot transmit {} from {} as it does "
+                                 "not originate from it".format(info, self))
+
+        table = Transmission.__table__
+        rows = [{
+            "vector_id": vector.id,
+            "info_id": info.id,
+            "origin_id": vector.origin_id,
+            "destination_id": vector.destination_id,
+            "network_id": vector.network_id,
+        } for info, vector in pairs]
+        session = object_session(self)
+        if session.bind.dialect.implicit_returning:
+            result = session.execute(
+                table.insert().values(rows).returning(*table.c))
+        else:
+            # Without RETURNING, as in SQLite, the new rows are read back.
+            # SQLite serializes writes and numbers the rows of an insert
+            # one after another, up to the last id.
+            last_id = session.execute(table.insert().values(rows)).lastrowid
+            result = session.execute(
+                table.select()
+                .where(and_(table.c.id > last_id - len(rows),
+                            table.c.id <= last_id))
+                .order_by(table.c.id))
+        transmissions = [dict(row) for row in result]
+        _note_changed_networks(session, [self.network_id])
+        _record_transmissions(session, transmissions)
+        return [t["id"] for t in transmissions]
+
+    def _transmission_pairs(self, what=None, to_whom=None):
+        """The (info, vector) pairs to transmit along for transmit()."""
         # make the list of what
         what = self.flatten([what])
         for i in range(len(what)):
@@ -1166,23 +1583,17 @@ class Node(Base, SharedMixin):
                 to_whom[i] = self.neighbors(direction="to", type=to_whom[i])
         to_whom = list(set(self.flatten(to_whom)))
 
-        transmissions = []
-        vectors = self.vectors(direction="outgoing")
+        vectors = dict((v.destination_id, v)
+                       for v in reversed(self.vectors(direction="outgoing")))
+        pairs = []
         for w in what:
             for tw in to_whom:
-                try:
-                    vector = [v for v in vectors
-                              if v.destination_id == tw.id][0]
-                except:
+                if _id(tw) not in vectors:
                     raise ValueError(
                         "{} cannot transmit to {} as it does not have "
                         "a connection to them".format(self, tw))
-                t = Transmission(info=w, vector=vector)
-                transmissions.append(t)
-        if len(transmissions) == 1:
-            return transmissions[0]
-        else:
-            return transmissions
+                pairs.append((w, vectors[_id(tw)]))
+        return pairs
 
     def _what(self):
         """What to transmit if what is not specified.
@@ -1215,6 +1626,8 @@ class Node(Base, SharedMixin):
             1. None (the default) in which case all pending transmissions are
                received.
             2. a specific transmission.
+            3. a list of transmissions, in which case those of them that are
+               pending are received.
 
         Will raise an error if the node is told to receive a transmission it has
         not been sent.
@@ -1225,29 +1638,78 @@ class Node(Base, SharedMixin):
             raise ValueError("{} cannot receive as it has failed."
                              .format(self))
 
-        received_transmissions = []
         if what is None:
-            pending_transmissions = self.transmissions(direction="incoming",
-                                                       status="pending")
-            for transmission in pending_transmissions:
-                transmission.status = "received"
-                transmission.receive_time = timenow()
-                received_transmissions.append(transmission)
+            self.update(self._receive_pending())
 
         elif isinstance(what, Transmission):
             if what in self.transmissions(direction="incoming",
                                           status="pending"):
-                transmission.status = "received"
+                what.status = "received"
                 what.receive_time = timenow()
-                received_transmissions.append(what)
+                self.update([what.info])
             else:
                 raise(ValueError("{} cannot receive {} as it is not "
                                  "in its pending_transmissions"
                                  .format(self, what)))
+        elif isinstance(what, list):
+            self.update(self._receive_pending(ids=[_id(t) for t in what]))
         else:
             raise ValueError("Nodes cannot receive {}".format(what))
 
-        self.update([t.info for t in received_transmissions])
+    def _receive_pending(self, ids=None):
+        """Mark pending transmissions as received and get their infos.
+
+        All the pending transmissions are received, or only those whose ids
+        are given. The transmissions are updated with a single UPDATE ...
+        RETURNING and their infos fetched with a single query. Infos are
+        returned in the order their transmissions were sent.
+        """
+        if ids is not None and not ids:
+            return []
+        session = object_session(self)
+        session.flush()
+
+        table = Transmission.__table__
+        pending = and_(table.c.destination_id == self.id,
+                       table.c.status == "pending",
+                       table.c.failed == false())
+        if ids is not None:
+            pending = and_(pending, table.c.id.in_(ids))
+        receive_time = timenow()
+        update = table.update().values(status="received",
+                                       receive_time=receive_time)
+        if session.bind.dialect.implicit_returning:
+            rows = session.execute(
+                update.where(pending)
+                .returning(table.c.id, table.c.info_id)).fetchall()
+        else:
+            # Without RETURNING, as in SQLite, which serializes writes, the
+            # pending transmissions are selected first.
+            rows = session.execute(
+                select([table.c.id, table.c.info_id]).where(pending))\
+                .fetchall()
+            if rows:
+                session.execute(
+                    update.where(table.c.id.in_([r.id for r in rows])))
+        if not rows:
+            return []
+        rows = sorted(rows)
+        _note_changed_networks(session, [self.network_id])
+
+        # Transmissions already loaded into the session are brought up to
+        # date, without loading them again.
+        mapper = Transmission.__mapper__
+        for row in rows:
+            transmission = session.identity_map.get(
+                mapper.identity_key_from_primary_key([row.id]))
+            if transmission is not None:
+                set_committed_value(transmission, "status", "received")
+                set_committed_value(transmission, "receive_time",
+                                    receive_time)
+
+        infos = Info.query.filter(Info.id.in_(set(r.info_id for r in rows)))
+        infos = dict((info.id, info) for info in infos)
+        return [infos[row.info_id] for row in rows]
 
     def update(self, infos):
         """Process received infos.
@@ -1360,7 +1822,6 @@ class Vector(Base, SharedMixin):
             "id": self.id,
             "origin_id": self.origin_id,
             "destination_id": self.destination_id,
-            "info_id": self.info_id,
             "network_id": self.network_id,
             "creation_time": self.creation_time,
             "failed": self.failed,
@@ -1696,6 +2157,23 @@ class Transmission(Base, SharedMixin):
             self.time_of_death = timenow()
 
 
+@event.listens_for(Session, "after_flush")
+def _note_flushed_networks(session, flush_context):
+    network_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Network):
+            network_ids.add(obj.id)
+        elif isinstance(obj, (Node, Vector, Info, Transmission,
+                              Transformation)):
+            network_ids.add(obj.network_id)
+    _note_changed_networks(session, network_ids)
+
+
+@event.listens_for(Transmission, "after_insert", propagate=True)
+def _transmission_inserted(mapper, connection, target):
+    _record_transmissions(object_session(target), [target.__json__()])
+
+
 class Transformation(Base, SharedMixin):
     """An instance of one info being transformed into another."""
 
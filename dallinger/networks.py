@@ -1,12 +1,19 @@
 """Network structures commonly used in simulations of evolution."""
 
-from operator import attrgetter
-import random
-
-from .models import Network
+from . import graph_cache, selection
+from .models import Network, Node
 from .nodes import Source
 
 
+def _load(node_ids):
+    """Get the nodes with the given ids, in the same order."""
+    if not node_ids:
+        return []
+    nodes = dict((n.id, n) for n in
+                 Node.query.filter(Node.id.in_(node_ids)).all())
+    return [nodes[i] for i in node_ids]
+
+
 class Chain(Network):
     """Source -> Node -> Node -> Node -> ...
 
@@ -17,14 +24,14 @@ class Chain(Network):
 
     def add_node(self, node):
         """Add an agent, connecting it to the previous node."""
-        other_nodes = [n for n in self.nodes() if n.id != node.id]
+        parent_id = graph_cache.graph(self).last(exclude=node.id)
 
-        if isinstance(node, Source) and other_nodes:
+        if isinstance(node, Source) and parent_id is not None:
             raise(Exception("Chain network already has a nodes, "
                             "can't add a source."))
 
-        if other_nodes:
-            parent = max(other_nodes, key=attrgetter('creation_time'))
+        if parent_id is not None:
+            parent = Node.query.get(parent_id)
             parent.connect(whom=node)
 
 
@@ -35,13 +42,17 @@ class FullyConnected(Network):
 
     def add_node(self, node):
         """Add a node, connecting it to everyone and back."""
-        other_nodes = [n for n in self.nodes() if n.id != node.id]
+        graph = graph_cache.graph(self)
+        other_ids = graph.nodes(exclude=node.id)
+        source_ids = set(graph.nodes(type=Source, exclude=node.id))
 
-        for n in other_nodes:
-            if isinstance(n, Source):
-                node.connect(direction="from", whom=n)
-            else:
-                node.connect(direction="both", whom=n)
+        sources = _load([i for i in other_ids if i in source_ids])
+        others = _load([i for i in other_ids if i not in source_ids])
+
+        if sources:
+            node.connect(direction="from", whom=sources)
+        if others:
+            node.connect(direction="both", whom=others)
 
 
 class Empty(Network):
@@ -70,10 +81,10 @@ class Star(Network):
 
     def add_node(self, node):
         """Add a node and connect it to the center."""
-        nodes = self.nodes()
+        graph = graph_cache.graph(self)
 
-        if len(nodes) > 1:
-            first_node = min(nodes, key=attrgetter('creation_time'))
+        if graph.size() > 1:
+            first_node = Node.query.get(graph.first())
             first_node.connect(direction="both", whom=node)
 
 
@@ -88,10 +99,10 @@ class Burst(Network):
 
     def add_node(self, node):
         """Add a node and connect it to the center."""
-        nodes = self.nodes()
+        graph = graph_cache.graph(self)
 
-        if len(nodes) > 1:
-            first_node = min(nodes, key=attrgetter('creation_time'))
+        if graph.size() > 1:
+            first_node = Node.query.get(graph.first())
             first_node.connect(whom=node)
 
 
@@ -138,34 +149,21 @@ class DiscreteGenerational(Network):
 
     def add_node(self, node):
         """Link the agent to a random member of the previous generation."""
-        nodes = [n for n in self.nodes() if not isinstance(n, Source)]
-        num_agents = len(nodes)
+        graph = graph_cache.graph(self)
+        num_agents = graph.size() - graph.size(type=Source)
         curr_generation = int((num_agents - 1) / float(self.generation_size))
         node.generation = curr_generation
 
         if curr_generation == 0:
             if self.initial_source:
-                source = min(
-                    self.nodes(type=Source),
-                    key=attrgetter('creation_time'))
+                source = Node.query.get(graph.first(type=Source))
                 source.connect(whom=node)
                 source.transmit(to_whom=node)
         else:
-            prev_agents = type(node).query\
-                .filter_by(failed=False,
-                           network_id=self.id,
-                           generation=(curr_generation - 1))\
-                .all()
-            prev_fits = [p.fitness for p in prev_agents]
-            prev_probs = [(f / (1.0 * sum(prev_fits))) for f in prev_fits]
-
-            rnd = random.random()
-            temp = 0.0
-            for i, probability in enumerate(prev_probs):
-                temp += probability
-                if temp > rnd:
-                    parent = prev_agents[i]
-                    break
+            parent = selection.select_by_fitness(
+                type(node),
+                network_id=self.id,
+                generation=(curr_generation - 1))
 
             parent.connect(whom=node)
             parent.transmit(to_whom=node)
@@ -200,37 +198,25 @@ class ScaleFree(Network):
 
     def add_node(self, node):
         """Add newcomers one by one, using linear preferential attachment."""
-        nodes = self.nodes()
+        graph = graph_cache.graph(self)
+        other_ids = graph.nodes(exclude=node.id)
 
         # Start with a core of m0 fully-connected agents...
-        if len(nodes) <= self.m0:
-            other_nodes = [n for n in nodes if n.id != node.id]
-            for n in other_nodes:
-                node.connect(direction="both", whom=n)
+        if len(other_ids) < self.m0:
+            if other_ids:
+                node.connect(direction="both", whom=_load(other_ids))
 
         # ...then add newcomers one by one with preferential attachment.
         else:
-            for idx_newvector in xrange(self.m):
+            # Pick m members at once with preferential attachment, leaving
+            # out anyone the newcomer is already connected to.
+            connected = graph.neighbors(node.id, direction="either")
+            connected.add(node.id)
+            chosen = graph.sample_by_degree(self.m, exclude=connected)
 
-                these_nodes = [
-                    n for n in nodes if (
-                        n.id != node.id and
-                        not n.is_connected(direction="either", whom=node))]
-
-                outdegrees = [
-                    len(n.vectors(direction="outgoing")) for n in these_nodes]
-
-                # Select a member using preferential attachment
-                ps = [(d / (1.0 * sum(outdegrees))) for d in outdegrees]
-                rnd = random.random() * sum(ps)
-                cur = 0.0
-                for i, p in enumerate(ps):
-                    cur += p
-                    if rnd < cur:
-                        vector_to = these_nodes[i]
-
-                # Create vector from newcomer to selected member and back
-                node.connect(direction="both", whom=vector_to)
+            # Create vectors from the newcomer to the chosen members and back
+            if chosen:
+                node.connect(direction="both", whom=_load(chosen))
 
 
 class SequentialMicrosociety(Network):
@@ -249,13 +235,9 @@ class SequentialMicrosociety(Network):
 
     def add_node(self, node):
         """Add a node, connecting it to all the active nodes."""
-        nodes = sorted(
-            self.nodes(),
-            key=attrgetter('creation_time'), reverse=True)
-
-        other_nodes = [n for n in nodes if n.id != node.id]
+        graph = graph_cache.graph(self)
 
-        connecting_nodes = other_nodes[0:(self.n - 1)]
+        connecting_nodes = _load(graph.newest(self.n - 1, exclude=node.id))
 
         for n in connecting_nodes:
             n.connect(whom=node)
@@ -4,6 +4,7 @@ import random
 
 from nodes import Agent
 from nodes import Source
+from selection import weighted_choice
 
 
 def random_walk(network):
@@ -65,12 +66,14 @@ def moran_sexual(network):
             replacer.neighbors(direction="to", type=Agent))
 
         # Give the baby the same outgoing connections as the replaced.
-        for node in replaced.neighbors(direction="to"):
-            baby.connect(direction="to", whom=node)
+        outgoing = replaced.neighbors(direction="to")
+        if outgoing:
+            baby.connect(direction="to", whom=outgoing)
 
         # Give the baby the same incoming connections as the replaced.
-        for node in replaced.neighbors(direction="from"):
-            node.connect(direction="to", whom=baby)
+        incoming = replaced.neighbors(direction="from")
+        if incoming:
+            baby.connect(direction="from", whom=incoming)
 
         # Kill the replaced agent.
         replaced.fail()
@@ -82,15 +85,6 @@ def moran_sexual(network):
 def transmit_by_fitness(from_whom, to_whom=None, what=None):
     """Choose a parent with probability proportional to their fitness."""
     parents = from_whom
-    parent_fs = [p.fitness for p in parents]
-    parent_probs = [(f / (1.0 * sum(parent_fs))) for f in parent_fs]
-
-    rnd = random.random()
-    temp = 0.0
-    for i, probability in enumerate(parent_probs):
-        temp += probability
-        if temp > rnd:
-            parent = parents[i]
-            break
+    parent = parents[weighted_choice([p.fitness for p in parents])]
 
     parent.transmit(what=what, to_whom=to_whom)
@@ -89,6 +89,14 @@ class SimulatedRecruiter(object):
         """Do nothing."""
         pass
 
+    def reward_bonus(self, assignment_id, amount, reason):
+        """Do nothing, as simulated participants aren't paid."""
+        pass
+
+    def approve_hit(self, assignment_id):
+        """Approve the HIT."""
+        return True
+
 
 class MTurkRecruiterException(Exception):
     """Custom exception for MTurkRecruiter"""
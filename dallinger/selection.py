@@ -0,0 +1,88 @@
+"""Choose things at random in proportion to their weights.
+
+Selection is done by drawing uniform numbers and searching the cumulative
+sum of the weights for them, so drawing a whole generation's worth of parents
+costs a single pass over the weights. NumPy is used to do this if it is
+installed.
+"""
+
+import bisect
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def weighted_choice(weights, n=None):
+    """Pick indices of weights, with probability proportional to the weight.
+
+    If n is None a single index is returned, otherwise a list of n indices
+    drawn with replacement. Weights of None count as 0.
+    """
+    weights = [0.0 if w is None else float(w) for w in weights]
+    if any(w < 0 for w in weights):
+        raise ValueError("Weights cannot be negative.")
+    positive = [i for i, w in enumerate(weights) if w > 0]
+    if not positive:
+        raise ValueError("Cannot choose from {} weights that are all 0."
+                         .format(len(weights)))
+
+    draws = [random.random() for _ in xrange(1 if n is None else n)]
+
+    if numpy is not None:
+        cumulative = numpy.cumsum(weights)
+        draws = numpy.array(draws) * cumulative[-1]
+        indices = numpy.searchsorted(cumulative, draws, side="right").tolist()
+    else:
+        cumulative = []
+        total = 0.0
+        for w in weights:
+            total += w
+            cumulative.append(total)
+        indices = [bisect.bisect_right(cumulative, d * total) for d in draws]
+
+    # Rounding can push a draw past the end of the last positive weight.
+    indices = [min(i, positive[-1]) for i in indices]
+
+    return indices[0] if n is None else indices
+
+
+def fitnesses(agent_type, **kwargs):
+    """Get the ids and fitnesses of agents in a single query.
+
+    agent_type is the class of the agents, which must have a queryable
+    fitness, and kwargs are used to filter them. Failed agents are left out.
+    Returns a list of ids and a matching list of fitnesses.
+    """
+    rows = agent_type.query\
+        .filter_by(failed=False, **kwargs)\
+        .with_entities(agent_type.id, agent_type.fitness)\
+        .order_by(agent_type.id)\
+        .all()
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+
+def select_by_fitness(agent_type, n=None, **kwargs):
+    """Pick agents with probability proportional to their fitness.
+
+    Agents are chosen from the not-failed agents of class agent_type that
+    match kwargs. If n is None a single agent is returned, otherwise a list
+    of n agents chosen with replacement, e.g. the parents of a whole
+    generation. Agents without a fitness are never chosen.
+    """
+    ids, fits = fitnesses(agent_type, **kwargs)
+    if not ids:
+        raise ValueError("There are no {} to choose from."
+                         .format(agent_type.__name__))
+
+    if n is None:
+        return agent_type.query.get(ids[weighted_choice(fits)])
+
+    chosen = [ids[i] for i in weighted_choice(fits, n=n)]
+    if not chosen:
+        return []
+    agents = agent_type.query.filter(agent_type.id.in_(set(chosen))).all()
+    agents = dict((agent.id, agent) for agent in agents)
+    return [agents[i] for i in chosen]
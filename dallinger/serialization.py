@@ -0,0 +1,115 @@
+"""Turn models into JSON quickly.
+
+The JSON of a model is the dict its __json__ method returns. Calling it on
+a model object reads every column through SQLAlchemy's instrumented
+attributes, which takes longer than serializing the dict. So the first time
+a class is serialized its __json__ is compiled into a RowEncoder, which
+knows which columns __json__ reads and runs it on a plain object that holds
+just their values. That builds the very same dict several times faster.
+
+dumps gives exactly what json.dumps(data, default=date_handler) does.
+"""
+
+import json
+
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+
+def date_handler(obj):
+    """Serialize dates."""
+    return obj.isoformat() if hasattr(obj, 'isoformat') else obj
+
+
+def dumps(data):
+    """Serialize data as JSON, with dates in ISO format."""
+    return json.dumps(data, default=date_handler)
+
+
+class _Values(object):
+    """A plain object whose attributes are the values of some columns."""
+
+
+class RowEncoder(object):
+    """Builds the JSON dict of things of a class from the values of columns.
+
+    function is the class's __json__ function and columns are the names of
+    the attributes it reads, each of which must be a column.
+    """
+
+    def __init__(self, function, columns):
+        self.function = function
+        self.columns = list(columns)
+
+    def encode_object(self, thing):
+        """The dict of a thing that is an object."""
+        try:
+            # Loaded columns are in the object's __dict__, which is much
+            # faster to read than the object's attributes.
+            return self._call(thing.__dict__)
+        except AttributeError:
+            # Some columns are not loaded, so let the object load them.
+            return self.function(thing)
+
+    def _call(self, values):
+        thing = _Values()
+        thing.__dict__ = values
+        return self.function(thing)
+
+
+class _Recorder(object):
+    """Stands in for an object to see which attributes __json__ reads."""
+
+    def __init__(self):
+        self.read = []
+
+    def __getattr__(self, name):
+        self.read.append(name)
+        return None
+
+
+_encoders = {}
+
+
+def register(cls, encoder):
+    """Use encoder for things of cls, or None to always call __json__."""
+    _encoders[cls] = encoder
+
+
+def compile_encoder(cls):
+    """Compile the __json__ method of cls into a RowEncoder.
+
+    This only works if __json__ does nothing but read columns of cls,
+    otherwise None is returned.
+    """
+    method = getattr(cls, "__json__", None)
+    if method is None:
+        return None
+    recorder = _Recorder()
+    try:
+        column_attrs = inspect(cls).column_attrs
+        method.__func__(recorder)
+    except Exception:
+        return None
+
+    for name in recorder.read:
+        if (name not in column_attrs or
+                not isinstance(getattr(cls, name), InstrumentedAttribute)):
+            return None
+
+    return RowEncoder(method.__func__, recorder.read)
+
+
+def encoder_for(cls):
+    """The RowEncoder of cls, or None if its __json__ cannot be compiled."""
+    if cls not in _encoders:
+        register(cls, compile_encoder(cls))
+    return _encoders[cls]
+
+
+def serialize(thing):
+    """The JSON dict of a model object, the same as its __json__ returns."""
+    encoder = encoder_for(type(thing))
+    if encoder is None:
+        return thing.__json__()
+    return encoder.encode_object(thing)
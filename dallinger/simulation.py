@@ -0,0 +1,223 @@
+"""Run an experiment with simulated participants, in process.
+
+Each simulated participant does what a participant's browser would, without
+the server: they are created, get a node in each network the experiment
+gives them, respond to it with ``Experiment.simulated_response`` and then
+submit, which is handled by the same worker function as a notification from
+MTurk. Participants are recruited by the SimulatedRecruiter.
+
+The experiment is loaded from the current directory, as it is by the server,
+and the database is the one given by DATABASE_URL, which can be PostgreSQL
+or SQLite.
+
+Replicates of a simulation can be run in parallel, each in its own database,
+and their data merged into one dataset.
+"""
+
+import csv
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import timeit
+import uuid
+
+from dallinger import data
+from dallinger import db
+from dallinger import models
+from dallinger.config import get_config
+from dallinger.utils import generate_random_id
+
+logger = logging.getLogger(__file__)
+
+
+class Simulation(object):
+    """Put simulated participants through the experiment.
+
+    The work of commit_every participants is committed at once, before they
+    submit, rather than after each request as the server does. Pass a seed
+    to make the simulation repeatable.
+    """
+
+    def __init__(self, commit_every=100, seed=None):
+        from dallinger.experiment_server import experiment_server
+
+        config = get_config()
+        if not config.ready:
+            config.load()
+        self.hit_id = generate_random_id()
+        # The simulation's keys in Redis are kept apart from the server's.
+        config.extend({"mode": u"simulate",
+                       "id": u"simulation-{}".format(self.hit_id)})
+
+        self.worker_function = experiment_server.worker_function
+        self.session = db.session
+        self.commit_every = commit_every
+        if seed is not None:
+            random.seed(seed)
+
+        self.experiment = experiment_server.Experiment(self.session)
+        self.experiment.recruiter().open_recruitment(
+            n=self.experiment.initial_recruitment_size)
+        self.session.commit()
+
+    def participate(self):
+        """Create a participant and do their part of the experiment."""
+        exp = self.experiment
+        participant = models.Participant(
+            worker_id=generate_random_id(),
+            assignment_id=generate_random_id(),
+            hit_id=self.hit_id,
+            mode=u"simulate",
+        )
+        self.session.add(participant)
+        self.session.flush()
+
+        while True:
+            network = exp.get_network_for_participant(participant=participant)
+            if network is None:
+                break
+            node = exp.create_node(participant=participant, network=network)
+            exp.add_node_to_network(node=node, network=network)
+            self.session.flush()
+            exp.node_post_request(participant=participant, node=node)
+
+            for info in exp.simulated_response(node):
+                self.session.flush()
+                exp.info_post_request(node=node, info=info)
+            self.session.flush()
+
+        return participant
+
+    def submit(self, assignment_id):
+        """Submit a participant's assignment."""
+        self.worker_function("AssignmentSubmitted", assignment_id, None)
+
+    def run(self, participants):
+        """Simulate that many participants and return a summary.
+
+        The summary has the number of participants, how long they took in
+        seconds and the number of participants with each status, like
+        ``Experiment.log_summary``.
+        """
+        start = timeit.default_timer()
+        for done in range(0, participants, self.commit_every):
+            batch = [self.participate().assignment_id for _ in
+                     range(min(self.commit_every, participants - done))]
+            self.session.commit()
+            for assignment_id in batch:
+                self.submit(assignment_id)
+            self.session.commit()
+            logger.info("Simulated {} participants.".format(
+                done + len(batch)))
+
+        return {
+            "participants": participants,
+            "seconds": timeit.default_timer() - start,
+            "statuses": self.experiment.log_summary(),
+        }
+
+
+def simulate(participants, commit_every=100, seed=None):
+    """Simulate participants in the experiment in the current directory."""
+    simulation = Simulation(commit_every=commit_every, seed=seed)
+    return simulation.run(participants)
+
+
+def replicate(replicates, participants, processes=None, commit_every=100,
+              seed=None, id=None, path="data"):
+    """Simulate replicates of the experiment in parallel, and export them.
+
+    The replicates are shared out among a pool of processes, by default one
+    for each CPU. Each replicate has its own database: a SQLite file if
+    DATABASE_URL is SQLite, else a schema of the PostgreSQL database. They
+    are seeded from seed, so the same seed gives the same replicates however
+    many processes there are.
+
+    The data are merged into one dataset, laid out as by data.export with a
+    replicate column added to each table, and saved to <path>/<id>-data.zip,
+    whose path is returned.
+    """
+    if id is None:
+        id = str(uuid.uuid4())
+    rng = random.Random(seed)
+    seeds = [rng.randint(0, 2 ** 32 - 1) for _ in range(replicates)]
+    tmp = tempfile.mkdtemp()
+
+    tasks = []
+    for i in range(replicates):
+        if db.db_url.startswith("sqlite"):
+            db_url = "sqlite:///{}".format(
+                os.path.join(tmp, "replicate-{}.db".format(i)))
+            schema = None
+        else:
+            db_url = db.db_url
+            schema = "replicate_{}_{}".format(uuid.uuid4().hex[:8], i)
+        tasks.append((i, db_url, schema, participants, commit_every,
+                      seeds[i], os.path.join(tmp, str(i))))
+
+    # Forked processes mustn't share the connections of this one.
+    db.session.remove()
+    db.engine.dispose()
+    # The workers are forked now, from this thread, and not replaced later,
+    # as the config is local to the thread.
+    pool = multiprocessing.Pool(processes)
+    try:
+        pool.map(_replicate, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+    data_path = os.path.join(path, id, "data")
+    os.makedirs(data_path)
+    for table in data.table_names:
+        _merge(
+            [os.path.join(tmp, str(i), "{}.csv".format(table))
+             for i in range(replicates)],
+            os.path.join(data_path, "{}.csv".format(table)))
+    with open(os.path.join(path, id, "experiment_id.md"), "a+") as file:
+        file.write(id)
+
+    shutil.make_archive(
+        os.path.join(path, id + "-data"), "zip", os.path.join(path, id))
+    shutil.rmtree(os.path.join(path, id))
+    shutil.rmtree(tmp)
+
+    return os.path.join(path, id + "-data.zip")
+
+
+def _replicate(task):
+    """Simulate a replicate in its own database, and copy it to CSV files."""
+    (i, db_url, schema, participants, commit_every, seed, path) = task
+    engine = db.create_db_engine(db_url, schema=schema)
+    if schema is not None:
+        engine.execute("CREATE SCHEMA {}".format(schema))
+    try:
+        db.use_engine(engine)
+        db.init_db(drop_all=True)
+        results = simulate(participants, commit_every=commit_every, seed=seed)
+        os.makedirs(path)
+        data.copy_db_to_csv(engine, path)
+    finally:
+        db.session.remove()
+        if schema is not None:
+            engine.execute("DROP SCHEMA {} CASCADE".format(schema))
+        engine.dispose()
+    logger.info("Simulated replicate {} in {:.1f} s.".format(
+        i, results["seconds"]))
+
+
+def _merge(paths, path):
+    """Merge the CSV files of a table, adding the replicate of each row."""
+    with open(path, "wb") as output:
+        writer = csv.writer(output)
+        for i, input_path in enumerate(paths):
+            with open(input_path, "rb") as input:
+                reader = csv.reader(input)
+                headers = next(reader)
+                if i == 0:
+                    writer.writerow(["replicate"] + headers)
+                for row in reader:
+                    writer.writerow([i] + row)
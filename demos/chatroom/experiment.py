@@ -37,8 +37,7 @@ class CoordinationChatroom(dlgr.experiments.Experiment):
 
     def info_post_request(self, node, info):
         """Run when a request to create an info is complete."""
-        for agent in node.neighbors():
-            node.transmit(what=info, to_whom=agent)
+        node.bulk_transmit(what=info, to_whom=node.neighbors())
 
     def create_node(self, participant, network):
         """Create a node for a participant."""
@@ -61,6 +61,9 @@ create_agent = function () {
             $("#send-message").html("Send");
             $("#reproduction").focus();
             get_transmissions(my_node_id);
+            streamTransmissions(my_node_id, function (transmission) {
+                get_transmissions(my_node_id);
+            });
         },
         error: function (err) {
             console.log(err);
@@ -75,7 +78,16 @@ create_agent = function () {
     });
 };
 
+fetching = false;
+fetch_again = false;
+
 get_transmissions = function (my_node_id) {
+    // receive the pending transmissions, one request at a time
+    if (fetching) {
+        fetch_again = true;
+        return;
+    }
+    fetching = true;
     reqwest({
         url: "/node/" + my_node_id + "/transmissions",
         method: "get",
@@ -90,7 +102,11 @@ get_transmissions = function (my_node_id) {
                 console.log(transmissions[i]);
                 display_info(transmissions[i].info_id);
             }
-            get_transmissions(my_node_id);
+            fetching = false;
+            if (fetch_again) {
+                fetch_again = false;
+                get_transmissions(my_node_id);
+            }
         },
         error: function (err) {
             console.log(err);
@@ -93,6 +93,10 @@ class RogersExperiment(Experiment):
         """Run whenever an info is created."""
         node.calculate_fitness()
 
+    def simulated_response(self, node):
+        """Guess a color, as a participant would."""
+        return [Meme(origin=node, contents=random.choice(["blue", "yellow"]))]
+
     def submission_successful(self, participant):
         """Run when a participant submits successfully."""
         num_approved = len(Participant.query.filter_by(status="approved").all())
@@ -108,7 +112,7 @@ class RogersExperiment(Experiment):
         incomplete = num_approved < (self.generations * self.generation_size)
         if end_of_generation and incomplete:
             self.log("generation finished, recruiting another")
-            self.recruiter().recruit_participants(n=self.generation_size)
+            self.recruiter().recruit(n=self.generation_size)
 
     def bonus(self, participant):
         """Calculate a participants bonus."""
@@ -44,3 +44,15 @@ def aws_creds():
         'aws_secret_access_key': config.get('aws_secret_access_key')
     }
     return creds
+
+
+@pytest.fixture
+def assert_max_queries():
+    """Fail if a block of code runs more SQL statements than allowed, e.g.
+
+        def test_receive(self, assert_max_queries):
+            with assert_max_queries(5):
+                node.receive()
+    """
+    from dallinger.db import assert_max_queries
+    return assert_max_queries
@@ -130,6 +130,99 @@ class TestAgents(object):
         transmissions = info.transmissions()
         assert len(transmissions) == 2
 
+    def test_agent_bulk_transmit(self):
+        from sqlalchemy import event
+
+        net = models.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        agent1 = nodes.ReplicatorAgent(network=net)
+        others = [nodes.ReplicatorAgent(network=net) for _ in range(20)]
+        agent1.connect(direction="to", whom=others)
+        info = models.Info(origin=agent1, contents="foo")
+        self.db.commit()
+
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", count)
+        ids = agent1.bulk_transmit(what=info, to_whom=nodes.Agent)
+        event.remove(db.engine, "before_cursor_execute", count)
+
+        # a single insert, and no queries per destination
+        assert len([s for s in statements if "INSERT" in s]) == 1
+        assert len(statements) < len(others)
+
+        transmissions = info.transmissions()
+        assert sorted(ids) == sorted(t.id for t in transmissions)
+        assert (sorted(t.destination_id for t in transmissions) ==
+                sorted(a.id for a in others))
+        for t in transmissions:
+            assert t.status == "pending"
+            assert t.origin_id == agent1.id
+            assert t.network_id == net.id
+            assert t.creation_time is not None
+
+        for agent in others:
+            agent.receive()
+            assert agent.infos()[0].contents == "foo"
+
+        assert agent1.bulk_transmit(what=[], to_whom=others) == []
+
+    def test_new_transmissions_are_recorded(self):
+        net = models.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        agent1 = nodes.ReplicatorAgent(network=net)
+        agent2 = nodes.ReplicatorAgent(network=net)
+        agent3 = nodes.ReplicatorAgent(network=net)
+        agent1.connect(direction="to", whom=[agent2, agent3])
+        info = models.Info(origin=agent1, contents="foo")
+        self.db.commit()
+
+        # Nothing is recorded unless someone is watching.
+        agent1.transmit(what=info, to_whom=agent2)
+        self.db.flush()
+        assert "new_transmissions" not in self.db.info
+
+        self.db.info["new_transmissions"] = recorded = []
+        try:
+            agent1.transmit(what=info, to_whom=agent2)
+            self.db.flush()
+            agent1.bulk_transmit(what=info, to_whom=agent3)
+        finally:
+            del self.db.info["new_transmissions"]
+
+        assert ([t["destination_id"] for t in recorded] ==
+                [agent2.id, agent3.id])
+        for t in recorded:
+            assert (t == models.Transmission.query.get(t["id"]).__json__())
+
+    def test_agent_bulk_transmit_checks_like_transmit(self):
+        net = models.Network()
+        self.db.add(net)
+        agent1 = nodes.ReplicatorAgent(network=net)
+        agent2 = nodes.ReplicatorAgent(network=net)
+        agent3 = nodes.ReplicatorAgent(network=net)
+        agent1.connect(direction="to", whom=agent2)
+        agent2.connect(direction="to", whom=agent1)
+        info = models.Info(origin=agent1, contents="foo")
+        other_info = models.Info(origin=agent2, contents="bar")
+
+        with raises(ValueError):
+            agent1.bulk_transmit(what=info, to_whom=agent3)
+        with raises(ValueError):
+            agent1.bulk_transmit(what=other_info, to_whom=agent2)
+
+        info.fail()
+        with raises(ValueError):
+            agent1.bulk_transmit(what=info, to_whom=agent2)
+        assert models.Transmission.query.count() == 0
+
     def test_transmit_selector_default(self):
         net = models.Network()
         self.db.add(net)
@@ -0,0 +1,71 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from dallinger import assets
+
+
+class TestAssets(object):
+
+    def setup(self):
+        self.dir = tempfile.mkdtemp()
+        for directory in ["static/scripts", "static/images", "templates"]:
+            os.makedirs(os.path.join(self.dir, directory))
+        self._write("static/scripts/experiment.js", "var x = 1;\n" * 100)
+        self._write("static/images/logo.png", "\x89PNG")
+        self._write("templates/exp.html", "\n".join([
+            '<script src="/static/scripts/experiment.js"></script>',
+            '<img src="static/images/logo.png">',
+            '<script src="/static/scripts/experiment.json"></script>',
+        ]))
+
+    def teardown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, path, contents):
+        with open(os.path.join(self.dir, path), "wb") as f:
+            f.write(contents)
+
+    def _read(self, path):
+        with open(os.path.join(self.dir, path), "rb") as f:
+            return f.read()
+
+    def test_build(self):
+        manifest = assets.build(self.dir)
+
+        script = manifest["scripts/experiment.js"]
+        logo = manifest["images/logo.png"]
+        assert script.startswith("scripts/experiment.")
+        assert script.endswith(".js")
+        assert assets.read_manifest(os.path.join(self.dir, "static")) == \
+            manifest
+
+        # The copies are the same as the files, and text files are gzipped.
+        assert self._read("static/" + script) == \
+            self._read("static/scripts/experiment.js")
+        with gzip.open(os.path.join(self.dir, "static", script + ".gz")) as f:
+            assert f.read() == self._read("static/scripts/experiment.js")
+        assert not os.path.exists(os.path.join(self.dir, "static",
+                                               logo + ".gz"))
+
+        assert self._read("templates/exp.html").split("\n") == [
+            '<script src="/static/{}"></script>'.format(script),
+            '<img src="static/{}">'.format(logo),
+            '<script src="/static/scripts/experiment.json"></script>',
+        ]
+
+    def test_build_again(self):
+        manifest = assets.build(self.dir)
+        files = sorted(os.listdir(os.path.join(self.dir, "static/scripts")))
+
+        assert assets.build(self.dir) == manifest
+        assert sorted(os.listdir(os.path.join(self.dir, "static/scripts"))) \
+            == files
+
+        # A file that changes gets a new copy.
+        self._write("static/scripts/experiment.js", "var x = 2;\n")
+        changed = assets.build(self.dir)
+        assert changed["scripts/experiment.js"] != \
+            manifest["scripts/experiment.js"]
+        assert changed["images/logo.png"] == manifest["images/logo.png"]
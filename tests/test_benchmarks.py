@@ -0,0 +1,32 @@
+from benchmarks import runner
+
+
+class TestBenchmarks(object):
+
+    def test_every_benchmark_runs(self):
+        benchmarks = runner.discover()
+        assert "TimeAddNode" in [cls.__name__ for _, cls, _ in benchmarks]
+        for _, cls, method in benchmarks:
+            if cls.__name__ == "TimeSummary":
+                # Importing the server here would leave it with an
+                # experiment module that is unloaded after each test class.
+                continue
+            # The smallest size of each, once.
+            params = runner.combinations(cls)[0]
+            times = runner.measure(cls, method, params, repeat=1)
+            assert times is None or len(times) == 1
+
+    def test_combinations(self):
+        class TimeThings(object):
+            params = ([1, 2], ["a", "b"])
+            param_names = ["number", "letter"]
+
+        class TimeSizes(object):
+            params = [10, 100]
+            param_names = ["size"]
+
+        assert runner.combinations(TimeThings) == [
+            {"number": 1, "letter": "a"}, {"number": 1, "letter": "b"},
+            {"number": 2, "letter": "a"}, {"number": 2, "letter": "b"}]
+        assert runner.combinations(TimeSizes) == [{"size": 10}, {"size": 100}]
+        assert runner.combinations(object) == [{}]
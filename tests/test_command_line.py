@@ -89,6 +89,7 @@ class TestSetupExperiment(object):
         assert(os.path.exists(os.path.join("static", "scripts", "dallinger.js")) is True)
         assert(os.path.exists(os.path.join("static", "scripts", "reqwest.min.js")) is True)
         assert(os.path.exists(os.path.join("static", "robots.txt")) is True)
+        assert(os.path.exists(os.path.join("static", "manifest.json")) is True)
         assert(os.path.exists(os.path.join("templates", "error.html")) is True)
         assert(os.path.exists(os.path.join("templates", "launch.html")) is True)
         assert(os.path.exists(os.path.join("templates", "complete.html")) is True)
@@ -110,6 +111,8 @@ class TestSetupExperiment(object):
         deploy_config = SafeConfigParser()
         deploy_config.read('config.txt')
         assert(int(deploy_config.get('Parameters', 'num_dynos_web')) == 2)
+        # The experiment id namespaces its keys in Redis
+        assert(deploy_config.get('Parameters', 'id') == exp_id)
 
     def test_setup_excludes_sensitive_config(self):
         from dallinger.command_line import setup_experiment
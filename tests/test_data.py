@@ -126,3 +126,33 @@ class TestData(object):
             next(reader)  # Skip the header
             for row in reader:
                 assert "PII" not in row
+
+    def test_copy_db_to_csv_is_like_copy_local_to_csv(self):
+        from dallinger import db, models
+        sqlite_path = tempfile.mkdtemp()
+        engine = db.create_db_engine(
+            "sqlite:///{}".format(os.path.join(sqlite_path, "test.db")))
+        db.Base.metadata.create_all(bind=engine)
+        session = db.init_db(drop_all=True)
+        for bind in [db.engine, engine]:
+            bind.execute(models.Network.__table__.insert(), [
+                {"type": "network", "max_size": 2, "full": False,
+                 "role": "default"}])
+        session.commit()
+
+        postgres_dir = tempfile.mkdtemp()
+        sqlite_dir = tempfile.mkdtemp()
+        dallinger.data.copy_db_to_csv(db.engine, postgres_dir)
+        dallinger.data.copy_db_to_csv(engine, sqlite_dir)
+        for table in dallinger.data.table_names:
+            with open(os.path.join(postgres_dir, table + ".csv")) as f:
+                postgres = list(csv.reader(f))
+            with open(os.path.join(sqlite_dir, table + ".csv")) as f:
+                sqlite = list(csv.reader(f))
+            if table == "network":
+                # Only the times the networks were made differ.
+                creation_time = postgres[0].index("creation_time")
+                for row in postgres[1:] + sqlite[1:]:
+                    del row[creation_time]
+                assert len(postgres) == 2
+            assert postgres == sqlite
@@ -0,0 +1,53 @@
+from pytest import raises
+
+from dallinger import db, models
+
+
+class TestDb(object):
+
+    def setup(self):
+        self.db = db.init_db(drop_all=True)
+
+    def teardown(self):
+        self.db.rollback()
+        self.db.close()
+
+    def test_statement_shape(self):
+        assert db.statement_shape(
+            "SELECT * FROM node\n WHERE node.id IN (%(id_1)s, %(id_2)s)"
+            " AND property1 = 'it''s' AND property2 = %(property2_1)s"
+        ) == ("SELECT * FROM node WHERE node.id IN (...)"
+              " AND property1 = ? AND property2 = %(property2)s")
+
+    def test_assert_max_queries(self, assert_max_queries):
+        nets = [models.Network() for _ in range(3)]
+        self.db.add_all(nets)
+        self.db.commit()
+        ids = [net.id for net in nets]
+
+        with assert_max_queries(3) as queries:
+            for i in ids:
+                models.Network.query.filter_by(id=i).one()
+        assert len(queries) == 3
+
+        with raises(AssertionError) as excinfo:
+            with assert_max_queries(2):
+                for i in ids:
+                    models.Network.query.filter_by(id=i).one()
+        assert "3 queries were run" in str(excinfo.value)
+        assert "    3 x SELECT network.id" in str(excinfo.value)
+
+    def test_assert_max_queries_finds_loops(self, assert_max_queries):
+        nets = [models.Network() for _ in range(3)]
+        self.db.add_all(nets)
+        self.db.commit()
+
+        with raises(AssertionError) as excinfo:
+            with assert_max_queries(10, max_repeats=2):
+                for net in nets:
+                    net.nodes()
+        assert "run 3 times, more than the 2 allowed" in str(excinfo.value)
+
+        with assert_max_queries(1, max_repeats=1):
+            models.Network.query.filter(
+                models.Network.id.in_([n.id for n in nets])).all()
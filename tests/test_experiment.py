@@ -0,0 +1,105 @@
+"""Tests for the base experiment class."""
+
+import threading
+
+from dallinger import db, models, nodes
+from dallinger.experiment import Experiment
+
+
+class TestExperiment(object):
+
+    def setup(self):
+        self.db = db.init_db(drop_all=True)
+        self.exp = Experiment(self.db)
+        self.exp.verbose = False
+
+    def teardown(self):
+        self.db.rollback()
+        self.db.close()
+
+    def _participant(self, session):
+        participant = models.Participant(
+            worker_id="1", hit_id="1", assignment_id="1", mode="test")
+        session.add(participant)
+        session.commit()
+        return participant
+
+    def _networks(self, n, role="experiment", max_size=4):
+        networks = [models.Network(max_size=max_size) for _ in range(n)]
+        for network in networks:
+            network.role = role
+        self.db.add_all(networks)
+        self.db.commit()
+        return networks
+
+    def test_get_network_for_participant(self):
+        experiment_nets = self._networks(2)
+        practice_nets = self._networks(2, role="practice")
+        participant = self._participant(self.db)
+
+        chosen = []
+        for _ in range(4):
+            network = self.exp.get_network_for_participant(participant)
+            nodes.Agent(network=network, participant=participant)
+            self.db.commit()
+            chosen.append(network)
+
+        assert chosen[:2] == practice_nets
+        assert sorted(chosen[2:]) == sorted(experiment_nets)
+        assert self.exp.get_network_for_participant(participant) is None
+
+    def test_get_network_for_participant_skips_full_networks(self):
+        full, free = self._networks(2, max_size=1)
+        nodes.Agent(network=full)
+        self.db.commit()
+
+        for _ in range(3):
+            participant = self._participant(self.db)
+            assert self.exp.get_network_for_participant(participant) == free
+
+    def test_writes_to_a_network_do_not_lock_it(self):
+        busy, free = self._networks(2, role="practice")
+        node = nodes.Agent(network=busy)
+        self.db.commit()
+
+        # Another request is writing to the network, but hasn't committed.
+        other = db.session.session_factory()
+        try:
+            other.add(models.Info(origin=other.merge(node), contents="foo"))
+            other.flush()
+
+            participant = self._participant(self.db)
+            assert self.exp.get_network_for_participant(participant) == busy
+        finally:
+            other.rollback()
+            other.close()
+
+    def test_concurrent_joins_do_not_overfill_networks(self):
+        networks = self._networks(5, max_size=4)
+        joined = []
+
+        def join():
+            exp = Experiment(db.session)
+            exp.verbose = False
+            try:
+                for _ in range(5):
+                    participant = self._participant(db.session)
+                    network = exp.get_network_for_participant(participant)
+                    if network is not None:
+                        nodes.Agent(network=network, participant=participant)
+                        joined.append(network.id)
+                    db.session.commit()
+            finally:
+                db.session.remove()
+
+        threads = [threading.Thread(target=join) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.db.expire_all()
+        assert len(joined) == 20
+        for network in networks:
+            assert network.size() == 4
+            assert network.full is True
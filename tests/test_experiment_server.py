@@ -2,6 +2,18 @@ import json
 import os
 import unittest
 
+from redis.exceptions import RedisError
+
+
+def requires_redis(test):
+    """Skip a test if there is no Redis server to connect to."""
+    from dallinger.heroku.worker import conn
+    try:
+        conn.ping()
+    except RedisError:
+        return unittest.skip("Redis is not available")(test)
+    return test
+
 
 class FlaskAppTest(unittest.TestCase):
     """Base test case class for tests of the flask app."""
@@ -86,6 +98,85 @@ class TestExperimentServer(FlaskAppTest):
         assert 'Please click the "Accept HIT" button on the Amazon site' in resp.data
         assert 'Begin Experiment' not in resp.data
 
+    def test_ad_template_is_compiled_once(self):
+        from dallinger.experiment_server import experiment_server
+        template = experiment_server.ad_template('debug')
+        assert experiment_server.ad_template('debug') is template
+        assert experiment_server.ad_template('sandbox') is not template
+        assert 'mode=debug' in self.app.get('/ad', query_string={
+            'hitId': 'debug', 'assignmentId': '1'}).data
+
+        # It is compiled again if the file changes.
+        modified = os.path.getmtime('templates/ad.html')
+        os.utime('templates/ad.html', (modified + 1, modified + 1))
+        try:
+            assert experiment_server.ad_template('debug') is not template
+        finally:
+            os.utime('templates/ad.html', (modified, modified))
+
+    def test_ad_excluded_browsers(self):
+        import mock
+        from dallinger.experiment_server import experiment_server
+        iphone = ('Mozilla/5.0 (iPhone; CPU iPhone OS 5_1 like Mac OS X) '
+                  'AppleWebKit/534.46 (KHTML, like Gecko) Version/5.1 '
+                  'Mobile/9B179 Safari/7534.48.3')
+        ie = 'Mozilla/5.0 (compatible; MSIE 9.0; Windows NT 6.1; Trident/5.0)'
+        firefox = ('Mozilla/5.0 (X11; Linux x86_64; rv:50.0) Gecko/20100101 '
+                   'Firefox/50.0')
+
+        experiment_server.browser_allowed.cache_clear()
+        with mock.patch.object(experiment_server.user_agents, 'parse',
+                               wraps=experiment_server.user_agents.parse
+                               ) as parse:
+            for _ in range(3):
+                for user_agent, allowed in [(iphone, False), (ie, False),
+                                            (firefox, True)]:
+                    resp = self.app.get(
+                        '/ad',
+                        query_string={'hitId': 'debug', 'assignmentId': '1'},
+                        headers={'User-Agent': user_agent})
+                    assert ('Begin Experiment' in resp.data) is allowed
+
+        # Each user agent is only parsed once, and IE never as it is
+        # excluded by name.
+        assert parse.call_count == 2
+        assert experiment_server.browser_allowed(iphone, 'MSIE, tablet')
+
+    def test_fingerprinted_static_files(self):
+        import gzip
+        import shutil
+        import tempfile
+        from StringIO import StringIO
+        from dallinger import assets
+        from dallinger.experiment_server.experiment_server import app
+
+        static_folder = app.static_folder
+        app.static_folder = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(app.static_folder, "exp.js"), "w") as f:
+                f.write("var x = 1;\n" * 100)
+            script = assets.fingerprint_static(app.static_folder)["exp.js"]
+
+            resp = self.app.get('/static/exp.js')
+            assert resp.data == "var x = 1;\n" * 100
+            assert 'immutable' not in resp.headers.get('Cache-Control', '')
+
+            resp = self.app.get('/static/' + script)
+            assert resp.data == "var x = 1;\n" * 100
+            assert 'Content-Encoding' not in resp.headers
+            assert 'immutable' in resp.headers['Cache-Control']
+            assert resp.headers['Vary'] == 'Accept-Encoding'
+
+            resp = self.app.get('/static/' + script,
+                                headers={'Accept-Encoding': 'gzip, deflate'})
+            assert resp.headers['Content-Encoding'] == 'gzip'
+            assert resp.mimetype.endswith('javascript')
+            unzipped = gzip.GzipFile(fileobj=StringIO(resp.data)).read()
+            assert unzipped == "var x = 1;\n" * 100
+        finally:
+            shutil.rmtree(app.static_folder)
+            app.static_folder = static_folder
+
     def test_ad_no_params(self):
         resp = self.app.get('/ad')
         assert resp.status_code == 500
@@ -142,6 +233,606 @@ class TestExperimentServer(FlaskAppTest):
         assert data.get('status') == 'success'
         assert data.get('infos') == []
 
+    def test_one_experiment_per_request(self):
+        from dallinger.experiment_server import experiment_server
+        Experiment = experiment_server.Experiment
+        created = []
+
+        class CountingExperiment(Experiment):
+            def __init__(self, session=None):
+                created.append(self)
+                super(CountingExperiment, self).__init__(session)
+
+        p_id = self._create_participant()
+        n_id = self._create_node(p_id)
+        experiment_server.Experiment = CountingExperiment
+        try:
+            resp = self.app.post('/info/{}'.format(n_id), data={
+                "contents": "foo",
+                "info_type": "Info",
+                "property1": "bar",
+            })
+            assert json.loads(resp.data).get('status') == 'success'
+            assert len(created) == 1
+
+            self.app.get('/node/{}/infos?info_type=Info'.format(n_id))
+            assert len(created) == 2
+        finally:
+            experiment_server.Experiment = Experiment
+
+    def test_one_commit_per_request(self):
+        from sqlalchemy import event
+        import dallinger.db
+
+        commits = []
+
+        def count(conn):
+            commits.append(conn)
+
+        # The first request sets up the networks.
+        self.app.get('/experiment/verbose')
+        p_id = self._create_participant()
+        event.listen(dallinger.db.engine, "commit", count)
+        try:
+            n_id = self._create_node(p_id)
+            assert len(commits) == 1
+
+            resp = self.app.post('/info/{}'.format(n_id), data={
+                "contents": "foo",
+                "property1": "bar",
+            })
+            assert json.loads(resp.data).get('status') == 'success'
+            assert len(commits) == 2
+
+            # Failed requests commit nothing.
+            resp = self.app.post('/info/{}'.format(n_id))
+            assert json.loads(resp.data).get('status') == 'error'
+            assert len(commits) == 2
+        finally:
+            event.remove(dallinger.db.engine, "commit", count)
+
+    @requires_redis
+    def test_redis_keys_are_namespaced(self):
+        from dallinger.experiment_server import experiment_server
+
+        config = experiment_server.config
+        config.extend({"id": u"exp-1"})
+        try:
+            assert (experiment_server.redis_key("summary", "version") ==
+                    "dallinger:exp-1:summary:version")
+            assert (experiment_server.stream_channel(1) ==
+                    "dallinger:exp-1:node:1:transmissions")
+        finally:
+            config.data.popleft()
+
+    def test_summary_is_cached(self):
+        from sqlalchemy import event
+        import dallinger.db
+
+        statements = []
+
+        def count(*args, **kwargs):
+            statements.append(args)
+
+        # The first request sets up the networks, which changes the summary.
+        self.app.get('/summary')
+        first = json.loads(self.app.get('/summary').data)
+        event.listen(dallinger.db.engine, "before_cursor_execute", count)
+        second = json.loads(self.app.get('/summary').data)
+        event.remove(dallinger.db.engine, "before_cursor_execute", count)
+        assert second == first
+        assert statements == []
+
+        # Committing a change to participants makes the summary stale.
+        self._create_participant()
+        data = json.loads(self.app.get('/summary').data)
+        assert data.get('summary') == [[u'working', 1]]
+
+    @requires_redis
+    def test_metrics(self):
+        from dallinger.experiment_server import experiment_server
+        experiment_server.metrics.flush(force=True)
+        experiment_server.conn.delete(experiment_server.metrics.key)
+
+        p_id = self._create_participant()
+        self._create_node(p_id)
+        self.app.get('/node/{}/infos'.format(p_id))
+        self.app.get('/node/9999/infos')
+
+        resp = self.app.get('/metrics')
+        assert resp.mimetype == 'text/plain'
+        samples = {}
+        for line in resp.data.splitlines():
+            if not line.startswith('#'):
+                sample, value = line.rsplit(' ', 1)
+                samples[sample] = float(value)
+
+        assert '# TYPE dallinger_request_duration_seconds histogram' in \
+            resp.data
+        assert samples['dallinger_requests_total'
+                       '{route="node_infos",status="200"}'] == 1
+        assert samples['dallinger_requests_total'
+                       '{route="node_infos",status="400"}'] == 1
+        assert samples['dallinger_request_duration_seconds_count'
+                       '{route="create_node"}'] == 1
+        assert samples['dallinger_request_duration_seconds_bucket'
+                       '{le="+Inf",route="create_node"}'] == 1
+        assert samples['dallinger_request_sql_statements_sum'
+                       '{route="create_node"}'] > 1
+        assert samples['dallinger_hook_duration_seconds_count'
+                       '{hook="create_node"}'] == 1
+
+        # Buckets are in order of their bounds.
+        buckets = [line for line in resp.data.splitlines() if line.startswith(
+            'dallinger_request_duration_seconds_bucket{le=')
+            and 'route="create_node"' in line]
+        assert buckets[0].startswith(
+            'dallinger_request_duration_seconds_bucket{le="0.005"')
+        assert buckets[-1].startswith(
+            'dallinger_request_duration_seconds_bucket{le="+Inf"')
+
+    @requires_redis
+    def test_transmissions_are_published(self):
+        from dallinger.experiment_server import experiment_server
+        from dallinger.heroku.worker import conn
+
+        n1_id = self._create_node(self._create_participant())
+        n2_id = self._create_node(self._create_participant())
+        pubsub = conn.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(experiment_server.stream_channel(n2_id))
+        try:
+            resp = self.app.post('/info/{}'.format(n1_id),
+                                 data={"contents": "foo"})
+            info_id = json.loads(resp.data)['info']['id']
+            resp = self.app.post('/node/{}/transmit'.format(n1_id),
+                                 data={"what": info_id, "to_whom": n2_id})
+            transmission = json.loads(resp.data)['transmissions'][0]
+
+            message = None
+            for _ in range(10):
+                message = pubsub.get_message(timeout=0.1) or message
+            assert json.loads(message['data']) == transmission
+        finally:
+            pubsub.close()
+
+        # Nothing is published by requests that fail.
+        pubsub = conn.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(experiment_server.stream_channel(n2_id))
+        try:
+            self.app.post('/node/{}/transmit'.format(n1_id),
+                          data={"what": info_id, "to_whom": 12345})
+            for _ in range(5):
+                assert pubsub.get_message(timeout=0.1) is None
+        finally:
+            pubsub.close()
+
+    @requires_redis
+    def test_node_stream(self):
+        from dallinger.experiment_server import experiment_server
+
+        n1_id = self._create_node(self._create_participant())
+        n2_id = self._create_node(self._create_participant())
+        resp = self.app.post('/info/{}'.format(n1_id),
+                             data={"contents": "foo"})
+        info_id = json.loads(resp.data)['info']['id']
+        self.app.post('/node/{}/transmit'.format(n1_id),
+                      data={"what": info_id, "to_whom": n2_id})
+
+        timeout = experiment_server.STREAM_TIMEOUT
+        experiment_server.STREAM_TIMEOUT = 0.2
+        try:
+            resp = self.app.get('/node/{}/stream'.format(n2_id))
+        finally:
+            experiment_server.STREAM_TIMEOUT = timeout
+        assert resp.mimetype == 'text/event-stream'
+        events = [e for e in resp.data.split("\n\n") if e]
+        assert events[0] == ": connected"
+        assert len(events) == 2
+        assert events[1].startswith("event: transmission\ndata: ")
+        data = json.loads(events[1].split("data: ", 1)[1])
+        assert data['info_id'] == info_id
+        assert data['status'] == 'pending'
+
+        resp = self.app.get('/node/12345/stream')
+        assert json.loads(resp.data)['status'] == 'error'
+
+    def test_batch(self):
+        from sqlalchemy import event
+        import dallinger.db
+
+        n1_id = self._create_node(self._create_participant())
+        n2_id = self._create_node(self._create_participant())
+
+        commits = []
+
+        def count(conn):
+            commits.append(conn)
+
+        operations = [
+            {"method": "POST", "url": "/info/{}".format(n1_id),
+             "data": {"contents": "foo", "property1": "bar"}},
+            {"method": "POST", "url": "/node/{}/transmit".format(n1_id),
+             "data": {"what": "$0.info.id", "to_whom": n2_id}},
+            {"method": "GET", "url": "/node/{}/transmissions".format(n2_id),
+             "data": {"status": "pending"}},
+            {"method": "GET",
+             "url": "/info/{}/$0.info.id".format(n2_id)},
+        ]
+        event.listen(dallinger.db.engine, "commit", count)
+        try:
+            resp = self.app.post('/batch',
+                                 data=json.dumps({"operations": operations}),
+                                 content_type='application/json')
+        finally:
+            event.remove(dallinger.db.engine, "commit", count)
+        assert len(commits) == 1
+
+        data = json.loads(resp.data)
+        assert data['status'] == 'success'
+        info, transmit, transmissions, received = data['results']
+        assert info['info']['contents'] == 'foo'
+        assert info['info']['property1'] == 'bar'
+        assert (transmit['transmissions'][0]['info_id'] ==
+                info['info']['id'])
+        assert ([t['id'] for t in transmissions['transmissions']] ==
+                [transmit['transmissions'][0]['id']])
+        assert received['info']['id'] == info['info']['id']
+
+    def test_batch_get_with_query_string(self):
+        n1_id = self._create_node(self._create_participant())
+        n2_id = self._create_node(self._create_participant())
+        operations = [
+            {"method": "POST", "url": "/info/{}".format(n1_id),
+             "data": {"contents": "foo"}},
+            {"method": "GET",
+             "url": "/node/{}/infos?info_type=Meme".format(n1_id)},
+            {"method": "GET",
+             "url": "/node/{}/infos?info_type=Info".format(n1_id)},
+            {"method": "POST", "url": "/node/{}/transmit".format(n1_id),
+             "data": {"what": "$0.info.id", "to_whom": n2_id}},
+            {"method": "GET",
+             "url": "/node/{}/transmissions?direction=incoming".format(n2_id),
+             "data": {"status": "pending"}},
+        ]
+        resp = self.app.post('/batch',
+                             data=json.dumps({"operations": operations}),
+                             content_type='application/json')
+        data = json.loads(resp.data)
+        assert data['status'] == 'success'
+        info, memes, infos, transmit, transmissions = data['results']
+        assert memes['infos'] == []
+        assert [i['id'] for i in infos['infos']] == [info['info']['id']]
+        assert ([t['id'] for t in transmissions['transmissions']] ==
+                [transmit['transmissions'][0]['id']])
+
+    def test_batch_is_all_or_nothing(self):
+        n_id = self._create_node(self._create_participant())
+        operations = [
+            {"method": "POST", "url": "/info/{}".format(n_id),
+             "data": {"contents": "foo"}},
+            {"method": "POST", "url": "/info/{}".format(n_id)},
+        ]
+        resp = self.app.post('/batch',
+                             data=json.dumps({"operations": operations}),
+                             content_type='application/json')
+        data = json.loads(resp.data)
+        assert data['status'] == 'error'
+        assert data['operation'] == 1
+
+        resp = self.app.get('/node/{}/infos'.format(n_id))
+        assert json.loads(resp.data)['infos'] == []
+
+        for operation in [{"method": "POST", "url": "/launch"},
+                          {"method": "GET", "url": "/info/$5.info.id"},
+                          {"method": "GET", "url": "/node/1/infos?foo=1",
+                           "data": ["bar"]}]:
+            resp = self.app.post('/batch',
+                                 data=json.dumps({"operations": [operation]}),
+                                 content_type='application/json')
+            assert json.loads(resp.data)['status'] == 'error'
+
+    def test_create_questions(self):
+        from sqlalchemy import event
+        import dallinger.db
+        from dallinger.models import Question
+
+        p_id = self._create_participant()
+        questions = [
+            {"question": "age", "number": 1, "response": "30"},
+            {"question": "fun", "number": 2, "response": 5},
+            {"question": "comments", "number": "3", "response": ""},
+        ]
+
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(dallinger.db.engine, "before_cursor_execute", count)
+        try:
+            resp = self.app.post('/questions/{}'.format(p_id),
+                                 data=json.dumps({"questions": questions}),
+                                 content_type='application/json')
+        finally:
+            event.remove(dallinger.db.engine, "before_cursor_execute", count)
+        assert json.loads(resp.data)['status'] == 'success'
+        assert len([s for s in statements if "INSERT" in s]) == 1
+
+        saved = Question.query.order_by(Question.number).all()
+        assert [(q.number, q.question, q.response) for q in saved] == [
+            (1, u"age", u"30"), (2, u"fun", u"5"), (3, u"comments", u"")]
+        assert all(q.participant_id == p_id for q in saved)
+        assert all(q.creation_time is not None for q in saved)
+        assert all(q.type == "question" for q in saved)
+
+    def test_create_questions_checks_every_question(self):
+        from dallinger.models import Question
+
+        p_id = self._create_participant()
+        for questions in [
+            [{"question": "age", "number": 1, "response": "30"},
+             {"question": "fun", "number": "two", "response": "5"}],
+            [{"question": "age", "number": 1, "response": None}],
+            [{"question": "age", "number": 1}],
+            None,
+        ]:
+            resp = self.app.post('/questions/{}'.format(p_id),
+                                 data=json.dumps({"questions": questions}),
+                                 content_type='application/json')
+            assert json.loads(resp.data)['status'] == 'error'
+        assert Question.query.count() == 0
+
+        resp = self.app.post('/questions/{}'.format(p_id),
+                             data=json.dumps({"questions": []}),
+                             content_type='application/json')
+        assert json.loads(resp.data)['status'] == 'success'
+
+    def test_node_infos_pages(self):
+        n_id = self._create_node(self._create_participant())
+        ids = []
+        for i in range(5):
+            resp = self.app.post('/info/{}'.format(n_id),
+                                 data={"contents": "x" * 100,
+                                       "property1": str(i)})
+            ids.append(json.loads(resp.data)['info']['id'])
+
+        resp = self.app.get('/node/{}/infos?limit=2'.format(n_id))
+        infos = json.loads(resp.data)['infos']
+        assert [i['id'] for i in infos] == ids[:2]
+        assert infos[0]['contents'] == "x" * 100
+
+        resp = self.app.get(
+            '/node/{}/infos?since_id={}&limit=2&fields=property1'.format(
+                n_id, ids[1]))
+        infos = json.loads(resp.data)['infos']
+        assert infos == [{"id": ids[2], "property1": "2"},
+                         {"id": ids[3], "property1": "3"}]
+
+        for query in ["limit=-1", "since_id=x", "fields=id,nope"]:
+            resp = self.app.get('/node/{}/infos?{}'.format(n_id, query))
+            assert json.loads(resp.data)['status'] == 'error'
+
+    def test_node_transmissions_pages(self):
+        n1_id = self._create_node(self._create_participant())
+        n2_id = self._create_node(self._create_participant())
+        ids = []
+        for i in range(3):
+            resp = self.app.post('/info/{}'.format(n1_id),
+                                 data={"contents": str(i)})
+            info_id = json.loads(resp.data)['info']['id']
+            resp = self.app.post('/node/{}/transmit'.format(n1_id),
+                                 data={"what": info_id, "to_whom": n2_id})
+            ids.append(json.loads(resp.data)['transmissions'][0]['id'])
+
+        # Only the transmissions in the page are received.
+        resp = self.app.get(
+            '/node/{}/transmissions?status=pending&limit=2'.format(n2_id))
+        transmissions = json.loads(resp.data)['transmissions']
+        assert [t['id'] for t in transmissions] == ids[:2]
+        resp = self.app.get(
+            '/node/{}/transmissions?status=pending&fields=info_id'.format(
+                n2_id))
+        transmissions = json.loads(resp.data)['transmissions']
+        assert [t['id'] for t in transmissions] == ids[2:]
+        assert set(transmissions[0]) == set(["id", "info_id"])
+
+        resp = self.app.get('/node/{}/received_infos?fields=contents'.format(
+            n2_id))
+        infos = json.loads(resp.data)['infos']
+        assert [i['contents'] for i in infos] == ["0", "1", "2"]
+
+    def test_node_transmissions_page_query_count(self):
+        from dallinger.db import assert_max_queries
+
+        n1_id = self._create_node(self._create_participant())
+        n2_id = self._create_node(self._create_participant())
+        for i in range(5):
+            resp = self.app.post('/info/{}'.format(n1_id),
+                                 data={"contents": str(i)})
+            info_id = json.loads(resp.data)['info']['id']
+            self.app.post('/node/{}/transmit'.format(n1_id),
+                          data={"what": info_id, "to_whom": n2_id})
+
+        # The page is received at once, however many transmissions it has.
+        with assert_max_queries(10, max_repeats=1):
+            resp = self.app.get(
+                '/node/{}/transmissions?limit=4&fields=info_id'.format(n2_id))
+        transmissions = json.loads(resp.data)['transmissions']
+        assert len(transmissions) == 4
+
+        resp = self.app.get(
+            '/node/{}/transmissions?status=pending'.format(n2_id))
+        assert len(json.loads(resp.data)['transmissions']) == 1
+
+    def test_node_neighbors_and_vectors(self):
+        n1_id = self._create_node(self._create_participant())
+        n2_id = self._create_node(self._create_participant())
+
+        resp = self.app.get('/node/{}/neighbors?fields=type'.format(n1_id))
+        nodes = json.loads(resp.data)['nodes']
+        assert nodes == [{"id": n2_id, "type": "node"}]
+
+        resp = self.app.get('/node/{}/neighbors?since_id={}'.format(
+            n1_id, n2_id))
+        assert json.loads(resp.data)['nodes'] == []
+
+        resp = self.app.get('/node/{}/vectors?limit=1'.format(n1_id))
+        vectors = json.loads(resp.data)['vectors']
+        assert len(vectors) == 1
+        assert vectors[0]['origin_id'] == n1_id
+
+    def test_node_neighbors_pages(self):
+        from dallinger import models
+
+        n_id = self._create_node(self._create_participant())
+        node = models.Node.query.get(n_id)
+        neighbors = [models.Node(network=node.network) for _ in range(5)]
+        self.db.add_all(neighbors)
+        self.db.flush()
+        # Connect in an order other than that of the ids.
+        for neighbor in reversed(neighbors):
+            node.connect(whom=neighbor)
+        self.db.commit()
+        ids = [n.id for n in neighbors]
+
+        resp = self.app.get('/node/{}/neighbors?limit=2'.format(n_id))
+        assert [n['id'] for n in json.loads(resp.data)['nodes']] == ids[:2]
+        resp = self.app.get('/node/{}/neighbors?since_id={}&limit=2'.format(
+            n_id, ids[1]))
+        assert [n['id'] for n in json.loads(resp.data)['nodes']] == ids[2:4]
+        resp = self.app.get('/node/{}/neighbors?since_id={}'.format(
+            n_id, ids[3]))
+        assert [n['id'] for n in json.loads(resp.data)['nodes']] == ids[4:]
+
+        resp = self.app.get('/node/{}/neighbors?failed=False'.format(n_id))
+        assert len(json.loads(resp.data)['nodes']) == 5
+        resp = self.app.get('/node/{}/neighbors?failed=True'.format(n_id))
+        assert json.loads(resp.data)['status'] == 'error'
+
+    def test_get_network_fields(self):
+        self._create_node(self._create_participant())
+        resp = self.app.get('/network/1?fields=max_size,full')
+        network = json.loads(resp.data)['network']
+        assert network == {"id": 1, "max_size": 2, "full": False}
+
+    @requires_redis
+    def test_etag_changes_with_the_network(self):
+        from sqlalchemy import event
+        import dallinger.db
+
+        n_id = self._create_node(self._create_participant())
+        resp = self.app.get('/node/{}/infos'.format(n_id))
+        tag = resp.headers['ETag']
+        assert tag.startswith('W/"1.')
+
+        statements = []
+
+        def count(*args):
+            statements.append(args)
+
+        event.listen(dallinger.db.engine, "before_cursor_execute", count)
+        resp = self.app.get('/node/{}/infos'.format(n_id),
+                            headers={"If-None-Match": tag})
+        event.remove(dallinger.db.engine, "before_cursor_execute", count)
+        assert resp.status_code == 304
+        assert resp.headers['ETag'] == tag
+        assert len(statements) == 1
+
+        self.app.post('/info/{}'.format(n_id), data={"contents": "foo"})
+        resp = self.app.get('/node/{}/infos'.format(n_id),
+                            headers={"If-None-Match": tag})
+        assert resp.status_code == 200
+        assert resp.headers['ETag'] != tag
+        assert len(json.loads(resp.data)['infos']) == 1
+
+        resp = self.app.get('/network/1', headers={"If-None-Match": tag})
+        assert resp.status_code == 200
+        resp = self.app.get('/network/1',
+                            headers={"If-None-Match": resp.headers['ETag']})
+        assert resp.status_code == 304
+
+    @requires_redis
+    def test_etag_of_a_route_that_writes(self):
+        n1_id = self._create_node(self._create_participant())
+        n2_id = self._create_node(self._create_participant())
+        resp = self.app.post('/info/{}'.format(n1_id),
+                             data={"contents": "foo"})
+        info_id = json.loads(resp.data)['info']['id']
+        self.app.post('/node/{}/transmit'.format(n1_id),
+                      data={"what": info_id, "to_whom": n2_id})
+
+        # Getting the transmissions receives them, which changes the network,
+        # so the response isn't tagged.
+        resp = self.app.get('/node/{}/transmissions'.format(n2_id))
+        assert json.loads(resp.data)['transmissions'][0]['status'] == \
+            'received'
+        assert 'ETag' not in resp.headers
+
+        resp = self.app.get('/node/{}/transmissions'.format(n2_id))
+        assert json.loads(resp.data)['transmissions'][0]['status'] == \
+            'received'
+        resp = self.app.get('/node/{}/transmissions'.format(n2_id),
+                            headers={"If-None-Match": resp.headers['ETag']})
+        assert resp.status_code == 304
+
+    @requires_redis
+    def test_network_version_is_bumped_on_commit(self):
+        from dallinger import models
+        from dallinger.db import session
+        from dallinger.experiment_server.experiment_server import (
+            network_version
+        )
+
+        n_id = self._create_node(self._create_participant())
+        network_id, epoch, count = network_version(node_id=n_id)
+
+        session.add(models.Info(origin=models.Node.query.get(n_id)))
+        session.flush()
+        assert network_version(node_id=n_id) == (network_id, epoch, count)
+        session.rollback()
+        assert network_version(node_id=n_id) == (network_id, epoch, count)
+
+        session.add(models.Info(origin=models.Node.query.get(n_id)))
+        session.commit()
+        assert network_version(node_id=n_id) == (
+            network_id, epoch, count + 1)
+        assert network_version(network_id=network_id) == (
+            network_id, epoch, count + 1)
+
+        assert network_version(network_id=12345) is None
+        assert network_version(node_id=12345) is None
+
+    @requires_redis
+    def test_etags_of_an_earlier_database_do_not_match(self):
+        import dallinger.db
+        from dallinger.heroku.worker import conn
+        from dallinger.experiment_server.experiment_server import (
+            NETWORK_VERSIONS, network_version, redis_key
+        )
+        key = redis_key(*NETWORK_VERSIONS)
+
+        n_id = self._create_node(self._create_participant())
+        resp = self.app.get('/node/{}/infos'.format(n_id))
+        tag = resp.headers['ETag']
+        network_id, _, count = network_version(node_id=n_id)
+        self.db.rollback()
+
+        # The database is made again, and its network changes as often.
+        self.db = dallinger.db.init_db(drop_all=True)
+        assert self._create_node(self._create_participant()) == n_id
+        conn.hset(key, network_id, count)
+        resp = self.app.get('/node/{}/infos'.format(n_id),
+                            headers={"If-None-Match": tag})
+        assert resp.status_code == 200
+        tag = resp.headers['ETag']
+
+        # Redis loses the versions, and the network changes as often again.
+        conn.delete(key)
+        conn.hset(key, network_id, count)
+        resp = self.app.get('/node/{}/infos'.format(n_id),
+                            headers={"If-None-Match": tag})
+        assert resp.status_code == 200
+
     def test_summary(self):
         resp = self.app.get('/summary')
         assert resp.status_code == 200
@@ -187,3 +878,91 @@ class TestExperimentServer(FlaskAppTest):
     def test_not_found(self):
         resp = self.app.get('/BOGUS')
         assert resp.status_code == 404
+
+
+class TestStreamWorkers(unittest.TestCase):
+    """Streams on a running server, which has fewer workers than streams."""
+
+    workers = 1
+    streams = 3
+
+    def setUp(self):
+        import socket
+        import subprocess
+        import sys
+        import tempfile
+        import time
+        import requests
+        import dallinger
+        from dallinger import db, models
+
+        session = db.init_db(drop_all=True)
+        network = models.Network(max_size=self.streams)
+        session.add(network)
+        session.flush()
+        self.node_ids = []
+        for _ in range(self.streams):
+            node = models.Node(network=network)
+            session.add(node)
+            session.flush()
+            self.node_ids.append(node.id)
+        session.commit()
+        session.close()
+
+        sock = socket.socket()
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        self.url = "http://localhost:{}".format(port)
+
+        # launch.py is run as a script, so Dallinger must be on the path.
+        root = os.path.dirname(os.path.dirname(dallinger.__file__))
+        env = dict(os.environ, PORT=str(port), threads=str(self.workers),
+                   worker_class="gevent", logfile="-",
+                   PYTHONPATH=os.pathsep.join(
+                       [root] + os.environ.get("PYTHONPATH", "").split(
+                           os.pathsep)))
+        self.log = tempfile.TemporaryFile()
+        self.server = subprocess.Popen(
+            [sys.executable, os.path.join(root, "dallinger", "heroku",
+                                          "launch.py")],
+            cwd=os.path.join("tests", "experiment"), env=env,
+            stdout=self.log, stderr=subprocess.STDOUT)
+
+        deadline = time.time() + 30
+        while True:
+            try:
+                requests.get(self.url + "/robots.txt", timeout=1)
+                break
+            except requests.exceptions.RequestException:
+                if time.time() > deadline or self.server.poll() is not None:
+                    self.tearDown()
+                    raise RuntimeError("The server did not start.")
+                time.sleep(0.2)
+
+    def tearDown(self):
+        self.server.terminate()
+        self.server.wait()
+        self.log.close()
+
+    @requires_redis
+    def test_streams_leave_workers_free(self):
+        import time
+        import requests
+
+        streams = [
+            requests.get("{}/node/{}/stream".format(self.url, node_id),
+                         stream=True, timeout=5)
+            for node_id in self.node_ids]
+        try:
+            assert all(s.status_code == 200 for s in streams)
+            start = time.time()
+            resp = requests.get(
+                "{}/node/{}/infos".format(self.url, self.node_ids[0]),
+                timeout=5)
+            assert resp.status_code == 200
+            assert json.loads(resp.content)["infos"] == []
+            assert time.time() - start < 2
+        finally:
+            for stream in streams:
+                stream.close()
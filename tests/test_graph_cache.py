@@ -0,0 +1,227 @@
+import random
+
+from sqlalchemy import event
+
+from dallinger import db, graph_cache, models, networks, nodes
+
+
+class TestGraphCache(object):
+
+    def setup(self):
+        self.db = db.init_db(drop_all=True)
+        graph_cache.enable()
+
+    def teardown(self):
+        graph_cache.disable()
+        self.db.rollback()
+        self.db.close()
+
+    def _fresh(self, net):
+        return graph_cache.NetworkGraph(net.id)
+
+    def _assert_matches_database(self, net):
+        cached = graph_cache.graph(net)
+        fresh = self._fresh(net)
+        assert cached.nodes() == fresh.nodes()
+        for node_id in fresh.nodes():
+            for direction in ["to", "from", "either", "both"]:
+                assert (cached.neighbors(node_id, direction=direction) ==
+                        fresh.neighbors(node_id, direction=direction))
+            for direction in ["incoming", "outgoing", "all"]:
+                assert (cached.degree(node_id, direction=direction) ==
+                        fresh.degree(node_id, direction=direction))
+
+    def test_graph_is_cached(self):
+        net = models.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        assert graph_cache.graph(net) is graph_cache.graph(net)
+
+        graph_cache.disable()
+        assert graph_cache.graph(net) is not graph_cache.graph(net)
+
+    def test_graph_tracks_nodes(self):
+        net = models.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        graph = graph_cache.graph(net)
+        assert graph.nodes() == []
+
+        agent1 = nodes.Agent(network=net)
+        source = nodes.Source(network=net)
+        agent2 = nodes.Agent(network=net)
+
+        graph = graph_cache.graph(net)
+        assert graph.nodes() == [agent1.id, source.id, agent2.id]
+        assert graph.nodes(type=nodes.Source) == [source.id]
+        assert graph.nodes(exclude=source.id) == [agent1.id, agent2.id]
+        assert graph.size() == 3
+        assert graph.size(type=nodes.Agent) == 2
+        assert graph.first() == agent1.id
+        assert graph.last() == agent2.id
+        assert graph.last(exclude=agent2.id) == source.id
+        assert graph.newest(2) == [agent2.id, source.id]
+        assert graph.oldest(5, type=nodes.Agent) == [agent1.id, agent2.id]
+
+        agent1.fail()
+
+        graph = graph_cache.graph(net)
+        assert graph.nodes() == [source.id, agent2.id]
+        self._assert_matches_database(net)
+
+    def test_graph_tracks_vectors(self):
+        net = models.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        agent1 = nodes.Agent(network=net)
+        agent2 = nodes.Agent(network=net)
+        agent3 = nodes.Agent(network=net)
+        agent1.connect(whom=agent2)
+
+        graph = graph_cache.graph(net)
+        assert graph.neighbors(agent1.id) == set([agent2.id])
+
+        agent2.connect(direction="both", whom=agent3)
+
+        graph = graph_cache.graph(net)
+        assert graph.neighbors(agent2.id, direction="either") == set(
+            [agent1.id, agent3.id])
+        assert graph.neighbors(agent2.id, direction="both") == set([agent3.id])
+        assert graph.degree(agent2.id) == 1
+        assert graph.degree(agent2.id, direction="all") == 3
+        self._assert_matches_database(net)
+
+        agent3.fail()
+
+        graph = graph_cache.graph(net)
+        assert graph.neighbors(agent2.id, direction="either") == set(
+            [agent1.id])
+        assert graph.degree(agent2.id, direction="all") == 1
+        self._assert_matches_database(net)
+
+    def test_rollback_clears_cache(self):
+        net = models.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        nodes.Agent(network=net)
+        assert graph_cache.graph(net).size() == 1
+
+        self.db.rollback()
+
+        assert graph_cache.graph(net).size() == 0
+
+    def test_cached_networks_match_uncached(self):
+        for cls, args in [(networks.Chain, {}),
+                          (networks.Star, {}),
+                          (networks.Burst, {}),
+                          (networks.FullyConnected, {}),
+                          (networks.SequentialMicrosociety, {"n": 3}),
+                          (networks.ScaleFree, {"m0": 3, "m": 2})]:
+            net = cls(**args)
+            self.db.add(net)
+            self.db.commit()
+
+            for _ in range(8):
+                net.add_node(nodes.Agent(network=net))
+
+            self._assert_matches_database(net)
+            assert len(net.vectors()) == sum(
+                self._fresh(net).degree(i) for i in self._fresh(net).nodes())
+
+    def test_cached_chain_add_node_query_count(self):
+        net = networks.Chain()
+        self.db.add(net)
+        self.db.commit()
+
+        statements = []
+
+        def count(*args, **kwargs):
+            statements.append(args)
+
+        query_counts = []
+        for _ in range(20):
+            agent = nodes.Agent(network=net)
+            event.listen(db.engine, "before_cursor_execute", count)
+            net.add_node(agent)
+            event.remove(db.engine, "before_cursor_execute", count)
+            query_counts.append(len(statements))
+            del statements[:]
+
+        # Once cached, the topology is never read from the database again:
+        # each call only flushes the new agent and the previous vector.
+        assert set(query_counts[2:]) == set([2])
+
+    def test_sample_by_degree(self):
+        net = models.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        agent1 = nodes.Agent(network=net)
+        agent2 = nodes.Agent(network=net)
+        agent3 = nodes.Agent(network=net)
+        agent4 = nodes.Agent(network=net)
+        agent1.connect(whom=[agent2, agent3, agent4])
+        agent2.connect(whom=agent1)
+
+        graph = graph_cache.graph(net)
+        assert graph.sample_by_degree(5) in (
+            [agent1.id, agent2.id], [agent2.id, agent1.id])
+        assert graph.sample_by_degree(2, exclude=[agent1.id]) == [agent2.id]
+
+        # The sampler is kept up to date as the graph changes.
+        agent3.connect(whom=agent4)
+        agent1.fail()
+        graph = graph_cache.graph(net)
+        assert graph.sample_by_degree(5) == [agent3.id]
+
+    def test_fenwick_tree_samples_in_proportion_to_weight(self):
+        random.seed(1)
+        tree = graph_cache.FenwickTree()
+        for key in range(10):
+            tree.set(key, key)
+        tree.set(9, 0)
+        assert tree.total() == 36
+        assert tree.get(9) == 0
+
+        counts = dict((key, 0) for key in range(10))
+        for _ in range(36000):
+            counts[tree.sample(1)[0]] += 1
+
+        assert counts[0] == counts[9] == 0
+        for key in range(1, 9):
+            assert abs(counts[key] - 1000 * key) < 5 * (1000 * key) ** 0.5
+
+        assert sorted(tree.sample(20)) == range(1, 9)
+        assert tree.total() == 36
+
+    def test_scale_free_degree_distribution(self):
+        """Degrees follow the Barabasi-Albert distribution."""
+        random.seed(1)
+        m0, m = 3, 2
+        net = networks.ScaleFree(m0=m0, m=m)
+        self.db.add(net)
+        self.db.commit()
+
+        for _ in range(200):
+            net.add_node(nodes.Agent(network=net))
+
+        graph = graph_cache.graph(net)
+        degrees = [graph.degree(i) for i in graph.nodes()[m0:]]
+        observed = [sum(1 for d in degrees if d == m),
+                    sum(1 for d in degrees if d == m + 1),
+                    sum(1 for d in degrees if d == m + 2),
+                    sum(1 for d in degrees if d >= m + 3)]
+
+        # P(k) = 2m(m + 1) / (k(k + 1)(k + 2)) for k >= m
+        p = [2.0 * m * (m + 1) / (k * (k + 1) * (k + 2))
+             for k in range(m, m + 3)]
+        p.append(1 - sum(p))
+        expected = [len(degrees) * x for x in p]
+
+        chi2 = sum((o - e) ** 2 / e for o, e in zip(observed, expected))
+        # 16.27 is the 0.999 quantile of chi-squared with 3 degrees of freedom
+        assert chi2 < 16.27
@@ -33,6 +33,19 @@ class TestHeroku(object):
         id = "8fbe62f5-2e33-4274-8aeb-40fc3dd621a0"
         assert(len(app_name(id)) < 30)
 
+    def test_launch_worker_class(self, tmpdir, monkeypatch):
+        from dallinger.heroku.launch import worker_class
+        monkeypatch.delenv('worker_class', raising=False)
+        monkeypatch.setenv('HOME', str(tmpdir))
+        monkeypatch.chdir(tmpdir)
+        assert worker_class() == 'sync'
+
+        tmpdir.join('config.txt').write('[Server]\nworker_class = gevent\n')
+        assert worker_class() == 'gevent'
+
+        monkeypatch.setenv('worker_class', 'sync')
+        assert worker_class() == 'sync'
+
 
 class TestClockScheduler(object):
 
@@ -4,7 +4,7 @@ from __future__ import print_function
 import sys
 from datetime import datetime
 from dallinger import models, db, nodes
-from pytest import raises
+from pytest import mark, raises
 from dallinger.nodes import Agent, Source
 from dallinger.information import Gene
 from dallinger.transformations import Mutation
@@ -339,6 +339,63 @@ class TestModels(object):
     # Vector
     ##################################################################
 
+    def test_node_neighbors_many(self):
+        net = models.Network()
+        self.add(net)
+        node1 = models.Node(network=net)
+        node2 = models.Node(network=net)
+        agent1 = Agent(network=net)
+        agent2 = Agent(network=net)
+        self.add(node1, node2, agent1, agent2)
+
+        node1.connect(whom=[agent1, node2])
+        agent1.connect(direction="both", whom=agent2)
+
+        # Neighbors come in order of id, whatever order they were connected.
+        many = models.Node.neighbors_many([node1, agent1, agent2])
+        assert many[node1.id] == [node2, agent1]
+        assert many[agent1.id] == [agent2]
+        assert many[agent2.id] == [agent1]
+
+        many = models.Node.neighbors_many([node1, agent1], type=Agent)
+        assert many[node1.id] == [agent1]
+
+        many = models.Node.neighbors_many([node2, agent1], direction="from")
+        assert many[node2.id] == [node1]
+        assert many[agent1.id] == [node1, agent2]
+
+        many = models.Node.neighbors_many([agent1], direction="both")
+        assert many[agent1.id] == [agent2]
+
+        for n in [node1, node2, agent1, agent2]:
+            for direction in ["to", "from", "either", "both"]:
+                assert (n.neighbors(direction=direction) ==
+                        models.Node.neighbors_many(
+                            [n], direction=direction)[n.id])
+
+        assert models.Node.neighbors_many([]) == {}
+
+    def test_participant_infos(self):
+        net = models.Network()
+        participant = models.Participant(
+            worker_id=str(1), hit_id=str(1), assignment_id=str(1), mode="test")
+        self.add(net, participant)
+        agent1 = Agent(network=net, participant=participant)
+        agent2 = Agent(network=net, participant=participant)
+        other = Agent(network=net)
+        info1 = models.Info(origin=agent1, contents="foo")
+        gene = Gene(origin=agent2, contents="bar")
+        models.Info(origin=other, contents="baz")
+        self.add(agent1, agent2, other)
+
+        assert set(participant.infos()) == set([info1, gene])
+        assert participant.infos(type=Gene) == [gene]
+
+        info1.fail()
+        assert participant.infos() == [gene]
+        assert participant.infos(failed=True) == [info1]
+        assert len(participant.infos(failed="all")) == 2
+
     def test_create_vector(self):
         """Test creating a vector between two nodes"""
         net = models.Network()
@@ -457,6 +514,60 @@ class TestModels(object):
         assert info1 in node.infos()
         assert info2 in node.infos()
 
+    def test_node_infos_pages(self):
+        net = models.Network()
+        self.db.add(net)
+        node = models.Node(network=net)
+        other = models.Node(network=net)
+        node.connect(whom=other)
+        infos = [models.Info(origin=node, contents=str(i) * 1000)
+                 for i in range(5)]
+        self.add(node, other, *infos)
+        node.transmit(what=models.Info, to_whom=other)
+        other.receive()
+        self.db.commit()
+        ids = [i.id for i in infos]
+
+        assert [i.id for i in node.infos(limit=2)] == ids[:2]
+        assert [i.id for i in node.infos(since_id=ids[1])] == ids[2:]
+        assert ([i.id for i in node.infos(since_id=ids[1], limit=2)] ==
+                ids[2:4])
+        assert node.infos(since_id=ids[-1]) == []
+        assert ([i.id for i in other.received_infos(since_id=ids[0],
+                                                    limit=1)] == ids[1:2])
+        assert ([t.id for t in node.transmissions(limit=3)] ==
+                sorted(t.id for t in node.transmissions())[:3])
+        assert len(node.vectors(since_id=0, limit=5)) == 1
+
+    def test_node_infos_fields(self):
+        from sqlalchemy import event
+
+        net = models.Network()
+        self.db.add(net)
+        node = models.Node(network=net)
+        info = models.Info(origin=node, contents="foo" * 1000)
+        info.property1 = "bar"
+        self.add(node, info)
+        self.db.expunge_all()
+
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        node = models.Node.query.one()
+        event.listen(db.engine, "before_cursor_execute", count)
+        try:
+            info = node.infos(fields=["id", "property1"])[0]
+            assert info.property1 == "bar"
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count)
+        assert len(statements) == 1
+        assert "contents" not in statements[0]
+
+        # Other columns are loaded when they are used.
+        assert info.contents == "foo" * 1000
+
     def test_info_repr(self):
         """Check the info repr"""
         net = models.Network()
@@ -576,6 +687,267 @@ class TestModels(object):
         assert len(agent2.transmissions(direction="outgoing")) == 0
         assert len(agent3.transmissions(direction="outgoing")) == 0
 
+    def test_node_receive(self, assert_max_queries):
+        net = models.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        senders = [nodes.ReplicatorAgent(network=net) for _ in range(10)]
+        receiver = nodes.Agent(network=net)
+        infos = []
+        for sender in senders:
+            sender.connect(whom=receiver)
+            infos.append(models.Info(origin=sender, contents="foo"))
+        transmissions = [sender.transmit(what=info, to_whom=receiver)
+                         for sender, info in zip(senders, infos)]
+        self.db.commit()
+        transmissions[0].fail()
+
+        received = []
+        receiver.update = received.extend
+
+        with assert_max_queries(4):
+            receiver.receive()
+
+        assert received == infos[1:]
+        assert transmissions[0].status == "pending"
+        for transmission in transmissions[1:]:
+            assert transmission.status == "received"
+            assert transmission.receive_time is not None
+        assert receiver.transmissions(direction="incoming",
+                                      status="pending") == []
+
+        del received[:]
+        receiver.receive()
+        assert received == []
+
+    def test_node_receive_list(self, assert_max_queries):
+        net = models.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        senders = [nodes.ReplicatorAgent(network=net) for _ in range(4)]
+        receiver = nodes.Agent(network=net)
+        infos = []
+        for sender in senders:
+            sender.connect(whom=receiver)
+            infos.append(models.Info(origin=sender, contents="foo"))
+        transmissions = [sender.transmit(what=info, to_whom=receiver)
+                         for sender, info in zip(senders, infos)]
+        self.db.commit()
+
+        received = []
+        receiver.update = received.extend
+
+        with assert_max_queries(4):
+            receiver.receive(what=transmissions[:2])
+            assert [t.status for t in transmissions[:2]] == [
+                "received", "received"]
+
+        assert received == infos[:2]
+        assert [t.status for t in transmissions[2:]] == ["pending", "pending"]
+
+        del received[:]
+        receiver.receive(what=transmissions[:2])
+        receiver.receive(what=[])
+        assert received == []
+
+    def test_node_receive_transmission(self):
+        net = models.Network()
+        self.db.add(net)
+        agent1 = nodes.Agent(network=net)
+        agent2 = nodes.Agent(network=net)
+        agent1.connect(whom=agent2)
+        info = models.Info(origin=agent1, contents="foo")
+        transmission = agent1.transmit(what=info, to_whom=agent2)
+
+        with raises(ValueError):
+            agent1.receive(what=transmission)
+
+        agent2.receive(what=transmission)
+        assert transmission.status == "received"
+        assert transmission.receive_time is not None
+
+    def _build_busy_networks(self, seed):
+        """Two networks with a bit of everything, some of it already failed."""
+        import random
+        random.seed(seed)
+
+        participants = [
+            models.Participant(worker_id=str(i), hit_id=str(i),
+                               assignment_id=str(i), mode="test")
+            for i in range(2)]
+        nets = [models.Network(max_size=5), models.Network(max_size=5)]
+        self.add(*(participants + nets))
+
+        agents = [nodes.ReplicatorAgent(
+                  network=nets[i % 2],
+                  participant=random.choice(participants + [None]))
+                  for i in range(10)]
+        for a in agents:
+            for b in agents:
+                if a.network == b.network and a != b and random.random() < .5:
+                    a.connect(whom=b)
+            models.Info(origin=a, contents="foo")
+        self.db.commit()
+
+        for a in agents:
+            for vector in a.vectors(direction="outgoing"):
+                if random.random() < .7:
+                    a.transmit(what=random.choice(a.infos()),
+                               to_whom=vector.destination)
+        for a in agents:
+            if random.random() < .5:
+                a.receive()
+        for n in nets:
+            random.choice(n.vectors()).fail()
+            random.choice(n.infos()).fail()
+        self.db.commit()
+
+        return participants, nets, agents
+
+    def _fail_recursively(self, obj):
+        """How failing cascaded when each object failed its own children."""
+        obj.failed = True
+        obj.time_of_death = models.timenow()
+        if isinstance(obj, models.Node):
+            for v in obj.vectors():
+                v.fail()
+            for i in obj.infos():
+                i.fail()
+            for t in obj.transmissions(direction="all"):
+                t.fail()
+            for t in obj.transformations():
+                t.fail()
+        else:
+            for n in obj.nodes():
+                self._fail_recursively(n)
+
+    def _failures(self):
+        return dict(((cls.__name__, x.id), (x.failed, x.time_of_death))
+                    for cls in [models.Network, models.Participant,
+                                models.Node, models.Vector, models.Info,
+                                models.Transmission, models.Transformation]
+                    for x in cls.query.all())
+
+    def test_fail_matches_recursive_fail(self):
+        def failed(deaths):
+            return sorted(k for k in deaths if deaths[k][0])
+
+        for seed in range(3):
+            for target in [0, 1, 2]:
+                self.db.commit()
+                self.db = db.init_db(drop_all=True)
+                objects = self._build_busy_networks(seed)
+                before = self._failures()
+                self._fail_recursively(objects[target][seed % 2])
+                self.db.commit()
+                expected = self._failures()
+
+                self.db.commit()
+                self.db = db.init_db(drop_all=True)
+                objects = self._build_busy_networks(seed)
+                assert failed(self._failures()) == failed(before)
+                objects[target][seed % 2].fail()
+                self.db.commit()
+                actual = self._failures()
+
+                assert failed(actual) == failed(expected)
+                deaths = set(actual[k][1] for k in failed(actual)
+                             if not before[k][0] and
+                             k[0] not in ["Network", "Participant"])
+                assert len(deaths) == 1
+                for net in objects[1]:
+                    assert net.full is (net.size() >= net.max_size)
+
+    def test_fail_query_count(self, assert_max_queries):
+        participants, nets, agents = self._build_busy_networks(0)
+
+        with assert_max_queries(10):
+            nets[0].fail()
+        assert all(a.failed for a in agents if a.network == nets[0])
+        assert not any(a.failed for a in agents if a.network == nets[1])
+
+    def test_fail_calls_overridden_fail(self, monkeypatch):
+        participants, nets, agents = self._build_busy_networks(0)
+        called = []
+
+        def fail(node):
+            called.append(node)
+            models.Node.fail(node)
+
+        monkeypatch.setattr(nodes.ReplicatorAgent, "fail", fail)
+        nets[0].fail()
+        self.db.commit()
+
+        assert (sorted(n.id for n in called) ==
+                sorted(n.id for n in nets[0].nodes(failed=True)))
+        assert not nets[0].vectors()
+        assert not nets[0].infos()
+        assert not nets[0].transmissions()
+        assert nets[1].nodes()
+        assert nets[0].full is False
+
+    def _broadcaster(self, size):
+        """A node connected to size agents, as they are after a commit."""
+        net = models.Network()
+        self.add(net)
+        broadcaster = nodes.Agent(network=net)
+        self.add(broadcaster)
+
+        # Many nodes are quicker to insert without the ORM.
+        self.db.execute(models.Node.__table__.insert(), [
+            {"type": "agent", "network_id": net.id} for _ in range(size)])
+        agents = Agent.query.filter(Agent.id != broadcaster.id).all()
+        self.db.execute(models.Vector.__table__.insert(), [
+            {"origin_id": broadcaster.id, "destination_id": agent.id,
+             "network_id": net.id} for agent in agents])
+        models.Info(origin=broadcaster, contents="foo")
+        self.db.commit()
+        return broadcaster, agents
+
+    @mark.parametrize("size", [10, 100, 1000])
+    def test_transmit_query_budget(self, size, assert_max_queries):
+        broadcaster, agents = self._broadcaster(size)
+        info = broadcaster.infos()[0]
+        self.db.commit()
+
+        # The ORM inserts transmissions one by one, but nothing else is
+        # loaded per recipient.
+        with assert_max_queries(size + 6) as queries:
+            broadcaster.transmit(what=info, to_whom=agents)
+            self.db.flush()
+        assert [count for _, count in queries.repeated()] == [size]
+
+        with assert_max_queries(5, max_repeats=1):
+            broadcaster.bulk_transmit(what=info, to_whom=agents)
+
+    @mark.parametrize("size", [10, 100, 1000])
+    def test_receive_query_budget(self, size, assert_max_queries):
+        broadcaster, agents = self._broadcaster(size)
+        infos = [models.Info(origin=broadcaster, contents=str(i))
+                 for i in range(size)]
+        self.db.commit()
+        broadcaster.bulk_transmit(what=infos, to_whom=agents[0])
+        self.db.commit()
+
+        received = []
+        agents[0].update = received.extend
+        with assert_max_queries(5, max_repeats=1):
+            agents[0].receive()
+        assert len(received) == size
+
+    @mark.parametrize("size", [10, 100, 1000])
+    def test_fail_query_budget(self, size, assert_max_queries):
+        broadcaster, agents = self._broadcaster(size)
+        net = broadcaster.network
+        self.db.commit()
+
+        with assert_max_queries(11, max_repeats=1):
+            net.fail()
+            self.db.flush()
+        assert net.size(failed=True) == size + 1
+
     def test_property_node(self):
         net = models.Network()
         self.db.add(net)
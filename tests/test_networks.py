@@ -1,6 +1,6 @@
 from dallinger import networks, nodes, db, models
 import random
-from pytest import raises
+from pytest import mark, raises
 
 
 class TestNetworks(object):
@@ -35,6 +35,70 @@ class TestNetworks(object):
         assert len(net.nodes(failed="all")) == 6
         assert len(net.nodes(failed=True)) == 1
 
+    def test_network_node_count(self):
+        net = networks.Network(max_size=3)
+        self.db.add(net)
+        agent1 = nodes.Agent(network=net)
+        self.db.commit()
+        assert net.node_count == 1
+
+        agent2 = nodes.Agent(network=net)
+        nodes.Source(network=net)
+        assert net.node_count == 3
+        assert net.full is True
+        assert net.size() == 3
+        assert net.size(type=nodes.Agent) == 2
+
+        agent2.fail()
+        assert net.node_count == 2
+        assert net.full is False
+        assert net.size() == 2
+        assert net.size(failed=True) == 1
+        assert net.size(failed="all") == 3
+
+        with raises(TypeError):
+            net.size(type=models.Info)
+
+        participant = models.Participant(
+            worker_id="1", hit_id="1", assignment_id="1", mode="test")
+        self.db.add(participant)
+        self.db.commit()
+        agent1.participant = participant
+        nodes.Agent(network=net, participant=participant)
+        assert net.node_count == 3
+
+        participant.fail()
+        assert net.node_count == 1
+        assert net.node_count == net.size()
+
+    def test_network_node_count_concurrent(self):
+        import threading
+
+        net = networks.Network(max_size=40)
+        self.db.add(net)
+        self.db.commit()
+        net_id = net.id
+
+        def add_nodes():
+            try:
+                for _ in range(10):
+                    network = models.Network.query.get(net_id)
+                    nodes.Agent(network=network)
+                    db.session.commit()
+            finally:
+                db.session.remove()
+
+        threads = [threading.Thread(target=add_nodes) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.db.expire_all()
+        assert net.size() == 40
+        assert net.node_count == 40
+        assert net.full is True
+
     def test_network_agents(self):
         net = networks.Network()
         self.db.add(net)
@@ -121,6 +185,150 @@ class TestNetworks(object):
         assert 1 in [len(n.vectors(direction="outgoing")) for n in net.nodes()]
         assert 0 in [len(n.vectors(direction="outgoing")) for n in net.nodes()]
 
+    def test_network_adjacency(self):
+        net = networks.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        agent1 = nodes.Agent(network=net)
+        agent2 = nodes.Agent(network=net)
+        agent3 = nodes.Agent(network=net)
+
+        agent1.connect(whom=agent2)
+        agent2.connect(direction="both", whom=agent3)
+
+        assert net.adjacency() == {
+            agent1.id: set([agent2.id]),
+            agent2.id: set([agent3.id]),
+            agent3.id: set([agent2.id]),
+        }
+        assert net.adjacency(direction="from") == {
+            agent1.id: set(),
+            agent2.id: set([agent1.id, agent3.id]),
+            agent3.id: set([agent2.id]),
+        }
+        assert net.adjacency(direction="either")[agent2.id] == set(
+            [agent1.id, agent3.id])
+        assert net.adjacency(direction="both")[agent2.id] == set([agent3.id])
+
+        agent3.fail()
+
+        assert net.adjacency() == {
+            agent1.id: set([agent2.id]),
+            agent2.id: set(),
+        }
+
+        raises(ValueError, net.adjacency, direction="sideways")
+
+    def test_network_degree_map(self):
+        net = networks.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        agent1 = nodes.Agent(network=net)
+        agent2 = nodes.Agent(network=net)
+        agent3 = nodes.Agent(network=net)
+
+        agent1.connect(whom=[agent2, agent3])
+        agent2.connect(whom=agent3)
+
+        assert net.degree_map() == {agent1.id: 2, agent2.id: 1, agent3.id: 0}
+        assert net.degree_map(direction="incoming") == {
+            agent1.id: 0, agent2.id: 1, agent3.id: 2}
+        assert net.degree_map(direction="all") == {
+            agent1.id: 2, agent2.id: 2, agent3.id: 2}
+        assert net.degree_map() == dict(
+            (n.id, len(n.vectors(direction="outgoing"))) for n in net.nodes())
+
+        raises(ValueError, net.degree_map, direction="to")
+
+    def test_network_transmission_map(self):
+        net = networks.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        agent1 = nodes.Agent(network=net)
+        agent2 = nodes.Agent(network=net)
+        agent3 = nodes.Agent(network=net)
+        agent1.connect(whom=[agent2, agent3])
+        models.Info(origin=agent1, contents="foo")
+
+        agent1.transmit()
+        agent2.receive()
+
+        pending = net.transmission_map()
+        assert pending.keys() == [agent3.id]
+        assert pending[agent3.id] == agent3.transmissions(
+            direction="incoming", status="pending")
+        assert len(net.transmission_map(direction="outgoing",
+                                        status="all")[agent1.id]) == 2
+
+    def test_scale_free_add_node_query_count(self):
+        """Adding a node should not cost a query per existing node."""
+        from sqlalchemy import event
+
+        net = networks.ScaleFree(m0=4, m=2)
+        self.db.add(net)
+        self.db.commit()
+
+        statements = []
+
+        def count(*args, **kwargs):
+            statements.append(args)
+
+        query_counts = []
+        for size in range(40):
+            agent = nodes.Agent(network=net)
+            event.listen(db.engine, "before_cursor_execute", count)
+            net.add_node(agent)
+            event.remove(db.engine, "before_cursor_execute", count)
+            query_counts.append(len(statements))
+            del statements[:]
+
+        assert query_counts[10] == query_counts[-1]
+
+    def _populate(self, net, size, pairs):
+        """Add size agents to net, with vectors between the given pairs.
+
+        Many nodes are quicker to insert without the ORM.
+        """
+        self.db.add(net)
+        self.db.commit()
+        self.db.execute(models.Node.__table__.insert(), [
+            {"type": "agent", "network_id": net.id} for _ in range(size)])
+        ids = [n.id for n in net.nodes()]
+        self.db.execute(models.Vector.__table__.insert(), [
+            {"origin_id": ids[a], "destination_id": ids[b],
+             "network_id": net.id} for a, b in pairs(size)])
+        net.node_count = size
+        self.db.commit()
+
+    @mark.parametrize("size", [10, 100, 1000])
+    @mark.parametrize("network, pairs, queries, vectors", [
+        (lambda: networks.Chain(),
+         lambda n: [(i, i + 1) for i in range(n - 1)], 8, 1),
+        (lambda: networks.Star(),
+         lambda n: [(0, i) for i in range(1, n)] +
+                   [(i, 0) for i in range(1, n)], 10, 2),
+        (lambda: networks.Burst(),
+         lambda n: [(0, i) for i in range(1, n)], 8, 1),
+        (lambda: networks.ScaleFree(m0=4, m=2),
+         lambda n: [(i, (i + 1) % n) for i in range(n)] +
+                   [((i + 1) % n, i) for i in range(n)], 13, 4),
+    ])
+    def test_add_node_query_budget(self, size, network, pairs, queries,
+                                   vectors, assert_max_queries):
+        """Adding a node costs the same however big the network is."""
+        net = network()
+        net.max_size = size + 1
+        self._populate(net, size, pairs)
+
+        # Only the new vectors are inserted one by one.
+        with assert_max_queries(queries, max_repeats=vectors):
+            net.add_node(nodes.Agent(network=net))
+            self.db.commit()
+        assert net.full
+
     def test_network_add_source_global(self):
         net = networks.Network()
         self.db.add(net)
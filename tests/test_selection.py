@@ -0,0 +1,86 @@
+import random
+
+from pytest import raises
+
+from dallinger import db, models, nodes, selection
+
+
+class TestSelection(object):
+
+    def setup(self):
+        self.db = db.init_db(drop_all=True)
+
+    def teardown(self):
+        self.db.rollback()
+        self.db.close()
+
+    def _assert_proportional(self, weights):
+        random.seed(1)
+        total = float(sum(w or 0 for w in weights))
+        draws = 20000
+        counts = [0] * len(weights)
+        for i in selection.weighted_choice(weights, n=draws):
+            counts[i] += 1
+
+        for count, weight in zip(counts, weights):
+            expected = draws * (weight or 0) / total
+            assert abs(count - expected) <= 5 * (expected ** 0.5)
+
+    def test_weighted_choice(self):
+        self._assert_proportional([1, 0, 2.5, None, 4])
+
+    def test_weighted_choice_without_numpy(self):
+        numpy = selection.numpy
+        selection.numpy = None
+        try:
+            self._assert_proportional([1, 0, 2.5, None, 4])
+        finally:
+            selection.numpy = numpy
+
+    def test_weighted_choice_single(self):
+        assert selection.weighted_choice([0, 3, 0]) == 1
+        assert selection.weighted_choice([0, 3, 0], n=2) == [1, 1]
+        assert selection.weighted_choice([1], n=0) == []
+
+    def test_weighted_choice_bad_weights(self):
+        with raises(ValueError):
+            selection.weighted_choice([])
+        with raises(ValueError):
+            selection.weighted_choice([0, None])
+        with raises(ValueError):
+            selection.weighted_choice([1, -1])
+
+    def test_select_by_fitness(self):
+        net = models.Network()
+        self.db.add(net)
+        self.db.commit()
+
+        agents = [nodes.Agent(network=net) for _ in range(4)]
+        for agent, fitness in zip(agents, [0.5, 0, 2.0, 1.5]):
+            agent.fitness = fitness
+        agents[2].fail()
+        nodes.ReplicatorAgent(network=net).fitness = 0
+
+        other_net = models.Network()
+        self.db.add(other_net)
+        self.db.commit()
+        nodes.Agent(network=other_net).fitness = 100
+
+        ids, fits = selection.fitnesses(nodes.Agent, network_id=net.id)
+        assert ids[:3] == [agents[0].id, agents[1].id, agents[3].id]
+        assert fits == [0.5, 0, 1.5, 0]
+
+        ids, fits = selection.fitnesses(
+            nodes.ReplicatorAgent, network_id=net.id)
+        assert fits == [0]
+
+        parents = selection.select_by_fitness(
+            nodes.Agent, n=100, network_id=net.id)
+        assert len(parents) == 100
+        assert set(parents) <= set([agents[0], agents[3]])
+
+        parent = selection.select_by_fitness(nodes.Agent, network_id=net.id)
+        assert parent in [agents[0], agents[3]]
+
+        with raises(ValueError):
+            selection.select_by_fitness(nodes.Agent, network_id=-1)
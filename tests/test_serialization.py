@@ -0,0 +1,76 @@
+import json
+
+from dallinger import db, models, nodes, serialization
+from dallinger.information import Gene
+from dallinger.serialization import date_handler
+from dallinger.transformations import Mutation
+
+
+class ShoutingNode(models.Node):
+    """A node whose json is more than its columns."""
+
+    __mapper_args__ = {"polymorphic_identity": "shouting_node"}
+
+    def __json__(self):
+        return {"id": self.id, "name": self.name()}
+
+    def name(self):
+        return "node {}".format(self.id).upper()
+
+
+class TestSerialization(object):
+
+    def setup(self):
+        self.db = db.init_db(drop_all=True)
+
+    def teardown(self):
+        self.db.rollback()
+        self.db.close()
+
+    def _things(self):
+        participant = models.Participant(
+            worker_id="w", hit_id="h", assignment_id="a", mode="debug")
+        participant.bonus = 1.1
+        participant.property1 = "back\\slash\t"
+        net = models.Network()
+        self.db.add_all([participant, net])
+        self.db.commit()
+
+        question = models.Question(participant=participant, question="q",
+                                   response='"quoted"\n', number=1)
+        agent = nodes.Agent(network=net, participant=participant)
+        source = nodes.RandomBinaryStringSource(network=net)
+        source.connect(whom=agent)
+        info = Gene(origin=source, contents="0101")
+        transmission = source.transmit(what=info, to_whom=agent)
+        mutation = Mutation(info_in=info, info_out=Gene(origin=source,
+                                                        contents="0111"))
+        agent.fail()
+        self.db.add(question)
+        self.db.commit()
+        return [participant, question, net, agent, source, agent.vectors(
+            failed="all")[0], info, transmission, mutation]
+
+    def _json(self, thing):
+        return json.dumps(thing.__json__(), default=date_handler)
+
+    def test_same_json_as_json_method(self):
+        for thing in self._things():
+            assert serialization.encoder_for(type(thing)) is not None
+            expected = self._json(thing)
+            assert serialization.dumps(serialization.serialize(thing)) == \
+                expected
+            # The columns are loaded if they have expired.
+            self.db.expire(thing)
+            assert serialization.dumps(serialization.serialize(thing)) == \
+                expected
+
+    def test_json_methods_that_do_more_are_not_compiled(self):
+        net = models.Network()
+        self.db.add(net)
+        node = ShoutingNode(network=net)
+        self.db.commit()
+
+        assert serialization.encoder_for(ShoutingNode) is None
+        assert serialization.serialize(node) == {
+            "id": node.id, "name": "NODE {}".format(node.id)}
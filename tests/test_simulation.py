@@ -0,0 +1,113 @@
+import csv
+import os
+import tempfile
+from zipfile import ZipFile
+
+import pytest
+
+from dallinger import db
+from dallinger import experiment
+from dallinger import models
+
+
+@pytest.fixture
+def experiment_dir(monkeypatch):
+    os.chdir('tests/experiment')
+    from dallinger.config import get_config
+    from dallinger.experiment_server import experiment_server
+    # The modules may have kept the config and experiment module of
+    # another test class.
+    config = get_config()
+    if not config.ready:
+        config.load()
+    config.extend({"base_payment": 1.0})
+    monkeypatch.setattr(experiment, "config", config)
+    monkeypatch.setattr(experiment_server, "config", config)
+    monkeypatch.setattr(experiment_server, "Experiment", experiment.load())
+    db.init_db(drop_all=True)
+    yield
+    db.session.rollback()
+    os.chdir('../..')
+
+
+class TestSimulation(object):
+
+    @pytest.fixture
+    def simulation(self, experiment_dir):
+        from dallinger.simulation import Simulation
+        return Simulation(commit_every=2)
+
+    def test_run(self, simulation):
+        results = simulation.run(5)
+        assert results["participants"] == 5
+        assert results["statuses"] == [(u"approved", 5)]
+
+        participants = models.Participant.query.all()
+        assert len(participants) == 5
+        assert all(p.mode == u"simulate" for p in participants)
+
+        # The test experiment's only network is a star of two nodes.
+        nodes = models.Node.query.order_by(models.Node.id).all()
+        assert [n.participant_id for n in nodes] == [
+            participants[0].id, participants[1].id]
+        assert models.Info.query.count() == 2
+        assert models.Transmission.query.count() == 1
+        assert models.Notification.query.count() == 5
+
+    def test_run_in_batches(self, simulation):
+        simulation.run(3)
+        simulation.run(2)
+        assert models.Participant.query.filter_by(
+            status=u"approved").count() == 5
+
+    def test_uses_simulated_recruiter(self, simulation):
+        from dallinger.recruiters import SimulatedRecruiter
+        assert simulation.experiment.recruiter is SimulatedRecruiter
+
+    def test_has_its_own_redis_keys(self, simulation):
+        from dallinger.experiment_server import experiment_server
+        assert experiment_server.redis_key("summary").startswith(
+            "dallinger:simulation-{}:".format(simulation.hit_id))
+
+    def test_simulate(self, experiment_dir):
+        from dallinger.simulation import simulate
+        results = simulate(3, seed=1)
+        assert results["statuses"] == [(u"approved", 3)]
+
+
+class TestReplicate(object):
+
+    @pytest.fixture(params=["postgresql", "sqlite"])
+    def database(self, request, monkeypatch, experiment_dir):
+        if request.param == "sqlite":
+            monkeypatch.setattr(db, "db_url", "sqlite:///")
+
+    def _table(self, path, table):
+        with ZipFile(path) as data:
+            return list(csv.DictReader(
+                data.open("data/{}.csv".format(table))))
+
+    def test_replicate(self, database):
+        from dallinger.simulation import replicate
+        path = replicate(3, 2, processes=2, seed=1, path=tempfile.mkdtemp())
+        assert path.endswith("-data.zip")
+
+        participants = self._table(path, "participant")
+        assert [p["replicate"] for p in participants] == [
+            "0", "0", "1", "1", "2", "2"]
+        assert [p["id"] for p in participants] == ["1", "2"] * 3
+        assert set(p["status"] for p in participants) == set(["approved"])
+        nodes = self._table(path, "node")
+        assert [n["replicate"] for n in nodes] == [
+            "0", "0", "1", "1", "2", "2"]
+
+    def test_replicates_are_seeded(self, database):
+        from dallinger.simulation import replicate
+        paths = [
+            replicate(2, 2, processes=processes, seed=1,
+                      path=tempfile.mkdtemp())
+            for processes in [1, 2]]
+        workers = [[p["worker_id"] for p in self._table(path, "participant")]
+                   for path in paths]
+        assert workers[0] == workers[1]
+        assert workers[0][:2] != workers[0][2:]